@@ -1,34 +1,39 @@
 # app/controllers/auth_controller.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app, jsonify, Response
 from flask_login import login_user, logout_user, login_required, current_user
 from models.user_model import User
-from datetime import datetime, timedelta
+from utils.sesiones import regenerar_sesion
+from utils.contrasenas import politica_hash
+from utils.principales import cache_principales
+from utils import permisos
+from utils import importacion_residentes
+import math
 
 auth_bp = Blueprint('auth', __name__)
 
-# Control de intentos fallidos
-def get_intentos_fallidos():
-    return session.get('login_intentos', 0)
+# Login y registro son públicos: solo se declaran las vistas de administración
+permisos.proteger_blueprint(auth_bp, {
+    'login_metricas': permisos.GESTIONAR_USUARIOS,
+    'importar_usuarios': permisos.GESTIONAR_USUARIOS,
+    'importacion': permisos.GESTIONAR_USUARIOS,
+    'importacion_estado': permisos.GESTIONAR_USUARIOS,
+})
 
-def set_intentos_fallidos(intentos):
-    session['login_intentos'] = intentos
+def limite_login():
+    return current_app.extensions['limite_login']
 
-def get_ultimo_intento():
-    ts = session.get('ultimo_intento')
-    return datetime.fromisoformat(ts) if ts else None
+def minutos_espera(segundos):
+    return max(1, math.ceil(segundos / 60))
 
-def set_ultimo_intento():
-    session['ultimo_intento'] = datetime.now().isoformat()
-
-def esta_bloqueado():
-    intentos = get_intentos_fallidos()
-    if intentos < 3:
-        return False
-    ultimo = get_ultimo_intento()
-    if ultimo and (datetime.now() - ultimo) < timedelta(minutes=5):
-        return True
-    set_intentos_fallidos(0)
-    return False
+def con_tiempo_hash(respuesta, segundos):
+    """
+    Expone el costo de la verificación de contraseña (Server-Timing) solo en
+    modo debug: en producción daría a cualquiera una medida exacta del hash
+    de cada cuenta. Las métricas agregadas siguen en /api/login/metricas.
+    """
+    if current_app.debug:
+        respuesta.headers['Server-Timing'] = f'hash;desc="verificacion";dur={segundos * 1000:.1f}'
+    return respuesta
 
 @auth_bp.route('/', methods=['GET', 'POST'])
 @auth_bp.route('/login', methods=['GET', 'POST'])
@@ -37,32 +42,40 @@ def login():
         return redirect(url_for('auth.home'))
     
     if request.method == 'POST':
-        if esta_bloqueado():
-            flash('Demasiados intentos fallidos. Espera 5 minutos.', 'danger')
-            return render_template('auth/login.html')
-        
         username = request.form.get('username')
         password = request.form.get('password')
+        ip = request.remote_addr
+        
+        # Se rechaza antes de buscar al usuario y de calcular el hash
+        espera = limite_login().bloqueo(ip, username)
+        if espera:
+            flash(f'Demasiados intentos fallidos. Espera {minutos_espera(espera)} minutos.', 'danger')
+            respuesta = current_app.make_response((render_template('auth/login.html'), 429))
+            respuesta.headers['Retry-After'] = str(math.ceil(espera))
+            return respuesta
         
         user = User.get_by_username(username)
+        if user:
+            correcta, cpu = user.verificar_y_actualizar(password or '')
+        else:
+            correcta, cpu = False, politica_hash.verificar_inexistente(password or '')
         
-        if not user or not user.check_password(password):
-            intentos = get_intentos_fallidos() + 1
-            set_intentos_fallidos(intentos)
-            set_ultimo_intento()
+        if not correcta:
+            limite_login().registrar_fallo(ip, username)
             flash('Usuario o contraseña incorrectos.', 'danger')
-            return redirect(url_for('auth.login'))
+            return con_tiempo_hash(redirect(url_for('auth.login')), cpu)
         
         # Login exitoso
-        session['login_intentos'] = 0
+        limite_login().limpiar_usuario(username)
+        regenerar_sesion(session)
         login_user(user)
         
         if user.must_change_password:
             flash('Debes cambiar tu contraseña temporal.', 'warning')
-            return redirect(url_for('auth.cambiar_password'))
+            return con_tiempo_hash(redirect(url_for('auth.cambiar_password')), cpu)
         
         flash(f'Bienvenido, {user.first_name}!', 'success')
-        return redirect(url_for('auth.home'))
+        return con_tiempo_hash(redirect(url_for('auth.home')), cpu)
     
     return render_template('auth/login.html')
 
@@ -124,11 +137,109 @@ def cambiar_password():
             flash('La contraseña debe tener mínimo 8 caracteres.', 'danger')
             return redirect(url_for('auth.cambiar_password'))
         
-        current_user.set_password(nueva)
-        current_user.must_change_password = False
-        current_user.update()
+        usuario = current_user.usuario()
+        usuario.set_password(nueva)
+        usuario.must_change_password = False
+        usuario.update()
         
         flash('Contraseña actualizada correctamente.', 'success')
         return redirect(url_for('auth.home'))
     
-    return render_template('auth/cambiar_password.html')
\ No newline at end of file
+    return render_template('auth/cambiar_password.html')
+
+@auth_bp.route('/api/login/metricas')
+def login_metricas():
+    """API: Costo de CPU de las verificaciones de contraseña y caché de usuarios"""
+    return jsonify({
+        'metodo': politica_hash.metodo,
+        'verificacion': politica_hash.metricas.resumen(),
+        'usuarios_cache': cache_principales.estadisticas()
+    })
+
+@auth_bp.route('/usuarios/importar', methods=['GET', 'POST'])
+def importar_usuarios():
+    """Alta masiva de residentes desde CSV/XLSX; la importación sigue en segundo plano"""
+    if request.method == 'POST':
+        archivo = request.files.get('archivo')
+        if not archivo or not archivo.filename:
+            flash('Seleccione un archivo CSV o XLSX.', 'danger')
+            return redirect(url_for('auth.importar_usuarios'))
+        
+        try:
+            # El archivo se lee en la petición; el hash y las inserciones no
+            filas = list(importacion_residentes.leer_filas(archivo.stream, archivo.filename))
+        except (ValueError, UnicodeDecodeError) as e:
+            flash(f'No se pudo leer el archivo: {e}', 'danger')
+            return redirect(url_for('auth.importar_usuarios'))
+        
+        trabajo_id = importacion_residentes.obtener_trabajos().iniciar(
+            filas, simular=request.form.get('simular') == 'si', user_id=current_user.id
+        )
+        url = url_for('auth.importacion', trabajo_id=trabajo_id)
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({
+                'estado': 'pendiente',
+                'id': trabajo_id,
+                'url': url,
+                'url_estado': url_for('auth.importacion_estado', trabajo_id=trabajo_id)
+            }), 202
+        return redirect(url)
+    
+    return render_template(
+        'auth/importar_usuarios.html',
+        title='Importar residentes',
+        columnas=importacion_residentes.COLUMNAS,
+        xlsx=importacion_residentes.xlsx_disponible()
+    )
+
+@auth_bp.route('/usuarios/importar/<trabajo_id>')
+def importacion(trabajo_id):
+    """Reporte de una importación terminada (una sola vez) o la página de espera"""
+    trabajos = importacion_residentes.obtener_trabajos()
+    trabajo = trabajos.trabajo(trabajo_id, current_user.id)
+    if trabajo is None:
+        flash('La importación ya no está disponible.', 'warning')
+        return redirect(url_for('auth.importar_usuarios'))
+    if trabajo['estado'] == 'error':
+        flash(f"No se pudo importar el archivo: {trabajo['error']}", 'danger')
+        return redirect(url_for('auth.importar_usuarios'))
+    if trabajo['estado'] == 'pendiente':
+        return render_template(
+            'reportes/generando.html',
+            title='Importando residentes',
+            clave=trabajo_id,
+            url=url_for('auth.importacion', trabajo_id=trabajo_id),
+            url_estado=url_for('auth.importacion_estado', trabajo_id=trabajo_id)
+        )
+    
+    resultado = trabajos.entregar(trabajo_id, current_user.id)
+    if resultado is None:
+        flash('La importación ya no está disponible.', 'warning')
+        return redirect(url_for('auth.importar_usuarios'))
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(resultado)
+    return Response(
+        importacion_residentes.reporte_csv(resultado),
+        mimetype='text/csv; charset=utf-8',
+        headers={
+            'Content-Disposition': 'attachment; filename=reporte_importacion.csv',
+            'Cache-Control': 'no-store'
+        }
+    )
+
+@auth_bp.route('/usuarios/importar/<trabajo_id>/estado')
+def importacion_estado(trabajo_id):
+    """API: Estado de una importación (para consultar periódicamente)"""
+    trabajo = importacion_residentes.obtener_trabajos().trabajo(trabajo_id, current_user.id)
+    if trabajo is None:
+        return jsonify({'error': 'Importación no encontrada'}), 404
+    respuesta = {
+        'id': trabajo_id,
+        'estado': trabajo['estado'],
+        'url': url_for('auth.importacion', trabajo_id=trabajo_id)
+    }
+    if trabajo['resultado']:
+        respuesta['resumen'] = importacion_residentes.resumen(trabajo['resultado'])
+    if trabajo['error']:
+        respuesta['error'] = trabajo['error']
+    return jsonify(respuesta)
@@ -1,13 +1,30 @@
 # app/controllers/comunicacion_controller.py
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app, session, make_response, Response
+from markupsafe import Markup
 from models.chat_model import ChatMessage, Notification
-from models.comunicacion_model import Aviso, Queja
+from models.comunicacion_model import Aviso, Queja, CACHE_TABLON
 from models.mantenimiento_model import Mantenimiento
 from flask_login import login_required, current_user
-from utils.decorators import role_required
+from utils import permisos
+from utils.cache_versionada import obtener_cache
+from datetime import datetime, date
+import hashlib
 
 comunicacion_bp = Blueprint("comunicacion", __name__, url_prefix="/comunicacion")
 
+permisos.proteger_blueprint(comunicacion_bp, {
+    'avisos_cache_estadisticas': permisos.MONITOREAR_COMUNICACION,
+    'crear_aviso': permisos.GESTIONAR_AVISOS,
+    'archivar_aviso': permisos.GESTIONAR_AVISOS,
+    'reactivar_aviso': permisos.GESTIONAR_AVISOS,
+    'avisos_archivados': permisos.GESTIONAR_AVISOS,
+    'responder_queja': permisos.GESTIONAR_QUEJAS,
+    'cambiar_estado_queja': permisos.GESTIONAR_QUEJAS,
+    'presencia': permisos.MONITOREAR_COMUNICACION,
+    'buscar': permisos.MONITOREAR_COMUNICACION,
+    'notificaciones': permisos.VER_NOTIFICACIONES,
+}, por_defecto=permisos.USAR_COMUNICACION)
+
 def get_socketio():
     """Obtener instancia de socketio desde el contexto de la app"""
     return current_app.extensions.get('socketio')
@@ -18,11 +35,10 @@ def get_socketio():
 @login_required
 def chat_general():
     """Chat general del sistema"""
-    username = current_user.first_name if current_user.is_authenticated else 'Anónimo'
     return render_template(
         "comunicacion/chat.html",
         title="Chat General",
-        current_username=username 
+        current_user_id=current_user.id
     )
 
 @comunicacion_bp.route("/chat/ticket/<int:ticket_id>")
@@ -34,13 +50,12 @@ def chat_ticket(ticket_id):
         flash("Ticket no encontrado", "error")
         return redirect(url_for('mantenimiento.list_mantenimiento'))
     
-    username = current_user.first_name if current_user.is_authenticated else 'Anónimo'
-    
     return render_template(
         "comunicacion/chat_ticket.html",
         title=f"Chat - Ticket #{ticket_id}",
         ticket=ticket,
-        current_username=username 
+        current_username=current_user.first_name,
+        current_user_id=current_user.id
     )
 
 # ============= AVISOS =============
@@ -49,28 +64,77 @@ def chat_ticket(ticket_id):
 @login_required
 def avisos():
     """Ver todos los avisos activos"""
-    avisos = Aviso.get_all_activos()
-    return render_template(
+    cache = obtener_cache(CACHE_TABLON)
+    es_admin = current_user.puede(permisos.GESTIONAR_AVISOS)
+    hoy = date.today()
+    
+    # La página incluye el menú del usuario: el ETag depende de la huella
+    # del tablón en la base (no del contador en memoria, que se reinicia y
+    # es distinto en cada proceso), del día (vigencias) y del usuario
+    huella = Aviso.huella_tablon()
+    etag = hashlib.sha1(
+        f"{huella}|{hoy}|{current_user.id}|{current_user.first_name}|"
+        f"{current_user.role}|{current_user.departamento}".encode()
+    ).hexdigest()
+    
+    # Con mensajes flash pendientes la página cambia: no se responde 304
+    hay_mensajes = bool(session.get('_flashes'))
+    if not hay_mensajes and etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    
+    def renderizar_lista():
+        return render_template(
+            "comunicacion/_avisos_lista.html",
+            avisos=Aviso.get_all_activos(),
+            es_admin=es_admin
+        )
+    
+    # La huella en la clave descarta lo cacheado si otro proceso cambió el tablón
+    lista_avisos = cache.obtener((es_admin, hoy, huella), renderizar_lista)
+    
+    response = make_response(render_template(
         "comunicacion/avisos.html",
         title="Avisos Importantes",
-        avisos=avisos
-    )
+        lista_avisos=Markup(lista_avisos)
+    ))
+    if not hay_mensajes:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@comunicacion_bp.route("/api/avisos/cache")
+def avisos_cache_estadisticas():
+    """API: Métricas de la caché del tablón (aciertos y tiempo de render)"""
+    return jsonify(obtener_cache(CACHE_TABLON).estadisticas())
 
 @comunicacion_bp.route("/avisos/crear", methods=["GET", "POST"])
-@role_required('admin')
 def crear_aviso():
     """Crear un nuevo aviso (solo admin)"""
     if request.method == "POST":
         titulo = request.form.get("titulo")
         contenido = request.form.get("contenido")
         categoria = request.form.get("categoria")
+        vigente_hasta_str = request.form.get("vigente_hasta")
         
         if not titulo or not contenido or not categoria:
             flash("Todos los campos son obligatorios", "danger")
             return redirect(url_for('comunicacion.crear_aviso'))
         
+        try:
+            vigente_hasta = datetime.strptime(vigente_hasta_str, "%Y-%m-%d").date() if vigente_hasta_str else None
+        except ValueError:
+            flash("La fecha de vigencia no es válida", "danger")
+            return redirect(url_for('comunicacion.crear_aviso'))
+        
+        if vigente_hasta and vigente_hasta < date.today():
+            flash("La fecha de vigencia no puede estar en el pasado", "danger")
+            return redirect(url_for('comunicacion.crear_aviso'))
+        
         autor = f"{current_user.first_name} {current_user.last_name}"
-        aviso = Aviso(titulo=titulo, contenido=contenido, categoria=categoria, autor=autor)
+        aviso = Aviso(titulo=titulo, contenido=contenido, categoria=categoria,
+                      autor=autor, vigente_hasta=vigente_hasta)
         aviso.save()
         
         flash("Aviso publicado exitosamente", "success")
@@ -79,7 +143,6 @@ def crear_aviso():
     return render_template("comunicacion/crear_aviso.html", title="Crear Aviso")
 
 @comunicacion_bp.route("/avisos/<int:aviso_id>/archivar", methods=["POST"])
-@role_required('admin')
 def archivar_aviso(aviso_id):
     """Archivar un aviso (no lo elimina)"""
     aviso = Aviso.get_by_id(aviso_id)
@@ -92,7 +155,6 @@ def archivar_aviso(aviso_id):
     return redirect(url_for('comunicacion.avisos'))
 
 @comunicacion_bp.route("/avisos/<int:aviso_id>/reactivar", methods=["POST"])
-@role_required('admin')
 def reactivar_aviso(aviso_id):
     """Reactivar un aviso archivado"""
     aviso = Aviso.get_by_id(aviso_id)
@@ -105,14 +167,17 @@ def reactivar_aviso(aviso_id):
     return redirect(url_for('comunicacion.avisos'))
 
 @comunicacion_bp.route("/avisos/archivados")
-@role_required('admin')
 def avisos_archivados():
     """Ver avisos archivados (solo admin)"""
-    avisos = [a for a in Aviso.get_all() if not a.activo]
+    pagina = request.args.get('pagina', 1, type=int)
+    categoria = request.args.get('categoria') or None
+    paginacion = Aviso.get_archivados(pagina=pagina, categoria=categoria)
     return render_template(
         "comunicacion/avisos_archivados.html",
         title="Avisos Archivados",
-        avisos=avisos
+        avisos=paginacion.items,
+        paginacion=paginacion,
+        categoria=categoria
     )
 
 # ============= QUEJAS =============
@@ -121,17 +186,19 @@ def avisos_archivados():
 @login_required
 def quejas():
     """Ver quejas (admin ve todas, usuarios solo las suyas)"""
-    if current_user.has_role('admin'):
-        quejas = Queja.get_all()
-    else:
-        # Usuarios ven solo las quejas que enviaron con su nombre
-        autor_nombre = f"{current_user.first_name} {current_user.last_name}"
-        quejas = [q for q in Queja.get_all() if q.autor == autor_nombre]
+    estado = request.args.get('estado') or None
+    pagina = request.args.get('pagina', 1, type=int)
+    
+    # Usuarios ven solo las quejas que enviaron
+    user_id = None if current_user.puede(permisos.GESTIONAR_QUEJAS) else current_user.id
+    paginacion = Queja.get_paginadas(estado=estado, user_id=user_id, pagina=pagina)
     
     return render_template(
         "comunicacion/quejas.html",
         title="Quejas y Sugerencias",
-        quejas=quejas
+        quejas=paginacion.items,
+        paginacion=paginacion,
+        estado=estado
     )
 
 @comunicacion_bp.route("/quejas/crear", methods=["GET", "POST"])
@@ -148,7 +215,8 @@ def crear_queja():
             return redirect(url_for('comunicacion.crear_queja'))
         
         autor = None if anonima else f"{current_user.first_name} {current_user.last_name}"
-        queja = Queja(contenido=contenido, categoria=categoria, anonima=anonima, autor=autor)
+        queja = Queja(contenido=contenido, categoria=categoria, anonima=anonima,
+                      autor=autor, user_id=current_user.id)
         queja.save()
         
         # Notificar a los admins sobre la nueva queja
@@ -171,10 +239,9 @@ def ver_queja(queja_id):
         flash("Queja no encontrada", "error")
         return redirect(url_for('comunicacion.quejas'))
     
-    # Verificar permisos: admin puede ver todas, usuario solo las suyas no anónimas
-    if not current_user.has_role('admin'):
-        autor_nombre = f"{current_user.first_name} {current_user.last_name}"
-        if queja.anonima or queja.autor != autor_nombre:
+    # Verificar permisos: admin puede ver todas, usuario solo las suyas
+    if not current_user.puede(permisos.GESTIONAR_QUEJAS):
+        if not queja.es_autor(current_user):
             flash("No tienes permiso para ver esta queja", "danger")
             return redirect(url_for('comunicacion.quejas'))
     
@@ -185,7 +252,6 @@ def ver_queja(queja_id):
     )
 
 @comunicacion_bp.route("/quejas/<int:queja_id>/responder", methods=["GET", "POST"])
-@role_required('admin')
 def responder_queja(queja_id):
     """Responder a una queja (solo admin)"""
     queja = Queja.get_by_id(queja_id)
@@ -213,7 +279,6 @@ def responder_queja(queja_id):
     )
 
 @comunicacion_bp.route("/quejas/<int:queja_id>/estado", methods=["POST"])
-@role_required('admin')
 def cambiar_estado_queja(queja_id):
     """Cambiar el estado de una queja (solo admin)"""
     queja = Queja.get_by_id(queja_id)
@@ -226,10 +291,46 @@ def cambiar_estado_queja(queja_id):
     else:
         return jsonify({'success': False, 'error': 'Estado inválido'}), 400
 
+# ============= PRESENCIA =============
+
+@comunicacion_bp.route("/api/presencia")
+def presencia():
+    """API: Conexiones Socket.IO, usuarios por sala y métricas"""
+    from utils.presencia import registro_presencia
+    
+    sala = request.args.get('sala')
+    if sala:
+        return jsonify({'sala': sala, 'en_linea': registro_presencia.en_linea(sala)})
+    
+    metricas = registro_presencia.metricas()
+    metricas['en_linea'] = {s: registro_presencia.en_linea(s) for s in metricas['por_sala']}
+    return jsonify(metricas)
+
+# ============= BÚSQUEDA =============
+
+@comunicacion_bp.route("/api/buscar")
+def buscar():
+    """API: Búsqueda de texto completo en avisos, quejas, tickets y chat"""
+    from models.busqueda_model import buscar as buscar_texto, busqueda_disponible
+    
+    if not busqueda_disponible():
+        return jsonify({'success': False, 'error': 'Búsqueda no disponible'}), 503
+    
+    consulta = request.args.get('q', '').strip()
+    if not consulta:
+        return jsonify({'success': False, 'error': 'Debe indicar un texto a buscar'}), 400
+    
+    tipos = request.args.getlist('tipo') or None
+    pagina = max(request.args.get('pagina', 1, type=int), 1)
+    por_pagina = max(1, min(request.args.get('por_pagina', 20, type=int), 100))
+    
+    resultado = buscar_texto(consulta, tipos=tipos, pagina=pagina, por_pagina=por_pagina)
+    resultado['success'] = True
+    return jsonify(resultado)
+
 # ============= NOTIFICACIONES =============
 
 @comunicacion_bp.route("/notificaciones")
-@role_required('admin')
 def notificaciones():
     """Ver todas las notificaciones"""
     notificaciones = Notification.get_all()
@@ -243,10 +344,10 @@ def notificaciones():
 @login_required
 def notificaciones_no_leidas():
     """API: Obtener notificaciones no leídas"""
-    if current_user.has_role('admin'):
-        notificaciones = Notification.get_no_leidas()
+    if current_user.puede(permisos.VER_NOTIFICACIONES):
+        notificaciones = Notification.get_no_leidas(limit=20)
         return jsonify({
-            'count': len(notificaciones),
+            'count': Notification.contar_no_leidas(),
             'notificaciones': [n.to_dict() for n in notificaciones]
         })
     return jsonify({'count': 0, 'notificaciones': []})
@@ -255,11 +356,11 @@ def notificaciones_no_leidas():
 @login_required
 def marcar_notificacion_leida(id):
     """API: Marcar notificación como leída"""
-    if not current_user.has_role('admin'):
+    if not current_user.puede(permisos.VER_NOTIFICACIONES):
         return jsonify({'success': False, 'error': 'Permiso denegado'}), 403
         
     notificacion = Notification.query.get(id)
     if notificacion:
         notificacion.marcar_leido()
-        return jsonify({'success': True})
+        return jsonify({'success': True, 'count': Notification.contar_no_leidas()})
     return jsonify({'success': False, 'error': 'Notificación no encontrada'}), 404
\ No newline at end of file
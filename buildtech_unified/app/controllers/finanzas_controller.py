@@ -4,30 +4,36 @@ Controlador de Finanzas - Mejorado con funcionalidades completas
 Gestión de cargos mensuales, pagos, gastos y reportes financieros
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from utils.decorators import role_required
+from utils import permisos
 from models.finanzas_model import CargoMensual, PagoReserva, GastoEdificio, HistorialPago
+from models.departamento_model import Departamento
 from models.reservas_model import Reserva
 from models.user_model import User
 from datetime import date, datetime
 from decimal import Decimal
-import io
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from utils.reportes import servir_reporte
 
 finanzas_bp = Blueprint('finanzas', __name__, url_prefix='/financiera')
 
+# Los residentes solo ven y pagan los cargos de su departamento (ver puede_departamento)
+permisos.proteger_blueprint(finanzas_bp, {
+    'resumen_financiero': permisos.GESTIONAR_FINANZAS,
+    'gestionar_gastos': permisos.GESTIONAR_FINANZAS,
+    'eliminar_gasto': permisos.GESTIONAR_FINANZAS,
+    'reporte_mensual': permisos.GESTIONAR_FINANZAS,
+    'api_resumen_mes': permisos.GESTIONAR_FINANZAS,
+    'api_estadisticas': permisos.GESTIONAR_FINANZAS,
+    'api_departamentos': permisos.GESTIONAR_FINANZAS,
+    'pagar_pendiente': permisos.GESTIONAR_FINANZAS,
+}, por_defecto=permisos.USAR_FINANZAS)
+
 # ============================================================================
 # RESUMEN FINANCIERO
 # ============================================================================
 
 @finanzas_bp.route('/')
-@role_required('admin')
 def resumen_financiero():
     """
     Vista del resumen financiero general (solo admin)
@@ -37,9 +43,12 @@ def resumen_financiero():
     mes_actual = hoy.month
     anio_actual = hoy.year
     
+    # Contadores por unidad: una consulta sobre departamentos
+    estadisticas = Departamento.estadisticas()
+    
     # Obtener cargos mensuales
     cargos_pendientes = CargoMensual.get_all_pendientes()
-    total_pendiente_cargos = sum(cargo.total for cargo in cargos_pendientes)
+    total_pendiente_cargos = estadisticas['saldo_pendiente']
     
     # Obtener pagos de reservas pendientes
     pagos_reservas_pendientes = PagoReserva.get_pendientes()
@@ -60,9 +69,9 @@ def resumen_financiero():
     # Historial reciente
     historial_reciente = HistorialPago.get_all()[:10]
     
-    # NUEVO: Estadísticas adicionales
-    total_departamentos = len(set([c.departamento for c in CargoMensual.get_all()]))
-    tasa_morosidad = (len(cargos_pendientes) / max(total_departamentos, 1)) * 100
+    # NUEVO: Estadísticas adicionales (morosidad: unidades con cargos impagos)
+    total_departamentos = estadisticas['total_departamentos']
+    tasa_morosidad = estadisticas['tasa_morosidad']
     
     # NUEVO: Gastos por categoría
     gastos_por_categoria = {}
@@ -109,10 +118,9 @@ def calcular_cargos_mensuales(departamento_id):
     Mejorado con más información y opciones de pago
     """
     # Verificar permisos
-    if not current_user.has_role('admin'):
-        if current_user.departamento != departamento_id:
-            flash('No tienes permiso para ver esta información.', 'danger')
-            return redirect(url_for('auth.home'))
+    if not current_user.puede_departamento(departamento_id):
+        flash('No tienes permiso para ver esta información.', 'danger')
+        return redirect(url_for('auth.home'))
     
     # Obtener información del departamento/usuario
     usuario_dpto = User.query.filter_by(departamento=departamento_id).first()
@@ -123,6 +131,9 @@ def calcular_cargos_mensuales(departamento_id):
     # Obtener todos los cargos pendientes
     cargos_pendientes = CargoMensual.get_pendientes_by_departamento(departamento_id)
     
+    # Contadores de la unidad (saldo, meses impagos, último pago)
+    unidad = Departamento.get_by_numero(departamento_id)
+    
     # Obtener historial de pagos
     historial = HistorialPago.get_by_departamento(departamento_id)
     
@@ -139,16 +150,17 @@ def calcular_cargos_mensuales(departamento_id):
                 })
     
     # Calcular totales
-    total_pendiente = sum(cargo.total for cargo in cargos_pendientes)
+    total_pendiente = float(unidad.saldo_pendiente)
     total_reservas_pendiente = sum(item['pago'].monto for item in reservas_pendientes)
     total_pagado = sum(h.monto for h in historial)
     
     # NUEVO: Estadísticas del departamento
-    meses_con_deuda = len(cargos_pendientes)
+    meses_con_deuda = unidad.cargos_pendientes
     promedio_mensual = cargo_mes_actual.total if cargo_mes_actual else 0
     
     context = {
         'departamento': departamento_id,
+        'unidad': unidad,
         'usuario_dpto': usuario_dpto,
         'cargo_mes_actual': cargo_mes_actual,
         'cargos_pendientes': cargos_pendientes,
@@ -178,10 +190,9 @@ def pagar_cargo_pendiente(departamento_id, tipo_cargo, objeto_id):
     Mejorado con validaciones y confirmaciones
     """
     # Verificar permisos
-    if not current_user.has_role('admin'):
-        if current_user.departamento != departamento_id:
-            flash('No tienes permiso para realizar esta acción.', 'danger')
-            return redirect(url_for('auth.home'))
+    if not current_user.puede_departamento(departamento_id):
+        flash('No tienes permiso para realizar esta acción.', 'danger')
+        return redirect(url_for('auth.home'))
     
     if tipo_cargo == 'cargo_mensual':
         cargo = CargoMensual.get_by_id(objeto_id)
@@ -307,7 +318,6 @@ def pagar_cargo_pendiente(departamento_id, tipo_cargo, objeto_id):
 # ============================================================================
 
 @finanzas_bp.route('/gastos/', methods=['GET', 'POST'])
-@role_required('admin')
 def gestionar_gastos():
     """
     Gestionar gastos del edificio - MEJORADO
@@ -371,7 +381,6 @@ def gestionar_gastos():
 
 
 @finanzas_bp.route('/gastos/eliminar/<int:gasto_id>/', methods=['POST'])
-@role_required('admin')
 def eliminar_gasto(gasto_id):
     """Eliminar un gasto"""
     gasto = GastoEdificio.get_by_id(gasto_id)
@@ -389,7 +398,6 @@ def eliminar_gasto(gasto_id):
 # ============================================================================
 
 @finanzas_bp.route('/reporte_mensual/<int:mes>/<int:anio>/')
-@role_required('admin')
 def reporte_mensual(mes, anio):
     """
     Generar reporte mensual en PDF
@@ -398,98 +406,22 @@ def reporte_mensual(mes, anio):
     ingresos_cargos = CargoMensual.get_total_recaudado_mes(mes, anio)
     ingresos_reservas = PagoReserva.get_total_recaudado_reservas(mes, anio)
     gastos = GastoEdificio.get_by_mes(mes, anio)
-    total_gastos = sum(float(g.monto) for g in gastos)
-    
-    # Crear PDF
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-    
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2c3e50'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    # Título
-    mes_nombre = datetime(anio, mes, 1).strftime('%B %Y')
-    title = Paragraph(f"REPORTE FINANCIERO<br/>{mes_nombre.upper()}", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Tabla de resumen
-    data_resumen = [
-        ['CONCEPTO', 'MONTO (Bs.)'],
-        ['Ingresos por Cargos Mensuales', f'{ingresos_cargos:,.2f}'],
-        ['Ingresos por Reservas', f'{ingresos_reservas:,.2f}'],
-        ['TOTAL INGRESOS', f'{ingresos_cargos + ingresos_reservas:,.2f}'],
-        ['', ''],
-        ['TOTAL GASTOS', f'{total_gastos:,.2f}'],
-        ['', ''],
-        ['BALANCE', f'{(ingresos_cargos + ingresos_reservas) - total_gastos:,.2f}'],
-    ]
-    
-    table_resumen = Table(data_resumen, colWidths=[4*inch, 2*inch])
-    table_resumen.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 2), (-1, 2), colors.lightblue),
-        ('BACKGROUND', (0, 4), (-1, 4), colors.lightcoral),
-        ('BACKGROUND', (0, 6), (-1, 6), colors.lightgreen),
-        ('FONTNAME', (0, 2), (-1, 2), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 4), (-1, 4), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 6), (-1, 6), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(table_resumen)
-    elements.append(PageBreak())
-    
-    # Detalle de gastos
-    if gastos:
-        elements.append(Paragraph("DETALLE DE GASTOS", styles['Heading2']))
-        elements.append(Spacer(1, 0.2*inch))
-        
-        data_gastos = [['Fecha', 'Concepto', 'Categoría', 'Monto (Bs.)']]
-        for gasto in gastos:
-            data_gastos.append([
-                gasto.fecha_gasto.strftime('%d/%m/%Y'),
-                gasto.concepto[:40],
-                gasto.categoria,
-                f'{float(gasto.monto):,.2f}'
-            ])
-        
-        table_gastos = Table(data_gastos, colWidths=[1*inch, 3*inch, 1.5*inch, 1.5*inch])
-        table_gastos.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (3, 0), (3, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(table_gastos)
-    
-    doc.build(elements)
-    buffer.seek(0)
     
-    return send_file(
-        buffer,
-        mimetype='application/pdf',
-        as_attachment=True,
-        download_name=f'reporte_financiero_{mes}_{anio}.pdf'
-    )
+    # Instantánea de los datos: el PDF se regenera solo si cambian
+    datos = {
+        'mes': mes,
+        'anio': anio,
+        'ingresos_cargos': float(ingresos_cargos),
+        'ingresos_reservas': float(ingresos_reservas),
+        'gastos': [{
+            'id': g.id,
+            'fecha': g.fecha_gasto.strftime('%d/%m/%Y'),
+            'concepto': g.concepto,
+            'categoria': g.categoria,
+            'monto': float(g.monto)
+        } for g in gastos]
+    }
+    return servir_reporte('finanzas', f'{mes}_{anio}', datos)
 
 
 # ============================================================================
@@ -497,7 +429,6 @@ def reporte_mensual(mes, anio):
 # ============================================================================
 
 @finanzas_bp.route('/api/resumen_mes/<int:mes>/<int:anio>')
-@role_required('admin')
 def api_resumen_mes(mes, anio):
     """
     API para obtener resumen financiero de un mes específico
@@ -518,27 +449,54 @@ def api_resumen_mes(mes, anio):
 
 
 @finanzas_bp.route('/api/estadisticas/')
-@role_required('admin')
 def api_estadisticas():
     """
     API para obtener estadísticas generales
     """
     hoy = date.today()
+    estadisticas = Departamento.estadisticas()
     
     return jsonify({
-        'total_pendiente': sum(c.total for c in CargoMensual.get_all_pendientes()),
-        'total_departamentos': len(set([c.departamento for c in CargoMensual.get_all()])),
+        'total_pendiente': estadisticas['saldo_pendiente'],
+        'total_departamentos': estadisticas['total_departamentos'],
+        'departamentos_morosos': estadisticas['departamentos_morosos'],
+        'tasa_morosidad': estadisticas['tasa_morosidad'],
         'ingresos_mes_actual': CargoMensual.get_total_recaudado_mes(hoy.month, hoy.year),
         'gastos_mes_actual': GastoEdificio.get_total_mes(hoy.month, hoy.year),
     })
 
 
+@finanzas_bp.route('/api/departamentos/')
+def api_departamentos():
+    """
+    API con los contadores de todas las unidades (?morosos=1 solo las que deben)
+    """
+    if request.args.get('morosos'):
+        departamentos = Departamento.get_morosos()
+    else:
+        departamentos = Departamento.get_all()
+    return jsonify({'departamentos': [d.to_dict() for d in departamentos]})
+
+
+@finanzas_bp.route('/api/departamento/<int:departamento_id>')
+def api_departamento(departamento_id):
+    """
+    API con los contadores de una unidad (el residente, solo la suya)
+    """
+    if not current_user.puede_departamento(departamento_id):
+        return jsonify({'error': 'Permiso denegado'}), 403
+    
+    unidad = Departamento.get_by_numero(departamento_id)
+    if not unidad:
+        return jsonify({'error': 'Departamento no encontrado'}), 404
+    return jsonify(unidad.to_dict())
+
+
 # ============================================================================
 # PAGO RÁPIDO (ADMIN)
 # ============================================================================
 
 @finanzas_bp.route('/pagar/<string:tipo_pago>/<int:pk>/', methods=['POST'])
-@role_required('admin')
 def pagar_pendiente(tipo_pago, pk):
     """
     Marcar un pago como realizado (ruta rápida para admin desde el resumen)
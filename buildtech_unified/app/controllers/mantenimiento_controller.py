@@ -1,24 +1,37 @@
-from flask import Blueprint, request, redirect, url_for, flash, Response, current_app
-from models.mantenimiento_model import Mantenimiento
+from flask import Blueprint, request, redirect, url_for, flash, Response, current_app, jsonify, stream_with_context
+from models.mantenimiento_model import Mantenimiento, Evidencia, PlanPreventivo, ORDENES_TICKETS, UNIDADES_PLAN, cache_sla
 from views import mantenimiento_view
 from datetime import datetime
-from werkzeug.utils import secure_filename
-import os
-# Importar el decorador de roles y login_required
-from utils.decorators import role_required
 from flask_login import login_required, current_user 
-
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-from io import BytesIO
+from utils import permisos
+from utils.reportes import servir_reporte
+from utils import exportacion_tickets
+from models.sla_model import metricas_sla, meses_entre, AGRUPACIONES
+from utils.programador_preventivo import ejecutar_planes
+from utils.asignacion import indice_carga, sugerir_responsables
+from utils.detalle_ticket import obtener_detalle, MENSAJES_POR_DEFECTO
+from models.personal_model import Personal
+from utils.evidencias import obtener_almacen_evidencias, enviar_evidencia, VARIANTES
+from database import db
 
 mantenimiento_bp = Blueprint("mantenimiento", __name__)
 
+# Todos los usuarios ven, crean y siguen tickets; el resto es administración
+permisos.proteger_blueprint(mantenimiento_bp, {
+    'exportar_tickets': permisos.EXPORTAR_MANTENIMIENTO,       # Listado completo
+    'list_planes': permisos.GESTIONAR_MANTENIMIENTO,
+    'toggle_plan': permisos.GESTIONAR_MANTENIMIENTO,
+    'generar_planes': permisos.GESTIONAR_MANTENIMIENTO,
+    'list_personal': permisos.GESTIONAR_MANTENIMIENTO,
+    'api_sugerir_responsable': permisos.GESTIONAR_MANTENIMIENTO,
+    'update_ticket_ini': permisos.GESTIONAR_MANTENIMIENTO,     # Iniciar el mantenimiento
+    'update_ticket_fin': permisos.GESTIONAR_MANTENIMIENTO,     # Finalizar el mantenimiento
+    'delete_ticket': permisos.GESTIONAR_MANTENIMIENTO,
+    'api_almacenamiento': permisos.METRICAS_MANTENIMIENTO,
+    'api_sla': permisos.METRICAS_MANTENIMIENTO,
+}, por_defecto=permisos.USAR_MANTENIMIENTO)
+
 # Configuración de subida de archivos
-UPLOAD_FOLDER = 'static/uploads/evidencias'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
 def allowed_file(filename):
@@ -29,11 +42,92 @@ def get_socketio():
     # Usar get en lugar de un acceso directo para evitar errores si no está cargado
     return current_app.extensions.get('socketio')
 
+TICKETS_POR_PAGINA = 25
+
+def _filtros_lista():
+    """Lee los filtros de la lista de tickets desde la query string"""
+    def fecha(nombre):
+        valor = request.args.get(nombre)
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+        except ValueError:
+            return None
+    
+    orden = request.args.get('orden')
+    estado = request.args.get('estado')
+    return {
+        'prioridad': request.args.get('prioridad') or None,
+        'responsable': request.args.get('responsable') or None,
+        'estado': estado if estado in ('abiertos', 'cerrados') else None,
+        'desde': fecha('desde'),
+        'hasta': fecha('hasta'),
+        'orden': orden if orden in ORDENES_TICKETS else 'recientes',
+    }
+
+def _buscar_tickets(filtros):
+    despues_de = request.args.get('despues_de', type=int)
+    limite = min(request.args.get('limite', TICKETS_POR_PAGINA, type=int), 100)
+    return Mantenimiento.buscar(despues_de=despues_de, limite=max(limite, 1), **filtros)
+
 @mantenimiento_bp.route("/mantenimiento")
 @login_required # Todos los usuarios logueados pueden ver la lista
 def list_mantenimiento():
-    mantenimientos = Mantenimiento.get_all()
-    return mantenimiento_view.list_ticket(mantenimientos)
+    filtros = _filtros_lista()
+    mantenimientos, siguiente = _buscar_tickets(filtros)
+    return mantenimiento_view.list_ticket(
+        mantenimientos,
+        filtros=filtros,
+        siguiente=siguiente,
+        responsables=Mantenimiento.get_responsables(),
+        es_continuacion=bool(request.args.get('despues_de'))
+    )
+
+@mantenimiento_bp.route("/mantenimiento/api/tickets")
+@login_required
+def api_tickets():
+    """API: Lista de tickets con los mismos filtros que la vista (para tableros)"""
+    filtros = _filtros_lista()
+    mantenimientos, siguiente = _buscar_tickets(filtros)
+    return jsonify({
+        'tickets': [t.to_dict() for t in mantenimientos],
+        'siguiente': siguiente,
+        'hay_mas': siguiente is not None
+    })
+
+@mantenimiento_bp.route("/mantenimiento/exportar")
+def exportar_tickets():
+    """Exporta todos los tickets que cumplen los filtros de la lista (CSV, PDF o XLSX)"""
+    filtros = _filtros_lista()
+    formato = request.args.get('formato', 'csv')
+    
+    if formato == 'csv':
+        # Se escribe mientras se leen las filas: la respuesta no se arma en memoria
+        nombre = f"tickets_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+        return Response(
+            stream_with_context(exportacion_tickets.filas_csv(db.session, filtros)),
+            mimetype='text/csv; charset=utf-8',
+            headers={'Content-Disposition': f'attachment; filename={nombre}'}
+        )
+    
+    if formato not in ('pdf', 'xlsx'):
+        flash("Formato de exportación no válido.", "error")
+        return redirect(url_for("mantenimiento.list_mantenimiento"))
+    if formato == 'xlsx' and not exportacion_tickets.xlsx_disponible():
+        flash("La exportación a Excel no está disponible en este servidor.", "error")
+        return redirect(url_for("mantenimiento.list_mantenimiento"))
+    
+    # PDF y XLSX se generan en el pool de reportes, con su propia conexión.
+    # La clave depende de los filtros y de la huella de los tickets; la URI
+    # de la base y la hora van aparte, fuera de la clave
+    datos = {
+        'filtros': exportacion_tickets.filtros_a_texto(filtros),
+        'huella': exportacion_tickets.huella(db.session, filtros),
+    }
+    contexto = {
+        'db_uri': db.engine.url.render_as_string(hide_password=False),
+        'solicitado': datetime.now().strftime('%Y-%m-%d %H:%M'),
+    }
+    return servir_reporte(f'tickets_{formato}', f'u{current_user.id}', datos, contexto=contexto)
 
 @mantenimiento_bp.route("/mantenimiento/crear", methods=["GET", "POST"])
 @login_required # Todos los usuarios logueados pueden crear tickets
@@ -43,7 +137,7 @@ def create_ticket():
         prioridad = request.form["prioridad"]
 
         ticket = Mantenimiento(descripcion=descripcion, prioridad=prioridad)
-        ticket.save()
+        ticket.save(user_id=current_user.id)
         
         # Notificar al admin sobre el nuevo ticket
         socketio = get_socketio()
@@ -57,8 +151,79 @@ def create_ticket():
     
     return mantenimiento_view.crear_ticket()
 
+# ============= MANTENIMIENTO PREVENTIVO =============
+
+@mantenimiento_bp.route("/mantenimiento/planes", methods=["GET", "POST"])
+def list_planes():
+    """Planes preventivos: lista y alta"""
+    if request.method == "POST":
+        try:
+            cada = int(request.form.get("cada", 0))
+            unidad = request.form.get("unidad", "dias")
+            proxima = request.form.get("proxima_fecha")
+            plan = PlanPreventivo(
+                nombre=request.form["nombre"].strip(),
+                descripcion=request.form["descripcion"].strip(),
+                cada=cada,
+                unidad=unidad if unidad in UNIDADES_PLAN else "dias",
+                proxima_fecha=datetime.strptime(proxima, "%Y-%m-%d").date() if proxima else None,
+                prioridad=request.form.get("prioridad", "Media"),
+                responsable=request.form.get("responsable", "").strip()
+            )
+            plan.save()
+            flash("Plan preventivo creado correctamente.", "success")
+        except (ValueError, KeyError):
+            flash("Revise los datos del plan: la frecuencia debe ser un número mayor a cero.", "danger")
+        return redirect(url_for("mantenimiento.list_planes"))
+    
+    return mantenimiento_view.list_planes(PlanPreventivo.get_all())
+
+@mantenimiento_bp.route("/mantenimiento/planes/<int:id>/activo", methods=["POST"])
+def toggle_plan(id):
+    plan = PlanPreventivo.get_by_id(id)
+    if not plan:
+        flash("Plan no encontrado.", "error")
+    else:
+        plan.cambiar_activo()
+        flash(f"Plan {'activado' if plan.activo else 'pausado'}.", "success")
+    return redirect(url_for("mantenimiento.list_planes"))
+
+@mantenimiento_bp.route("/mantenimiento/planes/generar", methods=["POST"])
+def generar_planes():
+    """Genera ahora los tickets de los planes vencidos (sin esperar al programador)"""
+    tickets = ejecutar_planes(get_socketio(), user_id=current_user.id)
+    flash(f"Tickets preventivos generados: {len(tickets)}.", "success" if tickets else "info")
+    return redirect(url_for("mantenimiento.list_planes"))
+
+# ============= PERSONAL Y ASIGNACIÓN =============
+
+@mantenimiento_bp.route("/mantenimiento/personal", methods=["GET", "POST"])
+def list_personal():
+    """Personal de mantenimiento con su carga actual; permite ajustar capacidad"""
+    if request.method == "POST":
+        miembro = Personal.get_by_id(request.form.get("personal_id", type=int) or 0)
+        if not miembro:
+            flash("Miembro del personal no encontrado.", "error")
+        else:
+            miembro.especialidad = request.form.get("especialidad", "").strip() or None
+            miembro.capacidad = max(request.form.get("capacidad", miembro.capacidad, type=int), 1)
+            miembro.activo = request.form.get("activo") == "si"
+            miembro.update()
+            flash("Personal actualizado.", "success")
+        return redirect(url_for("mantenimiento.list_personal"))
+    
+    Personal.sincronizar_usuarios()
+    personal = Personal.get_all()
+    cargas = {p.id: indice_carga.carga(p.id) for p in personal}
+    return mantenimiento_view.list_personal(personal, cargas)
+
+@mantenimiento_bp.route("/mantenimiento/api/sugerir_responsable")
+def api_sugerir_responsable():
+    """API: Miembros del personal menos cargados para asignar un ticket"""
+    cantidad = min(max(request.args.get('cantidad', 3, type=int), 1), 20)
+    return jsonify({'sugerencias': sugerir_responsables(cantidad)})
+
 @mantenimiento_bp.route("/mantenimiento/actualizar_ini/<int:id>", methods=["GET", "POST"])
-@role_required('admin') # Solo los administradores pueden iniciar el mantenimiento
 def update_ticket_ini(id):
     ticket = Mantenimiento.get_by_id(id)
     if not ticket:
@@ -67,6 +232,7 @@ def update_ticket_ini(id):
     
     if request.method == "POST":
         responsable = request.form.get("responsable")
+        personal = Personal.get_by_id(request.form.get("personal_id", type=int) or 0)
         fecha_ini_str = request.form.get("fecha_ini")
         fecha_fin_str = request.form.get("fecha_fin")
         costo_str = request.form.get("costo")
@@ -82,7 +248,9 @@ def update_ticket_ini(id):
                 fecha_ini=fecha_ini, 
                 fecha_fin=fecha_fin, 
                 costo=costo, 
-                prioridad=prioridad
+                prioridad=prioridad,
+                user_id=current_user.id,
+                personal=personal if personal and personal.activo else None
             )
 
             # Notificar actualización
@@ -97,10 +265,13 @@ def update_ticket_ini(id):
             # Usar 'danger' o 'error' para mensajes de fallo
             flash(f"Error al actualizar el ticket: {str(e)}", "danger") 
     
-    return mantenimiento_view.update_ticket_ini(ticket)
+    return mantenimiento_view.update_ticket_ini(
+        ticket,
+        sugerencias=sugerir_responsables(3),
+        personal=[p for p in Personal.get_all() if p.activo]
+    )
 
 @mantenimiento_bp.route("/mantenimiento/actualizar_fin/<int:id>", methods=["GET", "POST"])
-@role_required('admin') # Solo los administradores pueden finalizar el mantenimiento
 def update_ticket_fin(id):
     ticket = Mantenimiento.get_by_id(id)
     if not ticket:
@@ -116,25 +287,30 @@ def update_ticket_fin(id):
         if 'evidencia_url' in request.files:
             file = request.files['evidencia_url']
             if file and file.filename != '':
-                if allowed_file(file.filename):
-                    # Uso de current_user.id para asegurar unicidad del nombre de archivo
-                    filename = secure_filename(f"ticket_{id}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
-                    
-                    # Crear directorio si no existe (ya se hace en run.py, pero es buena práctica)
-                    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-                    
-                    filepath = os.path.join(UPLOAD_FOLDER, filename)
-                    file.save(filepath)
-                    # La URL pública debe coincidir con la configuración del servidor web
-                    evidencia_url = f"/static/uploads/evidencias/{filename}" 
-                else:
+                if not allowed_file(file.filename):
                     flash("Tipo de archivo no permitido para la evidencia.", "danger")
                     return redirect(url_for("mantenimiento.update_ticket_fin", id=id))
+                
+                # Se copia por bloques al almacén; una imagen repetida no ocupa espacio extra
+                almacen = obtener_almacen_evidencias()
+                try:
+                    clave, extension, tamano, _ = almacen.guardar(file.stream)
+                except ValueError as e:
+                    flash(f"Evidencia no válida: {e}.", "danger")
+                    return redirect(url_for("mantenimiento.update_ticket_fin", id=id))
+                
+                Evidencia.registrar(
+                    ticket.id_mantenimiento, clave, extension, tamano,
+                    nombre_original=file.filename[:255], user_id=current_user.id
+                )
+                almacen.encargar_variantes(clave, extension)
+                evidencia_url = url_for("mantenimiento.ver_evidencia", clave=clave)
 
         try:
             ticket.update_mantenimiento_fin(
                 trabajo_realizado=trabajo_realizado, 
-                evidencia_url=evidencia_url
+                evidencia_url=evidencia_url,
+                user_id=current_user.id
             )
             
             # Notificar finalización
@@ -151,7 +327,6 @@ def update_ticket_fin(id):
     return mantenimiento_view.update_ticket_fin(ticket)
 
 @mantenimiento_bp.route("/mantenimiento/delete/<int:id>", methods=["POST"])
-@role_required('admin') # Solo los administradores pueden eliminar tickets
 def delete_ticket(id):
     ticket = Mantenimiento.get_by_id(id)
     if not ticket:
@@ -164,7 +339,16 @@ def delete_ticket(id):
         from socket_events import notify_ticket_updated
         notify_ticket_updated(socketio, ticket, 'eliminado')
     
+    archivos = {e.clave: e.extension for e in ticket.evidencias}
     ticket.delete()
+    
+    # Borrar del disco las imágenes que ya no usa ningún ticket
+    almacen = obtener_almacen_evidencias()
+    en_uso = Evidencia.en_uso(list(archivos))
+    for clave, extension in archivos.items():
+        if clave not in en_uso:
+            almacen.eliminar(clave, extension)
+    
     flash("Ticket eliminado correctamente.", "success")
     return redirect(url_for("mantenimiento.list_mantenimiento"))
 
@@ -177,7 +361,70 @@ def generate_ticket(id):
         return redirect(url_for("mantenimiento.list_mantenimiento"))
     
     # Renderiza la vista de detalle (no genera el PDF todavía)
-    return mantenimiento_view.generate_ticket(ticket) 
+    uso = Evidencia.uso_por_ticket([id]).get(id)
+    return mantenimiento_view.generate_ticket(ticket, uso_evidencias=uso)
+
+@mantenimiento_bp.route("/mantenimiento/api/ticket/<int:id>")
+@login_required
+def api_detalle_ticket(id):
+    """API: Ticket con historial, evidencias, últimos mensajes y notificaciones"""
+    detalle, etag = obtener_detalle(
+        id,
+        mensajes=request.args.get('mensajes', MENSAJES_POR_DEFECTO, type=int),
+        admin=current_user.puede(permisos.VER_NOTIFICACIONES)
+    )
+    if detalle is None:
+        return jsonify({'error': 'Ticket no encontrado'}), 404
+    
+    if etag in request.if_none_match:
+        respuesta = Response(status=304)
+    else:
+        respuesta = jsonify(detalle)
+    respuesta.set_etag(etag)
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+@mantenimiento_bp.route("/mantenimiento/evidencia/<clave>")
+@mantenimiento_bp.route("/mantenimiento/evidencia/<clave>/<variante>")
+@login_required
+def ver_evidencia(clave, variante=None):
+    """Sirve una evidencia (original o variante reducida) con caché y rangos"""
+    evidencia = Evidencia.get_por_clave(clave)
+    if not evidencia or (variante and variante not in VARIANTES):
+        return jsonify({'error': 'Evidencia no encontrada'}), 404
+    return enviar_evidencia(evidencia.clave, evidencia.extension, variante)
+
+@mantenimiento_bp.route("/mantenimiento/api/almacenamiento")
+def api_almacenamiento():
+    """API: Espacio ocupado por las evidencias, por ticket y en total"""
+    return jsonify({
+        'tickets': Evidencia.uso_por_ticket(),
+        'total': Evidencia.uso_total()
+    })
+
+@mantenimiento_bp.route("/mantenimiento/api/sla")
+def api_sla():
+    """API: Tiempos de inicio y fin, percentiles e incumplimientos por mes (tablero SLA)"""
+    hoy = datetime.utcnow()
+    hasta = request.args.get('hasta') or hoy.strftime('%Y-%m')
+    desde = request.args.get('desde') or f'{hoy.year - 1}-{hoy.month:02d}'
+    agrupar = request.args.get('agrupar', 'prioridad')
+    try:
+        meses = meses_entre(desde, hasta)
+    except ValueError:
+        return jsonify({'error': 'Use meses con formato AAAA-MM'}), 400
+    if agrupar not in AGRUPACIONES or not meses or len(meses) > 36:
+        return jsonify({'error': 'Parámetros no válidos (máximo 36 meses)'}), 400
+    
+    objetivos = current_app.config['SLA_OBJETIVOS_HORAS']
+    return jsonify({
+        'desde': desde,
+        'hasta': hasta,
+        'agrupar': agrupar,
+        'objetivos_horas': objetivos,
+        'meses': metricas_sla(desde, hasta, agrupar=agrupar, objetivos=objetivos),
+        'cache': cache_sla().estadisticas()
+    })
 
 # Esta ruta genera el PDF
 @mantenimiento_bp.route("/mantenimiento/ticket/<int:id>/download")
@@ -188,51 +435,16 @@ def download_report(id):
         flash("Ticket no encontrado.", "error")
         return redirect(url_for("mantenimiento.list_mantenimiento"))
 
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-
-    styles = getSampleStyleSheet()
-    title_style = styles['Heading1']
-    # Configurar el estilo del título
-    title_style.alignment = 1 # Centro
-
-    # Título
-    elements.append(Paragraph("REPORTE DE MANTENIMIENTO", title_style))
-    elements.append(Spacer(1, 0.3*inch))
-
-    # Crear tabla con la información
-    data = [
-        ['ID Ticket:', str(ticket.id_mantenimiento)],
-        ['Descripción:', ticket.descripcion or 'N/A'],
-        ['Prioridad:', ticket.prioridad or 'N/A'],
-        ['Responsable:', ticket.responsable or 'N/A'],
-        ['Fecha Inicio:', str(ticket.fecha_ini) if ticket.fecha_ini else 'N/A'],
-        ['Fecha Fin:', str(ticket.fecha_fin) if ticket.fecha_fin else 'N/A'],
-        ['Costo:', f'${ticket.costo}' if ticket.costo else 'N/A'],
-        ['Trabajo Realizado:', 'Sí' if ticket.trabajo_realizado else 'No'],
-        ['Evidencia:', 'Disponible' if ticket.evidencia_url else 'No disponible'],
-    ]
-
-    table = Table(data, colWidths=[2*inch, 4*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.grey),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('BACKGROUND', (1, 0), (1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-
-    elements.append(table)
-
-    doc.build(elements)
-    buffer.seek(0)
-
-    return Response(
-        buffer, 
-        mimetype='application/pdf', 
-        headers={"Content-Disposition": f"attachment;filename=ticket_{ticket.id_mantenimiento}.pdf"}
-    )
\ No newline at end of file
+    # Instantánea de los datos: si no cambian, se reutiliza el PDF guardado
+    datos = {
+        'id': ticket.id_mantenimiento,
+        'descripcion': ticket.descripcion,
+        'prioridad': ticket.prioridad,
+        'responsable': ticket.responsable,
+        'fecha_ini': str(ticket.fecha_ini) if ticket.fecha_ini else None,
+        'fecha_fin': str(ticket.fecha_fin) if ticket.fecha_fin else None,
+        'costo': str(ticket.costo) if ticket.costo else None,
+        'trabajo_realizado': bool(ticket.trabajo_realizado),
+        'evidencia_url': ticket.evidencia_url,
+    }
+    return servir_reporte('ticket', ticket.id_mantenimiento, datos)
\ No newline at end of file
@@ -0,0 +1,54 @@
+# app/controllers/reportes_controller.py
+from flask import Blueprint, redirect, url_for, flash, jsonify
+from flask_login import login_required, current_user
+from utils.reportes import obtener_almacen, enviar_reporte, pagina_espera, PATRON_CLAVE
+from utils import permisos
+
+reportes_bp = Blueprint("reportes", __name__, url_prefix="/reportes")
+
+permisos.proteger_blueprint(reportes_bp, {}, por_defecto=permisos.DESCARGAR_REPORTES)
+
+# Tipos de reporte restringidos a administradores
+TIPOS_ADMIN = {'finanzas'}
+
+def _autorizado(clave):
+    coincidencia = PATRON_CLAVE.match(clave)
+    if not coincidencia:
+        return False
+    return coincidencia.group('tipo') not in TIPOS_ADMIN or current_user.puede(permisos.REPORTES_ADMIN)
+
+@reportes_bp.route("/<clave>")
+@login_required
+def descargar(clave):
+    """Descarga un reporte generado, o muestra la página de espera si sigue en curso"""
+    if not _autorizado(clave):
+        flash("Reporte no encontrado.", "error")
+        return redirect(url_for('auth.home'))
+    
+    estado = obtener_almacen().estado(clave)
+    if estado == 'listo':
+        return enviar_reporte(clave)
+    if estado == 'pendiente':
+        return pagina_espera(clave)
+    
+    if estado == 'error':
+        flash("No se pudo generar el reporte. Intente nuevamente.", "error")
+    else:
+        flash("El reporte ya no está disponible. Vuelva a solicitarlo.", "warning")
+    return redirect(url_for('auth.home'))
+
+@reportes_bp.route("/<clave>/estado")
+@login_required
+def estado(clave):
+    """API: Estado de un reporte (para consultar periódicamente)"""
+    if not _autorizado(clave):
+        return jsonify({'error': 'Reporte no encontrado'}), 404
+    
+    estado = obtener_almacen().estado(clave)
+    if estado is None:
+        return jsonify({'error': 'Reporte no encontrado'}), 404
+    return jsonify({
+        'clave': clave,
+        'estado': estado,
+        'url': url_for('reportes.descargar', clave=clave)
+    })
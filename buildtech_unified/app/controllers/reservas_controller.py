@@ -6,7 +6,7 @@ Gestión de reservas de áreas comunes
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from utils.decorators import role_required
+from utils import permisos
 from models.reservas_model import AreaComun, Reserva
 from models.finanzas_model import PagoReserva
 from datetime import datetime, date, time
@@ -14,6 +14,13 @@ from utils.email_utils import enviar_email_confirmacion_reserva
 
 reservas_bp = Blueprint('reservas', __name__)
 
+permisos.proteger_blueprint(reservas_bp, {
+    'reservas_admin': permisos.GESTIONAR_RESERVAS,
+    'gestionar_areas': permisos.GESTIONAR_RESERVAS,
+    'editar_area': permisos.GESTIONAR_RESERVAS,
+    'toggle_area': permisos.GESTIONAR_RESERVAS,
+}, por_defecto=permisos.USAR_RESERVAS)
+
 @reservas_bp.route('/reservas/', methods=['GET', 'POST'])
 @login_required
 def reservas():
@@ -104,7 +111,6 @@ def reservas():
 
 
 @reservas_bp.route('/reservas_admin/')
-@role_required('admin')
 def reservas_admin():
     """
     Vista de administración de todas las reservas
@@ -150,10 +156,7 @@ def eliminar_reserva(reserva_id):
         return redirect(url_for('reservas.reservas'))
     
     # Verificar permisos
-    puede_eliminar = (
-        current_user.has_role('admin') or 
-        current_user.departamento == reserva.departamento
-    )
+    puede_eliminar = current_user.puede_departamento(reserva.departamento)
     
     if not puede_eliminar:
         flash('No tienes permiso para eliminar esta reserva.', 'danger')
@@ -165,7 +168,7 @@ def eliminar_reserva(reserva_id):
     
     flash('Reserva cancelada exitosamente.', 'success')
     
-    if current_user.has_role('admin'):
+    if current_user.puede(permisos.GESTIONAR_RESERVAS):
         return redirect(url_for('reservas.reservas_admin'))
     else:
         return redirect(url_for('reservas.reservas'))
@@ -184,10 +187,7 @@ def editar_reserva(reserva_id):
         return redirect(url_for('reservas.reservas'))
     
     # Verificar permisos
-    puede_editar = (
-        current_user.has_role('admin') or 
-        current_user.departamento == reserva.departamento
-    )
+    puede_editar = current_user.puede_departamento(reserva.departamento)
     
     if not puede_editar:
         flash('No tienes permiso para editar esta reserva.', 'danger')
@@ -241,7 +241,7 @@ def editar_reserva(reserva_id):
             except ValueError as e:
                 flash(f'Error en los datos: {str(e)}', 'danger')
         
-        if current_user.has_role('admin'):
+        if current_user.puede(permisos.GESTIONAR_RESERVAS):
             return redirect(url_for('reservas.reservas_admin'))
         else:
             return redirect(url_for('reservas.reservas'))
@@ -298,7 +298,6 @@ def horarios_disponibles(area_id):
 
 
 @reservas_bp.route('/areas/', methods=['GET', 'POST'])
-@role_required('admin')
 def gestionar_areas():
     """
     Administrar áreas comunes (solo admin)
@@ -342,7 +341,6 @@ def gestionar_areas():
 
 
 @reservas_bp.route('/area/<int:area_id>/editar', methods=['POST'])
-@role_required('admin')
 def editar_area(area_id):
     """
     Editar un área común
@@ -372,7 +370,6 @@ def editar_area(area_id):
 
 
 @reservas_bp.route('/area/<int:area_id>/toggle', methods=['POST'])
-@role_required('admin')
 def toggle_area(area_id):
     """
     Habilitar/Deshabilitar un área
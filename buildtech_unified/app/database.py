@@ -1,4 +1,10 @@
 # app/database.py
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+
+def insert_dialecto(bind):
+    """insert() del dialecto de la conexión, con on_conflict_do_* (PostgreSQL o SQLite)"""
+    return postgresql.insert if bind.dialect.name == 'postgresql' else sqlite.insert
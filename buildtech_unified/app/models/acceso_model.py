@@ -0,0 +1,142 @@
+# app/models/acceso_model.py
+"""
+Límite de intentos de inicio de sesión
+Ventana deslizante aproximada con dos contadores por clave ('ip:...' o
+'usuario:...'): los fallos de la ventana fija actual y los de la anterior,
+ponderados por la parte de la ventana anterior que aún cae dentro del
+intervalo. Cada clave es una fila de tamaño fijo en la base compartida,
+así que el límite vale para todos los procesos y sobrevive a reinicios.
+"""
+
+import time
+from sqlalchemy import case, delete, select
+from database import db, insert_dialecto
+
+# Fallos registrados entre cada compactación automática
+COMPACTAR_CADA = 1000
+
+
+class IntentoLogin(db.Model):
+    __tablename__ = 'intentos_login'
+    __table_args__ = (
+        db.Index('ix_intentos_login_ventana', 'ventana'),
+    )
+
+    clave = db.Column(db.String(150), primary_key=True)  # 'ip:1.2.3.4' o 'usuario:nombre'
+    ventana = db.Column(db.Integer, nullable=False)       # Número de la ventana fija actual
+    actual = db.Column(db.Integer, nullable=False, default=0)
+    anterior = db.Column(db.Integer, nullable=False, default=0)
+
+
+def claves_login(ip, username):
+    claves = {}
+    if ip:
+        claves['ip'] = f'ip:{ip}'
+    if username:
+        claves['usuario'] = f'usuario:{username.strip().lower()[:130]}'
+    return claves
+
+
+class LimiteLogin:
+    """Comprueba y registra fallos de login por IP y por usuario"""
+
+    def __init__(self, limites, segundos=300):
+        self.limites = limites  # {'ip': 20, 'usuario': 5}
+        self.segundos = segundos
+        self._fallos = 0
+
+    def _ventana(self, ahora):
+        return int(ahora // self.segundos), (ahora % self.segundos) / self.segundos
+
+    def _contadores(self, fila, ventana):
+        """(fallos de la ventana anterior, fallos de la actual) vistos desde 'ventana'"""
+        if fila.ventana == ventana:
+            return fila.anterior, fila.actual
+        if fila.ventana == ventana - 1:
+            return fila.actual, 0
+        return 0, 0
+
+    def _espera(self, anterior, actual, limite, avance):
+        """Segundos hasta que la estimación baje del límite"""
+        if actual < limite and anterior:
+            # Dentro de esta ventana: anterior * (1 - f) + actual < limite
+            fraccion = 1 - (limite - actual) / anterior
+            if fraccion < 1:
+                return max(fraccion - avance, 0) * self.segundos
+        # En la próxima ventana lo actual pasa a ser lo anterior
+        fraccion = 1 - limite / actual if actual else 0
+        return (1 - avance + max(fraccion, 0)) * self.segundos
+
+    def bloqueo(self, ip, username, ahora=None):
+        """Segundos que faltan para poder intentar (0 si no hay bloqueo); una consulta"""
+        ahora = ahora if ahora is not None else time.time()
+        ventana, avance = self._ventana(ahora)
+        claves = claves_login(ip, username)
+        filas = db.session.execute(
+            select(IntentoLogin).where(IntentoLogin.clave.in_(claves.values()))
+        ).scalars().all()
+        por_clave = {fila.clave: fila for fila in filas}
+
+        espera = 0
+        for tipo, clave in claves.items():
+            fila = por_clave.get(clave)
+            if fila is None:
+                continue
+            anterior, actual = self._contadores(fila, ventana)
+            limite = self.limites[tipo]
+            if anterior * (1 - avance) + actual >= limite:
+                espera = max(espera, self._espera(anterior, actual, limite, avance))
+        return espera
+
+    def registrar_fallo(self, ip, username, ahora=None):
+        """Suma un fallo a cada clave con un upsert que rota la ventana si cambió"""
+        ahora = ahora if ahora is not None else time.time()
+        ventana, _ = self._ventana(ahora)
+        T = IntentoLogin.__table__
+        insert = insert_dialecto(db.session.get_bind())
+        for clave in claves_login(ip, username).values():
+            sentencia = insert(T).values(clave=clave, ventana=ventana, actual=1, anterior=0)
+            db.session.execute(sentencia.on_conflict_do_update(
+                index_elements=[T.c.clave],
+                set_={
+                    'anterior': case(
+                        (T.c.ventana == ventana, T.c.anterior),
+                        (T.c.ventana == ventana - 1, T.c.actual),
+                        else_=0
+                    ),
+                    'actual': case((T.c.ventana == ventana, T.c.actual + 1), else_=1),
+                    'ventana': ventana,
+                }
+            ))
+        db.session.commit()
+
+        self._fallos += 1
+        if self._fallos >= COMPACTAR_CADA:
+            self._fallos = 0
+            self.compactar(ahora)
+
+    def limpiar_usuario(self, username):
+        """Login correcto: se olvidan los fallos del usuario (los de la IP siguen)"""
+        clave = claves_login(None, username).get('usuario')
+        if clave:
+            db.session.execute(delete(IntentoLogin).where(IntentoLogin.clave == clave))
+            db.session.commit()
+
+    def compactar(self, ahora=None):
+        """Borra las claves cuyas dos ventanas ya quedaron fuera del intervalo"""
+        ahora = ahora if ahora is not None else time.time()
+        ventana, _ = self._ventana(ahora)
+        borradas = db.session.execute(
+            delete(IntentoLogin).where(IntentoLogin.ventana < ventana - 1)
+        ).rowcount
+        db.session.commit()
+        return borradas
+
+
+def configurar_limite_login(app):
+    limite = LimiteLogin(
+        {'ip': app.config['LOGIN_MAX_FALLOS_IP'], 'usuario': app.config['LOGIN_MAX_FALLOS_USUARIO']},
+        segundos=app.config['LOGIN_VENTANA_SEGUNDOS']
+    )
+    app.extensions['limite_login'] = limite
+    return limite
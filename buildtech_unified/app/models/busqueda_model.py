@@ -0,0 +1,309 @@
+# app/models/busqueda_model.py
+"""
+Índice de búsqueda de texto completo
+Avisos, quejas, tickets de mantenimiento y mensajes de chat
+
+- SQLite: tabla virtual FTS5 (unicode61 sin acentos, índice de prefijos)
+- PostgreSQL: tabla con tsvector 'spanish' + unaccent e índice GIN
+
+El índice se mantiene sincronizado con eventos de SQLAlchemy
+(after_insert / after_update / after_delete) dentro de la misma transacción.
+"""
+
+import html
+import re
+import unicodedata
+
+from sqlalchemy import event, text
+from database import db
+
+TABLA_SQLITE = 'busqueda_fts'
+TABLA_POSTGRES = 'busqueda_documentos'
+
+# Código de cada tipo: el rowid del documento es objeto_id * 8 + código
+TIPOS = {'aviso': 1, 'queja': 2, 'ticket': 3, 'chat': 4}
+
+# Marcadores internos para resaltar coincidencias antes de escapar HTML
+_INICIO_MARCA = '\x02'
+_FIN_MARCA = '\x03'
+
+# Sufijos más comunes en español (de más largo a más corto)
+_SUFIJOS = (
+    'amientos', 'imientos', 'aciones', 'uciones', 'amiento', 'imiento',
+    'idades', 'mente', 'acion', 'ucion', 'ancia', 'encia', 'ables', 'ibles',
+    'istas', 'ismos', 'idad', 'able', 'ible', 'ista', 'ismo', 'osos', 'osas',
+    'ando', 'iendo', 'ados', 'adas', 'idos', 'idas', 'oso', 'osa', 'ado',
+    'ada', 'ido', 'ida', 'ar', 'er', 'ir', 'es', 'os', 'as', 'o', 'a', 'e', 's',
+)
+
+_estado = {'disponible': None}
+
+
+def quitar_acentos(texto):
+    """Normaliza el texto a minúsculas sin tildes ni diéresis"""
+    normalizado = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in normalizado if not unicodedata.combining(c)).lower()
+
+
+def raiz(palabra):
+    """Stemmer ligero para español: recorta sufijos dejando al menos 3 letras"""
+    for sufijo in _SUFIJOS:
+        if palabra.endswith(sufijo) and len(palabra) - len(sufijo) >= 3:
+            return palabra[:-len(sufijo)]
+    return palabra
+
+
+def _palabras(consulta):
+    return [p for p in re.findall(r'\w+', quitar_acentos(consulta)) if len(p) > 1]
+
+
+def _es_postgres(bind):
+    return bind.dialect.name == 'postgresql'
+
+
+# ============================================================================
+# DOCUMENTOS
+# ============================================================================
+
+def _documento(tipo, objeto, connection=None):
+    """Devuelve (objeto_id, titulo, contenido) de una entidad indexable"""
+    if tipo == 'aviso':
+        return objeto.id, objeto.titulo, objeto.contenido
+    if tipo == 'queja':
+        return objeto.id, objeto.categoria, ' '.join(filter(None, [objeto.contenido, objeto.respuesta]))
+    if tipo == 'ticket':
+        return objeto.id_mantenimiento, f'Ticket #{objeto.id_mantenimiento}', objeto.descripcion
+    return objeto.id, objeto.autor(connection), objeto.content
+
+
+def indexar(connection, tipo, objeto):
+    """Inserta o reemplaza el documento de una entidad"""
+    objeto_id, titulo, contenido = _documento(tipo, objeto, connection)
+    params = {
+        'rowid': objeto_id * 8 + TIPOS[tipo],
+        'tipo': tipo,
+        'objeto_id': objeto_id,
+        'titulo': titulo or '',
+        'contenido': contenido or '',
+    }
+
+    if _es_postgres(connection):
+        connection.execute(text(f"""
+            INSERT INTO {TABLA_POSTGRES} (id, tipo, objeto_id, titulo, contenido, documento)
+            VALUES (:rowid, :tipo, :objeto_id, :titulo, :contenido,
+                    setweight(to_tsvector('spanish', unaccent(:titulo)), 'A') ||
+                    setweight(to_tsvector('spanish', unaccent(:contenido)), 'B'))
+            ON CONFLICT (id) DO UPDATE SET
+                titulo = EXCLUDED.titulo,
+                contenido = EXCLUDED.contenido,
+                documento = EXCLUDED.documento
+        """), params)
+        return
+
+    connection.execute(text(f"DELETE FROM {TABLA_SQLITE} WHERE rowid = :rowid"), params)
+    connection.execute(text(f"""
+        INSERT INTO {TABLA_SQLITE} (rowid, tipo, objeto_id, titulo, contenido)
+        VALUES (:rowid, :tipo, :objeto_id, :titulo, :contenido)
+    """), params)
+
+
+def desindexar(connection, tipo, objeto_id):
+    """Elimina el documento de una entidad"""
+    tabla = TABLA_POSTGRES if _es_postgres(connection) else TABLA_SQLITE
+    columna = 'id' if _es_postgres(connection) else 'rowid'
+    connection.execute(
+        text(f"DELETE FROM {tabla} WHERE {columna} = :rowid"),
+        {'rowid': objeto_id * 8 + TIPOS[tipo]}
+    )
+
+
+# ============================================================================
+# CREACIÓN Y SINCRONIZACIÓN
+# ============================================================================
+
+def _modelos():
+    from models.comunicacion_model import Aviso, Queja
+    from models.mantenimiento_model import Mantenimiento
+    from models.chat_model import ChatMessage
+    return {'aviso': Aviso, 'queja': Queja, 'ticket': Mantenimiento, 'chat': ChatMessage}
+
+
+def _crear_tabla(connection):
+    """Crea la tabla del índice. Devuelve True si no existía."""
+    if _es_postgres(connection):
+        existe = connection.execute(text("SELECT to_regclass(:t)"), {'t': TABLA_POSTGRES}).scalar()
+        if existe:
+            return False
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+        connection.execute(text(f"""
+            CREATE TABLE {TABLA_POSTGRES} (
+                id BIGINT PRIMARY KEY,
+                tipo VARCHAR(10) NOT NULL,
+                objeto_id INTEGER NOT NULL,
+                titulo TEXT NOT NULL,
+                contenido TEXT NOT NULL,
+                documento TSVECTOR NOT NULL
+            )
+        """))
+        connection.execute(text(
+            f"CREATE INDEX ix_{TABLA_POSTGRES}_documento ON {TABLA_POSTGRES} USING GIN (documento)"
+        ))
+        return True
+
+    existe = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :t"),
+        {'t': TABLA_SQLITE}
+    ).first()
+    if existe:
+        return False
+    connection.execute(text(f"""
+        CREATE VIRTUAL TABLE {TABLA_SQLITE} USING fts5(
+            tipo UNINDEXED,
+            objeto_id UNINDEXED,
+            titulo,
+            contenido,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '3 4 5'
+        )
+    """))
+    return True
+
+
+def reindexar_todo():
+    """Reconstruye el índice completo a partir de las tablas originales"""
+    modelos = _modelos()
+    with db.engine.begin() as connection:
+        tabla = TABLA_POSTGRES if _es_postgres(connection) else TABLA_SQLITE
+        connection.execute(text(f"DELETE FROM {tabla}"))
+        total = 0
+        for tipo, modelo in modelos.items():
+            for objeto in modelo.query.yield_per(500):
+                indexar(connection, tipo, objeto)
+                total += 1
+    return total
+
+
+def inicializar_busqueda():
+    """Crea el índice si no existe (poblándolo) y registra los eventos de sincronización"""
+    try:
+        with db.engine.begin() as connection:
+            creada = _crear_tabla(connection)
+    except Exception as e:
+        print(f"✗ Búsqueda de texto completo no disponible: {e}")
+        _estado['disponible'] = False
+        return False
+
+    _estado['disponible'] = True
+    if creada:
+        reindexar_todo()
+    _registrar_eventos()
+    return True
+
+
+def busqueda_disponible():
+    return bool(_estado['disponible'])
+
+
+def _registrar_eventos():
+    for tipo, modelo in _modelos().items():
+        if event.contains(modelo, 'after_insert', _indexar_evento):
+            continue
+        event.listen(modelo, 'after_insert', _indexar_evento)
+        event.listen(modelo, 'after_update', _indexar_evento)
+        event.listen(modelo, 'after_delete', _desindexar_evento)
+
+
+def _tipo_de(objeto):
+    for tipo, modelo in _modelos().items():
+        if isinstance(objeto, modelo):
+            return tipo
+    return None
+
+
+def _indexar_evento(mapper, connection, target):
+    if _estado['disponible']:
+        indexar(connection, _tipo_de(target), target)
+
+
+def _desindexar_evento(mapper, connection, target):
+    if _estado['disponible']:
+        tipo = _tipo_de(target)
+        desindexar(connection, tipo, _documento(tipo, target)[0])
+
+
+# ============================================================================
+# CONSULTA
+# ============================================================================
+
+def _resaltar(fragmento):
+    escapado = html.escape(fragmento or '')
+    return escapado.replace(_INICIO_MARCA, '<mark>').replace(_FIN_MARCA, '</mark>')
+
+
+def buscar(consulta, tipos=None, pagina=1, por_pagina=20):
+    """
+    Busca en el índice y devuelve resultados ordenados por relevancia.
+    Cada resultado incluye un fragmento con las coincidencias en <mark>.
+    """
+    palabras = _palabras(consulta)
+    tipos = [t for t in (tipos or TIPOS) if t in TIPOS]
+    if not palabras or not tipos:
+        return {'total': 0, 'pagina': pagina, 'por_pagina': por_pagina, 'resultados': []}
+
+    pagina = max(pagina, 1)
+    params = {
+        'limite': por_pagina,
+        'offset': (pagina - 1) * por_pagina,
+        'inicio': _INICIO_MARCA,
+        'fin': _FIN_MARCA,
+    }
+    filtros_tipo = ', '.join(f':tipo_{i}' for i in range(len(tipos)))
+    params.update({f'tipo_{i}': t for i, t in enumerate(tipos)})
+
+    if _es_postgres(db.engine):
+        # El diccionario 'spanish' aplica el stemming; el prefijo cubre variantes
+        params['consulta'] = ' & '.join(f'{p}:*' for p in palabras)
+        coincidencia = f"""
+            FROM {TABLA_POSTGRES}, to_tsquery('spanish', :consulta) AS q
+            WHERE documento @@ q AND tipo IN ({filtros_tipo})
+        """
+        sql_resultados = f"""
+            SELECT tipo, objeto_id, titulo,
+                   ts_headline('spanish', unaccent(contenido), q,
+                       'StartSel=' || :inicio || ', StopSel=' || :fin || ', MaxWords=24, MinWords=8') AS fragmento,
+                   ts_rank_cd(documento, q) AS relevancia
+            {coincidencia}
+            ORDER BY relevancia DESC
+            LIMIT :limite OFFSET :offset
+        """
+    else:
+        # Prefijo sobre la raíz: 'reparaciones' -> repar* (reparación, reparar...)
+        params['consulta'] = '{titulo contenido} : (' + ' AND '.join(f'"{raiz(p)}"*' for p in palabras) + ')'
+        coincidencia = f"""
+            FROM {TABLA_SQLITE}
+            WHERE {TABLA_SQLITE} MATCH :consulta AND tipo IN ({filtros_tipo})
+        """
+        sql_resultados = f"""
+            SELECT tipo, objeto_id, titulo,
+                   snippet({TABLA_SQLITE}, 3, :inicio, :fin, '…', 16) AS fragmento,
+                   -bm25({TABLA_SQLITE}, 2.0, 1.0) AS relevancia
+            {coincidencia}
+            ORDER BY bm25({TABLA_SQLITE}, 2.0, 1.0)
+            LIMIT :limite OFFSET :offset
+        """
+
+    total = db.session.execute(text(f"SELECT COUNT(*) {coincidencia}"), params).scalar()
+    filas = db.session.execute(text(sql_resultados), params).mappings().all()
+
+    return {
+        'total': total,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'resultados': [{
+            'tipo': fila['tipo'],
+            'id': int(fila['objeto_id']),
+            'titulo': fila['titulo'],
+            'fragmento': _resaltar(fila['fragmento']),
+            'relevancia': round(float(fila['relevancia']), 4),
+        } for fila in filas],
+    }
@@ -1,19 +1,35 @@
 from database import db
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict
+from functools import lru_cache
+import json
+import zlib
+from sqlalchemy import or_
+from utils.nombres_usuario import nombre_usuario, cargar_nombres
+from utils.formato_compacto import epoch
 
 class ChatMessage(db.Model):
     __tablename__ = 'chat_messages'
+    __table_args__ = (
+        db.Index('ix_chat_messages_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_chat_messages_ticket_id', 'ticket_id', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
-    username = db.Column(db.String(100), nullable=False)
+    # Solo para mensajes antiguos sin user_id; los nuevos guardan cadena vacía
+    username = db.Column(db.String(100), nullable=False, default='')
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Autor del mensaje (el nombre se resuelve con la caché de usuarios)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    
     # Relacionar con un ticket específico (opcional)
     ticket_id = db.Column(db.Integer, db.ForeignKey('mantenimiento.id_mantenimiento'), nullable=True)
     
-    def __init__(self, content, username, ticket_id=None):
+    def __init__(self, content, user_id=None, ticket_id=None, username=''):
         self.content = content
+        self.user_id = user_id
         self.username = username
         self.ticket_id = ticket_id
 
@@ -31,16 +47,171 @@ class ChatMessage(db.Model):
     
     @staticmethod
     def get_recent(limit=50):
-        return ChatMessage.query.order_by(ChatMessage.timestamp.desc()).limit(limit).all()
+        """Últimos mensajes del chat general (los de tickets van en su sala)"""
+        return ChatMessage.query.filter(
+            ChatMessage.ticket_id.is_(None)
+        ).order_by(ChatMessage.id.desc()).limit(limit).all()
+    
+    @staticmethod
+    def get_anteriores(ticket_id=None, antes_de=None, limit=50):
+        """
+        Mensajes anteriores a un id (chat general si ticket_id es None).
+        Si la tabla activa no alcanza, completa con el historial archivado.
+        Devuelve (mensajes en orden ascendente, hay_mas).
+        """
+        query = ChatMessage.query.filter(
+            ChatMessage.ticket_id.is_(None) if ticket_id is None else ChatMessage.ticket_id == ticket_id
+        )
+        if antes_de:
+            query = query.filter(ChatMessage.id < antes_de)
+        messages = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+        
+        faltan = limit + 1 - len(messages)
+        if faltan > 0:
+            desde = messages[-1].id if messages else antes_de
+            messages += ChatArchivo.leer(ticket_id, antes_de=desde, limit=faltan)
+        
+        hay_mas = len(messages) > limit
+        return list(reversed(messages[:limit])), hay_mas
+    
+    @staticmethod
+    def precargar_autores(messages):
+        """Resuelve en una consulta los nombres de autores que no estén en caché"""
+        cargar_nombres({msg.user_id for msg in messages})
+        return messages
+    
+    def autor(self, connection=None):
+        if self.user_id is not None:
+            return nombre_usuario(self.user_id, connection)
+        return self.username or 'Anónimo'
 
     def to_dict(self):
         return {
             'id': self.id,
             'content': self.content,
-            'username': self.username,
+            'user_id': self.user_id,
+            'username': self.autor(),
             'timestamp': self.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
             'ticket_id': self.ticket_id
         }
+    
+    def to_compacto(self):
+        """Variante con claves cortas y fecha epoch (ver utils/formato_compacto)"""
+        return {
+            'i': self.id,
+            'c': self.content,
+            'u': self.user_id,
+            'n': self.autor(),
+            't': epoch(self.timestamp),
+            'k': self.ticket_id
+        }
+
+
+
+@lru_cache(maxsize=32)
+def _bloque_archivado(archivo_id):
+    """Mensajes descomprimidos de un bloque (los bloques no cambian)"""
+    datos = db.session.query(ChatArchivo.datos).filter_by(id=archivo_id).scalar()
+    return tuple(json.loads(zlib.decompress(datos))) if datos else ()
+
+
+class ChatArchivo(db.Model):
+    """Bloque comprimido de mensajes archivados de un mes (y un ticket o el chat general)"""
+    __tablename__ = 'chat_archivos'
+    __table_args__ = (
+        db.Index('ix_chat_archivos_ticket_ultimo', 'ticket_id', 'ultimo_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    periodo = db.Column(db.String(7), nullable=False)  # 'YYYY-MM'
+    ticket_id = db.Column(db.Integer, nullable=True)    # None = chat general
+    cantidad = db.Column(db.Integer, nullable=False)
+    primer_id = db.Column(db.Integer, nullable=False)
+    ultimo_id = db.Column(db.Integer, nullable=False)
+    datos = db.Column(db.LargeBinary, nullable=False)   # JSON comprimido con zlib
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __init__(self, periodo, ticket_id, mensajes):
+        self.periodo = periodo
+        self.ticket_id = ticket_id
+        self.cantidad = len(mensajes)
+        self.primer_id = min(m['i'] for m in mensajes)
+        self.ultimo_id = max(m['i'] for m in mensajes)
+        self.datos = zlib.compress(json.dumps(mensajes, separators=(',', ':')).encode('utf-8'), 9)
+
+    @staticmethod
+    def _a_mensaje(m):
+        """Reconstruye un ChatMessage (sin sesión) desde el formato archivado"""
+        message = ChatMessage(content=m['c'], user_id=m['u'], ticket_id=m['k'], username=m['n'])
+        message.id = m['i']
+        message.timestamp = datetime.fromtimestamp(m['t'], timezone.utc).replace(tzinfo=None)
+        return message
+
+    @staticmethod
+    def leer(ticket_id=None, antes_de=None, limit=50):
+        """Mensajes archivados más recientes anteriores a un id (orden descendente)"""
+        query = ChatArchivo.query.with_entities(ChatArchivo.id, ChatArchivo.ultimo_id).filter(
+            ChatArchivo.ticket_id.is_(None) if ticket_id is None else ChatArchivo.ticket_id == ticket_id
+        )
+        if antes_de:
+            query = query.filter(ChatArchivo.primer_id < antes_de)
+
+        candidatos = []
+        for archivo_id, ultimo_id in query.order_by(ChatArchivo.ultimo_id.desc()):
+            # Los bloques siguientes solo tienen ids menores que los ya elegidos
+            if len(candidatos) >= limit and ultimo_id < candidatos[limit - 1]['i']:
+                break
+            candidatos.extend(
+                m for m in _bloque_archivado(archivo_id)
+                if not antes_de or m['i'] < antes_de
+            )
+            candidatos.sort(key=lambda m: m['i'], reverse=True)
+
+        return [ChatArchivo._a_mensaje(m) for m in candidatos[:limit]]
+
+    @staticmethod
+    def archivar_mensajes(dias=90, lote=5000):
+        """
+        Mueve a bloques mensuales comprimidos los mensajes con más de 'dias'
+        días y los de tickets finalizados. Cada lote es una transacción.
+        """
+        from models.mantenimiento_model import Mantenimiento
+
+        limite = datetime.utcnow() - timedelta(days=dias)
+        cerrados = db.session.query(Mantenimiento.id_mantenimiento).filter(
+            Mantenimiento.trabajo_realizado.is_(True)
+        )
+        filtro = or_(ChatMessage.timestamp < limite, ChatMessage.ticket_id.in_(cerrados))
+
+        total = 0
+        while True:
+            filas = db.session.query(
+                ChatMessage.id, ChatMessage.content, ChatMessage.user_id,
+                ChatMessage.username, ChatMessage.timestamp, ChatMessage.ticket_id
+            ).filter(filtro).order_by(ChatMessage.id).limit(lote).all()
+            if not filas:
+                break
+
+            grupos = defaultdict(list)
+            for fila in filas:
+                grupos[(fila.ticket_id, fila.timestamp.strftime('%Y-%m'))].append({
+                    'i': fila.id,
+                    'c': fila.content,
+                    'u': fila.user_id,
+                    'n': fila.username,
+                    't': epoch(fila.timestamp),
+                    'k': fila.ticket_id
+                })
+            for (ticket_id, periodo), mensajes in grupos.items():
+                db.session.add(ChatArchivo(periodo, ticket_id, mensajes))
+
+            ChatMessage.query.filter(
+                ChatMessage.id.in_([fila.id for fila in filas])
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            total += len(filas)
+
+        return total
 
 
 class Notification(db.Model):
@@ -49,7 +220,7 @@ class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     tipo = db.Column(db.String(50), nullable=False)  # 'nuevo_ticket', 'ticket_actualizado', etc.
     mensaje = db.Column(db.Text, nullable=False)
-    leido = db.Column(db.Boolean, default=False)
+    leido = db.Column(db.Boolean, default=False, index=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relacionar con el ticket
@@ -70,8 +241,23 @@ class Notification(db.Model):
         db.session.commit()
 
     @staticmethod
-    def get_no_leidas():
-        return Notification.query.filter_by(leido=False).order_by(Notification.timestamp.desc()).all()
+    def get_no_leidas(limit=None):
+        query = Notification.query.filter_by(leido=False).order_by(Notification.timestamp.desc())
+        if limit:
+            query = query.limit(limit)
+        return query.all()
+    
+    @staticmethod
+    def contar_no_leidas():
+        """Cuenta las notificaciones no leídas sin cargarlas"""
+        return Notification.query.filter_by(leido=False).count()
+    
+    @staticmethod
+    def get_desde(ultimo_id, limit=100):
+        """Notificaciones posteriores a un id (reanudar tras reconexión)"""
+        return Notification.query.filter(
+            Notification.id > ultimo_id
+        ).order_by(Notification.id.asc()).limit(limit).all()
     
     @staticmethod
     def get_all():
@@ -86,3 +272,14 @@ class Notification(db.Model):
             'timestamp': self.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
             'ticket_id': self.ticket_id
         }
+    
+    def to_compacto(self):
+        """Variante con claves cortas y fecha epoch (ver utils/formato_compacto)"""
+        return {
+            'i': self.id,
+            'y': self.tipo,
+            'm': self.mensaje,
+            'l': self.leido,
+            't': epoch(self.timestamp),
+            'k': self.ticket_id
+        }
@@ -1,5 +1,12 @@
 from database import db
-from datetime import datetime
+from datetime import datetime, date
+from utils.cache_versionada import obtener_cache
+
+# Caché del tablón de avisos (se invalida al publicar, archivar o reactivar)
+CACHE_TABLON = 'tablon_avisos'
+
+def invalidar_tablon():
+    obtener_cache(CACHE_TABLON).invalidar()
 
 class Aviso(db.Model):
     __tablename__ = 'avisos'
@@ -11,32 +18,91 @@ class Aviso(db.Model):
     autor = db.Column(db.String(100), nullable=False)  # Nombre del admin
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     activo = db.Column(db.Boolean, default=True)  # Para archivar avisos sin borrarlos
+    vigente_hasta = db.Column(db.Date, nullable=True)  # Se archiva automáticamente después de esta fecha
+    fecha_modificacion = db.Column(db.DateTime, nullable=True, default=datetime.utcnow,
+                                   onupdate=datetime.utcnow)  # Versión del tablón (ver huella_tablon)
+    
+    __table_args__ = (
+        db.Index('ix_avisos_activo_categoria_timestamp', 'activo', 'categoria', 'timestamp'),
+        # El tablón recorre los activos ya ordenados por fecha, sin ordenar en memoria
+        db.Index('ix_avisos_activo_timestamp', 'activo', 'timestamp'),
+    )
     
-    def __init__(self, titulo, contenido, categoria, autor):
+    def __init__(self, titulo, contenido, categoria, autor, vigente_hasta=None):
         self.titulo = titulo
         self.contenido = contenido
         self.categoria = categoria
         self.autor = autor
+        self.vigente_hasta = vigente_hasta
         self.activo = True
 
     def save(self):
         db.session.add(self)
         db.session.commit()
+        invalidar_tablon()
 
     def archivar(self):
         """Marca el aviso como inactivo en lugar de eliminarlo"""
         self.activo = False
         db.session.commit()
+        invalidar_tablon()
 
     def reactivar(self):
         """Reactiva un aviso archivado"""
         self.activo = True
+        # Un aviso vencido se reactiva sin fecha límite
+        if self.vigente_hasta and self.vigente_hasta < date.today():
+            self.vigente_hasta = None
         db.session.commit()
+        invalidar_tablon()
+    
+    @property
+    def esta_vencido(self):
+        return self.vigente_hasta is not None and self.vigente_hasta < date.today()
 
     @staticmethod
     def get_all_activos():
         """Obtiene todos los avisos activos ordenados por fecha descendente"""
-        return Aviso.query.filter_by(activo=True).order_by(Aviso.timestamp.desc()).all()
+        # Excluye los vencidos aunque la tarea de archivado aún no haya corrido
+        return Aviso.query.filter_by(activo=True).filter(
+            db.or_(Aviso.vigente_hasta.is_(None), Aviso.vigente_hasta >= date.today())
+        ).order_by(Aviso.timestamp.desc()).all()
+    
+    @staticmethod
+    def huella_tablon():
+        """
+        Versión del tablón leída de la base (común a todos los procesos y
+        estable entre reinicios): cantidad de avisos y última modificación.
+        Publicar, archivar o reactivar (que puede cambiar vigente_hasta)
+        actualiza fecha_modificacion; eliminar cambia la cantidad.
+        """
+        cantidad, ultima = db.session.query(
+            db.func.count(Aviso.id),
+            db.func.max(db.func.coalesce(Aviso.fecha_modificacion, Aviso.timestamp))
+        ).one()
+        return f"{cantidad}-{ultima}"
+    
+    @staticmethod
+    def get_archivados(pagina=1, por_pagina=20, categoria=None):
+        """Avisos archivados paginados (más recientes primero)"""
+        query = Aviso.query.filter_by(activo=False)
+        if categoria:
+            query = query.filter_by(categoria=categoria)
+        return query.order_by(Aviso.timestamp.desc()).paginate(
+            page=pagina, per_page=por_pagina, error_out=False
+        )
+    
+    @staticmethod
+    def archivar_vencidos(hoy=None):
+        """Archiva en bloque los avisos cuya vigencia terminó. Devuelve cuántos."""
+        hoy = hoy or date.today()
+        archivados = Aviso.query.filter_by(activo=True).filter(
+            Aviso.vigente_hasta < hoy
+        ).update({Aviso.activo: False}, synchronize_session=False)
+        db.session.commit()
+        if archivados:
+            invalidar_tablon()
+        return archivados
     
     @staticmethod
     def get_all():
@@ -60,7 +126,8 @@ class Aviso(db.Model):
             'categoria': self.categoria,
             'autor': self.autor,
             'timestamp': self.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            'activo': self.activo
+            'activo': self.activo,
+            'vigente_hasta': self.vigente_hasta.isoformat() if self.vigente_hasta else None
         }
 
 
@@ -71,6 +138,8 @@ class Queja(db.Model):
     contenido = db.Column(db.Text, nullable=False)
     anonima = db.Column(db.Boolean, default=False)
     autor = db.Column(db.String(100), nullable=True)  # Null si es anónima
+    # Usuario que la envió (se guarda también en anónimas, nunca se expone)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     categoria = db.Column(db.String(50), nullable=False)  # 'mantenimiento', 'seguridad', 'limpieza', 'vecinos', 'otro'
     estado = db.Column(db.String(50), default='pendiente')  # 'pendiente', 'en_revision', 'resuelta', 'archivada'
     respuesta = db.Column(db.Text, nullable=True)  # Respuesta del admin
@@ -78,11 +147,17 @@ class Queja(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     fecha_respuesta = db.Column(db.DateTime, nullable=True)
     
-    def __init__(self, contenido, categoria, anonima=False, autor=None):
+    __table_args__ = (
+        db.Index('ix_quejas_user_estado_timestamp', 'user_id', 'estado', 'timestamp'),
+        db.Index('ix_quejas_estado_timestamp', 'estado', 'timestamp'),
+    )
+    
+    def __init__(self, contenido, categoria, anonima=False, autor=None, user_id=None):
         self.contenido = contenido
         self.categoria = categoria
         self.anonima = anonima
         self.autor = autor if not anonima else None
+        self.user_id = user_id
         self.estado = 'pendiente'
 
     def save(self):
@@ -128,6 +203,44 @@ class Queja(db.Model):
     @staticmethod
     def get_by_id(queja_id):
         return Queja.query.get(queja_id)
+    
+    @staticmethod
+    def get_paginadas(estado=None, user_id=None, pagina=1, por_pagina=20):
+        """Quejas paginadas, opcionalmente de un usuario y/o en un estado"""
+        query = Queja.query
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+        if estado:
+            query = query.filter_by(estado=estado)
+        return query.order_by(Queja.timestamp.desc()).paginate(
+            page=pagina, per_page=por_pagina, error_out=False
+        )
+    
+    @staticmethod
+    def vincular_autores():
+        """
+        Completa user_id en quejas antiguas a partir del nombre del autor.
+        Solo vincula cuando exactamente un usuario tiene ese nombre: con
+        homónimos la queja queda sin autor (tarea manual, no al arrancar).
+        """
+        from models.user_model import User
+        
+        nombre = (User.first_name + ' ' + User.last_name).label('nombre')
+        unicos = db.select(nombre, db.func.min(User.id).label('user_id')).group_by(
+            nombre
+        ).having(db.func.count() == 1).subquery()
+        autor_id = db.select(unicos.c.user_id).where(unicos.c.nombre == Queja.autor).scalar_subquery()
+        
+        actualizadas = Queja.query.filter(
+            Queja.user_id.is_(None),
+            Queja.autor.in_(db.select(unicos.c.nombre))
+        ).update({Queja.user_id: autor_id}, synchronize_session=False)
+        db.session.commit()
+        return actualizadas
+    
+    def es_autor(self, user):
+        """Indica si la queja fue enviada por el usuario"""
+        return self.user_id is not None and self.user_id == user.id
 
     def to_dict(self):
         return {
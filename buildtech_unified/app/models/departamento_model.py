@@ -0,0 +1,218 @@
+# app/models/departamento_model.py
+"""
+Departamentos del edificio
+Cada unidad es una fila identificada por su número (el mismo entero que ya
+guardan users, cargos_mensuales, reservas e historial_pagos, que ahora lo
+referencian). La fila mantiene contadores de residentes, cargos impagos,
+saldo pendiente y último pago: se recalculan en la misma transacción que
+modifica esas tablas, así que los paneles por unidad y la morosidad leen
+una fila en lugar de recorrer los cargos.
+"""
+
+from datetime import datetime
+from sqlalchemy import event, func, inspect, select, update
+from database import db, insert_dialecto
+from models.user_model import User
+from models.finanzas_model import CargoMensual, HistorialPago
+from models.reservas_model import Reserva
+
+
+class Departamento(db.Model):
+    __tablename__ = 'departamentos'
+
+    numero = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    # Contadores mantenidos (ver recalcular)
+    residentes = db.Column(db.Integer, nullable=False, default=0)
+    cargos_pendientes = db.Column(db.Integer, nullable=False, default=0, index=True)
+    saldo_pendiente = db.Column(db.Numeric(10, 2), nullable=False, default=0)
+    ultimo_pago = db.Column(db.DateTime, nullable=True)
+    ultimo_pago_monto = db.Column(db.Numeric(10, 2), nullable=True)
+
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __init__(self, numero):
+        self.numero = numero
+        self.residentes = 0
+        self.cargos_pendientes = 0
+        self.saldo_pendiente = 0
+
+    @property
+    def piso(self):
+        return self.numero // 100
+
+    @property
+    def moroso(self):
+        return self.cargos_pendientes > 0
+
+    @staticmethod
+    def get_by_numero(numero):
+        return db.session.get(Departamento, numero)
+
+    @staticmethod
+    def get_all():
+        return Departamento.query.order_by(Departamento.numero).all()
+
+    @staticmethod
+    def get_morosos():
+        return Departamento.query.filter(
+            Departamento.cargos_pendientes > 0
+        ).order_by(Departamento.saldo_pendiente.desc()).all()
+
+    @staticmethod
+    def estadisticas():
+        """Totales del edificio en una sola consulta sobre departamentos"""
+        fila = db.session.execute(select(
+            func.count(),
+            func.count().filter(Departamento.cargos_pendientes > 0),
+            func.coalesce(func.sum(Departamento.cargos_pendientes), 0),
+            func.coalesce(func.sum(Departamento.saldo_pendiente), 0),
+            func.coalesce(func.sum(Departamento.residentes), 0),
+        )).one()
+        total, morosos, cargos, saldo, residentes = fila
+        return {
+            'total_departamentos': total,
+            'departamentos_morosos': morosos,
+            'cargos_pendientes': cargos,
+            'saldo_pendiente': float(saldo),
+            'residentes': residentes,
+            'tasa_morosidad': round(morosos / total * 100, 2) if total else 0,
+        }
+
+    # ============= MANTENIMIENTO DE CONTADORES =============
+
+    @staticmethod
+    def asegurar(connection, numeros):
+        """Crea las unidades que falten (antes de insertar filas que las referencian)"""
+        numeros = {n for n in numeros if n is not None}
+        if numeros:
+            insert = insert_dialecto(connection)
+            connection.execute(
+                insert(Departamento.__table__).values(
+                    [{'numero': n, 'residentes': 0, 'cargos_pendientes': 0,
+                      'saldo_pendiente': 0, 'fecha_creacion': datetime.utcnow()} for n in sorted(numeros)]
+                ).on_conflict_do_nothing(index_elements=['numero'])
+            )
+
+    @staticmethod
+    def recalcular(connection, numeros=None):
+        """
+        Recalcula los contadores de las unidades indicadas (todas si es None)
+        con un UPDATE de subconsultas correlacionadas por índice.
+        """
+        D = Departamento.__table__
+        C = CargoMensual
+        H = HistorialPago
+        de_la_unidad = lambda columna: columna == D.c.numero
+
+        impagos = (de_la_unidad(C.departamento), C.pagado.is_(False))
+        ultimo = select(H.fecha_pago, H.monto).where(de_la_unidad(H.departamento)).order_by(
+            H.fecha_pago.desc(), H.id.desc()
+        ).limit(1)
+
+        sentencia = update(D).values(
+            residentes=select(func.count()).where(
+                de_la_unidad(User.departamento), User.role == 'residente'
+            ).scalar_subquery(),
+            cargos_pendientes=select(func.count()).where(*impagos).scalar_subquery(),
+            saldo_pendiente=select(func.coalesce(func.sum(
+                C.luz + C.agua + C.gas + C.mantenimiento + C.expensas_comunes
+            ), 0)).where(*impagos).scalar_subquery(),
+            ultimo_pago=ultimo.with_only_columns(H.fecha_pago).scalar_subquery(),
+            ultimo_pago_monto=ultimo.with_only_columns(H.monto).scalar_subquery(),
+        )
+        if numeros is not None:
+            numeros = {n for n in numeros if n is not None}
+            if not numeros:
+                return 0
+            sentencia = sentencia.where(D.c.numero.in_(numeros))
+        return connection.execute(sentencia).rowcount
+
+    @staticmethod
+    def sincronizar():
+        """Crea las unidades ya usadas en las otras tablas y recalcula todas"""
+        with db.engine.begin() as connection:
+            usados = select(User.departamento).union(
+                select(CargoMensual.departamento),
+                select(Reserva.departamento),
+                select(HistorialPago.departamento),
+            ).subquery()
+            numeros = connection.execute(
+                select(usados.c[0]).where(usados.c[0].isnot(None))
+            ).scalars().all()
+            Departamento.asegurar(connection, numeros)
+            return Departamento.recalcular(connection)
+
+    def to_dict(self):
+        return {
+            'numero': self.numero,
+            'piso': self.piso,
+            'residentes': self.residentes,
+            'cargos_pendientes': self.cargos_pendientes,
+            'saldo_pendiente': float(self.saldo_pendiente or 0),
+            'moroso': self.moroso,
+            'ultimo_pago': self.ultimo_pago.isoformat() if self.ultimo_pago else None,
+            'ultimo_pago_monto': float(self.ultimo_pago_monto) if self.ultimo_pago_monto is not None else None,
+        }
+
+
+# ============================================================================
+# EVENTOS: los contadores cambian en la misma transacción que los datos
+# ============================================================================
+
+# Tablas que referencian la unidad
+MODELOS_CON_DEPARTAMENTO = (User, CargoMensual, Reserva, HistorialPago)
+
+# Columnas que, al cambiar, modifican los contadores de la unidad
+CAMPOS_CONTADOS = {
+    User: ('departamento', 'role'),
+    CargoMensual: ('departamento', 'pagado', 'luz', 'agua', 'gas', 'mantenimiento', 'expensas_comunes'),
+    HistorialPago: ('departamento', 'monto', 'fecha_pago'),
+}
+
+
+def _unidades_afectadas(target, campos):
+    """Unidad actual y, si cambió, la anterior; vacío si no cambió nada contado"""
+    estado = inspect(target)
+    if not any(estado.attrs[campo].history.has_changes() for campo in campos):
+        return set()
+    return {target.departamento, *estado.attrs.departamento.history.deleted}
+
+
+def _asegurar_insertado(mapper, connection, target):
+    Departamento.asegurar(connection, [target.departamento])
+
+
+def _asegurar_modificado(mapper, connection, target):
+    if inspect(target).attrs.departamento.history.has_changes():
+        Departamento.asegurar(connection, [target.departamento])
+
+
+def _recalcular_insertado(mapper, connection, target):
+    Departamento.recalcular(connection, [target.departamento])
+
+
+def _recalcular_modificado(mapper, connection, target):
+    Departamento.recalcular(connection, _unidades_afectadas(target, CAMPOS_CONTADOS[mapper.class_]))
+
+
+def _recalcular_eliminado(mapper, connection, target):
+    Departamento.recalcular(connection, [target.departamento])
+
+
+def _cambio_departamento(target, valor, anterior, initiator):
+    # Registrado con active_history: el número anterior queda en el historial
+    # aunque no estuviera cargado, para recalcular también esa unidad
+    return valor
+
+
+for _modelo in MODELOS_CON_DEPARTAMENTO:
+    if event.contains(_modelo, 'before_insert', _asegurar_insertado):
+        continue
+    event.listen(_modelo, 'before_insert', _asegurar_insertado)
+    event.listen(_modelo, 'before_update', _asegurar_modificado)
+    event.listen(_modelo.departamento, 'set', _cambio_departamento, active_history=True)
+    if _modelo in CAMPOS_CONTADOS:
+        event.listen(_modelo, 'after_insert', _recalcular_insertado)
+        event.listen(_modelo, 'after_update', _recalcular_modificado)
+        event.listen(_modelo, 'after_delete', _recalcular_eliminado)
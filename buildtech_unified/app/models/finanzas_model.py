@@ -8,6 +8,10 @@ from database import db
 from datetime import datetime, date
 from decimal import Decimal
 
+# Autor y concepto de los gastos creados desde tickets de mantenimiento
+REGISTRADO_POR_MANTENIMIENTO = 'Sistema (mantenimiento)'
+CONCEPTO_TICKET = 'Mantenimiento ticket #'
+
 class CargoMensual(db.Model):
     """
     Cargos mensuales por departamento (luz, agua, gas, etc.)
@@ -15,7 +19,7 @@ class CargoMensual(db.Model):
     __tablename__ = 'cargos_mensuales'
     
     id = db.Column(db.Integer, primary_key=True)
-    departamento = db.Column(db.Integer, nullable=False, index=True)
+    departamento = db.Column(db.Integer, db.ForeignKey('departamentos.numero'), nullable=False, index=True)
     mes = db.Column(db.Integer, nullable=False)  # 1-12
     anio = db.Column(db.Integer, nullable=False)
     
@@ -268,6 +272,10 @@ class GastoEdificio(db.Model):
     Gastos generales del edificio (mantenimiento, servicios, etc.)
     """
     __tablename__ = 'gastos_edificio'
+    __table_args__ = (
+        # Un solo gasto por ticket de mantenimiento
+        db.Index('ux_gastos_edificio_ticket_id', 'ticket_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -292,6 +300,9 @@ class GastoEdificio(db.Model):
     # Comprobante
     comprobante = db.Column(db.String(200), nullable=True)  # URL del comprobante
     
+    # Ticket de mantenimiento que originó el gasto (lo mantiene Mantenimiento)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('mantenimiento.id_mantenimiento'), nullable=True)
+    
     def __init__(self, concepto, monto, categoria, fecha_gasto=None, 
                  descripcion=None, registrado_por=None):
         self.concepto = concepto
@@ -332,6 +343,98 @@ class GastoEdificio(db.Model):
             extract('year', GastoEdificio.fecha_gasto) == anio
         ).all()
     
+    # ============= GASTOS DE TICKETS =============
+    # El alta incremental (Mantenimiento.sincronizar_gasto) y la conciliación
+    # masiva usan el mismo concepto y la misma fecha
+    
+    @staticmethod
+    def concepto_ticket(ticket_id):
+        return f'{CONCEPTO_TICKET}{ticket_id}'
+    
+    @staticmethod
+    def concepto_ticket_sql(ticket_id):
+        from sqlalchemy import literal, cast, String
+        return literal(CONCEPTO_TICKET) + cast(ticket_id, String)
+    
+    @staticmethod
+    def fecha_ticket(ticket):
+        """Fecha del gasto de un ticket: su fin o, si aún no la tiene, el día de creación"""
+        return ticket.fecha_fin or (ticket.fecha_creacion or datetime.utcnow()).date()
+    
+    @staticmethod
+    def fecha_ticket_sql(M):
+        from sqlalchemy import func
+        return func.coalesce(M.fecha_fin, func.date(M.fecha_creacion))
+    
+    @staticmethod
+    def conciliar_mantenimiento(simular=False):
+        """
+        Compara todos los tickets con los gastos vinculados en una pasada por
+        conjuntos: crea los que faltan, corrige montos y fechas, y borra los
+        de tickets que ya no corresponden. Devuelve los conteos de cada caso.
+        """
+        from sqlalchemy import select, insert, update, delete, and_, or_, literal, func
+        from models.mantenimiento_model import Mantenimiento
+        
+        M = Mantenimiento
+        fecha = GastoEdificio.fecha_ticket_sql(M)
+        con_gasto = and_(M.trabajo_realizado.is_(True), M.costo > 0)
+        
+        faltantes = select(M.id_mantenimiento).outerjoin(
+            GastoEdificio, GastoEdificio.ticket_id == M.id_mantenimiento
+        ).where(con_gasto, GastoEdificio.id.is_(None))
+        
+        distintos = and_(
+            GastoEdificio.ticket_id == M.id_mantenimiento,
+            con_gasto,
+            or_(
+                GastoEdificio.monto != M.costo,
+                GastoEdificio.categoria != 'mantenimiento',
+                GastoEdificio.fecha_gasto != fecha
+            )
+        )
+        
+        validos = select(M.id_mantenimiento).where(con_gasto)
+        sobrantes = and_(GastoEdificio.ticket_id.isnot(None), GastoEdificio.ticket_id.not_in(validos))
+        
+        conteo = lambda consulta: db.session.execute(
+            select(func.count()).select_from(consulta.subquery())
+        ).scalar()
+        resultado = {
+            'creados': conteo(faltantes),
+            'actualizados': conteo(select(GastoEdificio.id).where(distintos)),
+            'eliminados': conteo(select(GastoEdificio.id).where(sobrantes)),
+        }
+        if simular or not any(resultado.values()):
+            return resultado
+        
+        db.session.execute(
+            update(GastoEdificio).where(distintos).values(
+                monto=M.costo,
+                categoria='mantenimiento',
+                fecha_gasto=fecha
+            ).execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            delete(GastoEdificio).where(sobrantes).execution_options(synchronize_session=False)
+        )
+        db.session.execute(insert(GastoEdificio).from_select(
+            ['concepto', 'descripcion', 'monto', 'categoria', 'fecha_gasto', 'fecha_registro',
+             'registrado_por', 'ticket_id'],
+            select(
+                GastoEdificio.concepto_ticket_sql(M.id_mantenimiento),
+                M.descripcion,
+                M.costo,
+                literal('mantenimiento'),
+                fecha,
+                literal(datetime.utcnow()),
+                literal(REGISTRADO_POR_MANTENIMIENTO),
+                M.id_mantenimiento
+            ).where(M.id_mantenimiento.in_(faltantes))
+        ))
+        db.session.commit()
+        return resultado
+    
     @staticmethod
     def get_total_mes(mes, anio):
         """Calcula el total de gastos de un mes"""
@@ -376,7 +479,7 @@ class HistorialPago(db.Model):
     objeto_id = db.Column(db.Integer, nullable=False)
     
     # Departamento que pagó
-    departamento = db.Column(db.Integer, nullable=False)
+    departamento = db.Column(db.Integer, db.ForeignKey('departamentos.numero'), nullable=False, index=True)
     
     # Monto pagado
     monto = db.Column(db.Numeric(10, 2), nullable=False)
@@ -462,8 +565,10 @@ def generar_cargos_todos_departamentos():
     """
     from models.user_model import User
     
-    residentes = User.query.filter(User.departamento.isnot(None)).all()
-    departamentos = list(set([r.departamento for r in residentes]))
+    # Toda unidad con algún usuario (de cualquier rol), sin cargar los usuarios
+    departamentos = [fila[0] for fila in db.session.query(User.departamento).filter(
+        User.departamento.isnot(None)
+    ).distinct().order_by(User.departamento)]
     
     hoy = date.today()
     mes_actual = hoy.month
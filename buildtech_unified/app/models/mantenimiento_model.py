@@ -1,8 +1,47 @@
 from database import db
-from datetime import datetime
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from sqlalchemy import and_, or_, case, func, update
+from utils.cache_versionada import obtener_cache
+from utils.transaccion import al_confirmar
+from models.finanzas_model import GastoEdificio, REGISTRADO_POR_MANTENIMIENTO
+
+# Rango de cada prioridad para ordenar (mayor = más urgente)
+RANGO_PRIORIDAD = {'Alta': 3, 'Media': 2, 'Baja': 1}
+
+# Órdenes disponibles en la lista de tickets
+ORDENES_TICKETS = ('recientes', 'antiguos', 'prioridad')
+
+# Prefijo de las URLs de evidencias guardadas en el almacén por contenido
+PREFIJO_EVIDENCIA = '/mantenimiento/evidencia/'
+
+# Estados del ciclo de vida de un ticket (ver TransicionTicket)
+ESTADOS_TICKET = ('pendiente', 'iniciado', 'finalizado')
+
+# Caché de métricas SLA de meses cerrados (ver models/sla_model.py)
+CACHE_SLA = 'sla_mantenimiento'
+
+def cache_sla():
+    return obtener_cache(CACHE_SLA, max_entradas=256)
+
+def _invalidar_sla_del_mes(fecha_creacion):
+    """Solo los cambios en tickets de meses anteriores afectan lo cacheado (los nuevos son del mes actual)"""
+    hoy = datetime.utcnow()
+    if fecha_creacion is not None and (fecha_creacion.year, fecha_creacion.month) < (hoy.year, hoy.month):
+        cache_sla().invalidar()
+
+def invalidar_sla(ticket):
+    """Al confirmarse la transacción (antes, otra petición podría cachear lo anterior)"""
+    al_confirmar(ticket, _invalidar_sla_del_mes, ticket.fecha_creacion)
 
 class Mantenimiento(db.Model):
     __tablename__ = 'mantenimiento'
+    __table_args__ = (
+        db.Index('ix_mantenimiento_fecha_creacion', 'fecha_creacion'),
+        db.Index('ix_mantenimiento_realizado_fecha', 'trabajo_realizado', 'fecha_creacion'),
+        db.Index('ix_mantenimiento_prioridad_fecha', 'prioridad', 'fecha_creacion'),
+        db.Index('ix_mantenimiento_responsable_fecha', 'responsable', 'fecha_creacion'),
+    )
 
     id_mantenimiento = db.Column(db.Integer, primary_key=True)
     descripcion = db.Column(db.Text, nullable=False)
@@ -17,6 +56,14 @@ class Mantenimiento(db.Model):
     evidencia_url = db.Column(db.String(255), nullable=True)
     
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_modificacion = db.Column(db.DateTime, nullable=True, onupdate=datetime.utcnow)  # Huella de exportaciones
+    plan_id = db.Column(db.Integer, db.ForeignKey('planes_preventivos.id'), nullable=True)  # Ticket preventivo
+    personal_id = db.Column(db.Integer, db.ForeignKey('personal.id'), nullable=True)  # Responsable del personal
+
+    evidencias = db.relationship('Evidencia', backref='ticket', lazy=True, cascade='all, delete-orphan')
+    gasto = db.relationship('GastoEdificio', uselist=False, backref='ticket', cascade='all, delete-orphan')
+    transiciones = db.relationship('TransicionTicket', backref='ticket', lazy=True, cascade='all, delete-orphan',
+                                   order_by='TransicionTicket.id')
 
     def __init__(self, descripcion, prioridad):
         self.descripcion = descripcion
@@ -28,10 +75,33 @@ class Mantenimiento(db.Model):
         self.trabajo_realizado = False
         self.evidencia_url = None
 
-    def save(self):
+    def save(self, user_id=None):
+        if self.id_mantenimiento is None:
+            self.fecha_creacion = self.fecha_creacion or datetime.utcnow()
+            self._registrar_transicion(None, user_id)
         db.session.add(self)
         db.session.commit()
 
+    @property
+    def estado(self):
+        if self.trabajo_realizado:
+            return 'finalizado'
+        if self.responsable or self.fecha_ini:
+            return 'iniciado'
+        return 'pendiente'
+
+    def _registrar_transicion(self, anterior, user_id=None):
+        """Anota el cambio de estado (se guarda con el commit del llamador)"""
+        if anterior == self.estado:
+            return
+        self.transiciones.append(TransicionTicket(
+            estado_anterior=anterior,
+            estado_nuevo=self.estado,
+            fecha=datetime.utcnow(),
+            user_id=user_id
+        ))
+        invalidar_sla(self)
+
     @staticmethod
     def get_all():
         return Mantenimiento.query.order_by(Mantenimiento.fecha_creacion.desc()).all()
@@ -39,9 +109,97 @@ class Mantenimiento(db.Model):
     @staticmethod
     def get_by_id(id):
         return Mantenimiento.query.get(id)
+    
+    @staticmethod
+    def _columnas_orden(orden):
+        """Columnas (expresión, descendente) que definen el orden; el id desempata"""
+        if orden == 'antiguos':
+            return [(Mantenimiento.fecha_creacion, False), (Mantenimiento.id_mantenimiento, False)]
+        if orden == 'prioridad':
+            rango = case(RANGO_PRIORIDAD, value=Mantenimiento.prioridad, else_=0)
+            return [(rango, True), (Mantenimiento.fecha_creacion, True), (Mantenimiento.id_mantenimiento, True)]
+        return [(Mantenimiento.fecha_creacion, True), (Mantenimiento.id_mantenimiento, True)]
+    
+    def _valores_orden(self, orden):
+        if orden == 'prioridad':
+            return [RANGO_PRIORIDAD.get(self.prioridad, 0), self.fecha_creacion, self.id_mantenimiento]
+        return [self.fecha_creacion, self.id_mantenimiento]
+    
+    @staticmethod
+    def condiciones(prioridad=None, responsable=None, estado=None, desde=None, hasta=None):
+        """Condiciones SQL de los filtros de la lista (sirven para query y select)"""
+        condiciones = []
+        if prioridad:
+            condiciones.append(Mantenimiento.prioridad == prioridad)
+        if responsable == '-':
+            condiciones.append(Mantenimiento.responsable.is_(None))
+        elif responsable:
+            condiciones.append(Mantenimiento.responsable == responsable)
+        if estado == 'abiertos':
+            condiciones.append(or_(Mantenimiento.trabajo_realizado.is_(False), Mantenimiento.trabajo_realizado.is_(None)))
+        elif estado == 'cerrados':
+            condiciones.append(Mantenimiento.trabajo_realizado.is_(True))
+        if desde:
+            condiciones.append(Mantenimiento.fecha_creacion >= datetime.combine(desde, datetime.min.time()))
+        if hasta:
+            condiciones.append(Mantenimiento.fecha_creacion < datetime.combine(hasta + timedelta(days=1), datetime.min.time()))
+        return condiciones
+    
+    @staticmethod
+    def orden_sql(orden='recientes'):
+        """Cláusulas ORDER BY de un orden de la lista"""
+        return [c.desc() if d else c.asc() for c, d in Mantenimiento._columnas_orden(orden)]
+    
+    @staticmethod
+    def buscar(prioridad=None, responsable=None, estado=None, desde=None, hasta=None,
+               orden='recientes', despues_de=None, limite=25):
+        """
+        Lista filtrada con paginación por clave (keyset): 'despues_de' es el id
+        del último ticket de la página anterior. Devuelve (tickets, siguiente)
+        donde siguiente es el cursor de la próxima página o None.
+        """
+        query = Mantenimiento.query.filter(
+            *Mantenimiento.condiciones(prioridad, responsable, estado, desde, hasta)
+        )
+        
+        columnas = Mantenimiento._columnas_orden(orden)
+        
+        # Continuar después de la última fila vista: (a, b, c) < (x, y, z) expandido
+        ultimo = Mantenimiento.query.get(despues_de) if despues_de else None
+        if ultimo is not None:
+            valores = ultimo._valores_orden(orden)
+            condiciones = []
+            for i, (columna, descendente) in enumerate(columnas):
+                iguales = [columnas[j][0] == valores[j] for j in range(i)]
+                siguiente = columna < valores[i] if descendente else columna > valores[i]
+                condiciones.append(and_(*iguales, siguiente))
+            query = query.filter(or_(*condiciones))
+        
+        query = query.order_by(*Mantenimiento.orden_sql(orden))
+        tickets = query.limit(limite + 1).all()
+        
+        if len(tickets) > limite:
+            tickets = tickets[:limite]
+            return tickets, tickets[-1].id_mantenimiento
+        return tickets, None
+    
+    @staticmethod
+    def get_responsables():
+        """Responsables distintos (para el filtro de la lista)"""
+        filas = db.session.query(Mantenimiento.responsable).filter(
+            Mantenimiento.responsable.isnot(None)
+        ).distinct().order_by(Mantenimiento.responsable).all()
+        return [fila[0] for fila in filas]
 
-    def update_mantenimiento_inicio(self, responsable=None, fecha_ini=None, fecha_fin=None, costo=None, prioridad=None):
-        if responsable is not None:
+    def update_mantenimiento_inicio(self, responsable=None, fecha_ini=None, fecha_fin=None, costo=None, prioridad=None,
+                                    user_id=None, personal=None):
+        anterior = self.estado
+        if personal is not None:
+            self.personal_id = personal.id
+            self.responsable = personal.nombre
+        elif responsable is not None:
+            if responsable != self.responsable:
+                self.personal_id = None  # Texto libre: ya no es un miembro del personal
             self.responsable = responsable
         if fecha_ini is not None:
             self.fecha_ini = fecha_ini
@@ -50,16 +208,333 @@ class Mantenimiento(db.Model):
         if costo is not None:
             self.costo = costo
         if prioridad is not None:
+            if prioridad != self.prioridad:
+                invalidar_sla(self)
             self.prioridad = prioridad
+        self._registrar_transicion(anterior, user_id)
+        self.sincronizar_gasto()
         db.session.commit()
 
-    def update_mantenimiento_fin(self, trabajo_realizado=None, evidencia_url=None):
+    def update_mantenimiento_fin(self, trabajo_realizado=None, evidencia_url=None, user_id=None):
+        anterior = self.estado
         if trabajo_realizado is not None:
             self.trabajo_realizado = trabajo_realizado
         if evidencia_url is not None:
             self.evidencia_url = evidencia_url
+        self._registrar_transicion(anterior, user_id)
+        self.sincronizar_gasto()
         db.session.commit()
 
+    def sincronizar_gasto(self):
+        """
+        Refleja el costo de un ticket finalizado en su GastoEdificio (se guarda
+        con el commit del llamador). Sin cambios no toca la fila: es idempotente.
+        """
+        if not (self.trabajo_realizado and self.costo and self.costo > 0):
+            self.gasto = None  # delete-orphan borra el gasto si existía
+            return
+        monto = Decimal(str(self.costo)).quantize(Decimal('0.01'))
+        if self.gasto is None:
+            self.gasto = GastoEdificio(
+                concepto=GastoEdificio.concepto_ticket(self.id_mantenimiento),
+                monto=monto,
+                categoria='mantenimiento',
+                fecha_gasto=GastoEdificio.fecha_ticket(self),
+                descripcion=self.descripcion,
+                registrado_por=REGISTRADO_POR_MANTENIMIENTO
+            )
+            return
+        if self.gasto.monto != monto:
+            self.gasto.monto = monto
+        if self.gasto.categoria != 'mantenimiento':
+            self.gasto.categoria = 'mantenimiento'
+        fecha = GastoEdificio.fecha_ticket(self)
+        if self.gasto.fecha_gasto != fecha:
+            self.gasto.fecha_gasto = fecha
+
     def delete(self):
+        invalidar_sla(self)
         db.session.delete(self)
-        db.session.commit()
\ No newline at end of file
+        db.session.commit()
+
+    def evidencia_variante(self, variante):
+        """URL de una versión reducida de la evidencia ('mini' o 'web')"""
+        if self.evidencia_url and self.evidencia_url.startswith(PREFIJO_EVIDENCIA):
+            return f'{self.evidencia_url}/{variante}'
+        # Evidencias antiguas en static/: solo existe el original
+        return self.evidencia_url
+
+    def to_dict(self):
+        return {
+            'id': self.id_mantenimiento,
+            'descripcion': self.descripcion,
+            'prioridad': self.prioridad,
+            'responsable': self.responsable,
+            'fecha_ini': self.fecha_ini.isoformat() if self.fecha_ini else None,
+            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None,
+            'costo': float(self.costo) if self.costo is not None else None,
+            'trabajo_realizado': bool(self.trabajo_realizado),
+            'evidencia_url': self.evidencia_url,
+            'fecha_creacion': self.fecha_creacion.strftime('%Y-%m-%d %H:%M:%S') if self.fecha_creacion else None
+        }
+
+
+# Unidades de frecuencia de los planes preventivos
+UNIDADES_PLAN = ('dias', 'meses')
+
+def _sumar_periodo(fecha, cada, unidad):
+    if unidad == 'dias':
+        return fecha + timedelta(days=cada)
+    meses = fecha.month - 1 + cada
+    anio, mes = fecha.year + meses // 12, meses % 12 + 1
+    # Día 31 en un mes más corto: último día de ese mes
+    siguiente = date(anio + mes // 12, mes % 12 + 1, 1)
+    return date(anio, mes, min(fecha.day, (siguiente - timedelta(days=1)).day))
+
+
+class PlanPreventivo(db.Model):
+    """Mantenimiento periódico (p. ej. ascensor cada 30 días) que genera tickets"""
+    __tablename__ = 'planes_preventivos'
+    __table_args__ = (
+        # El programador busca los planes vencidos solo con este índice
+        db.Index('ix_planes_preventivos_activo_proxima', 'activo', 'proxima_fecha'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(100), nullable=False)
+    descripcion = db.Column(db.Text, nullable=False)
+    prioridad = db.Column(db.String(50), nullable=False, default='Media')
+    responsable = db.Column(db.String(100), nullable=True)
+    cada = db.Column(db.Integer, nullable=False)
+    unidad = db.Column(db.String(10), nullable=False, default='dias')  # 'dias' o 'meses'
+    proxima_fecha = db.Column(db.Date, nullable=False)
+    activo = db.Column(db.Boolean, nullable=False, default=True)
+    ultima_generacion = db.Column(db.DateTime, nullable=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    tickets = db.relationship('Mantenimiento', backref='plan', lazy='dynamic')
+
+    def __init__(self, nombre, descripcion, cada, unidad='dias', proxima_fecha=None, prioridad='Media',
+                 responsable=None):
+        if unidad not in UNIDADES_PLAN or cada < 1:
+            raise ValueError('Frecuencia no válida')
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.cada = cada
+        self.unidad = unidad
+        self.proxima_fecha = proxima_fecha or date.today()
+        self.prioridad = prioridad
+        self.responsable = responsable or None
+        self.activo = True
+
+    def save(self):
+        db.session.add(self)
+        db.session.commit()
+
+    def cambiar_activo(self):
+        self.activo = not self.activo
+        db.session.commit()
+
+    @property
+    def frecuencia(self):
+        return f"Cada {self.cada} {'días' if self.unidad == 'dias' else 'meses'}"
+
+    def siguiente_fecha(self, hoy):
+        """Próxima fecha posterior a hoy (si el plan estuvo detenido no se acumulan tickets)"""
+        fecha = _sumar_periodo(self.proxima_fecha, self.cada, self.unidad)
+        while fecha <= hoy:
+            fecha = _sumar_periodo(fecha, self.cada, self.unidad)
+        return fecha
+
+    @staticmethod
+    def get_all():
+        return PlanPreventivo.query.order_by(PlanPreventivo.activo.desc(), PlanPreventivo.proxima_fecha).all()
+
+    @staticmethod
+    def get_by_id(plan_id):
+        return PlanPreventivo.query.get(plan_id)
+
+    @staticmethod
+    def vencidos(hoy):
+        return PlanPreventivo.query.filter(
+            PlanPreventivo.activo.is_(True),
+            PlanPreventivo.proxima_fecha <= hoy
+        ).order_by(PlanPreventivo.proxima_fecha).all()
+
+    @staticmethod
+    def generar_tickets(hoy=None, user_id=None):
+        """
+        Crea un ticket por cada plan vencido, todo en una transacción.
+        Cada plan avanza su próxima fecha solo si nadie lo hizo antes
+        (UPDATE condicionado), así dos procesos no duplican tickets.
+        """
+        hoy = hoy or date.today()
+        ahora = datetime.utcnow()
+        tickets = []
+        for plan in PlanPreventivo.vencidos(hoy):
+            avanzado = db.session.execute(
+                update(PlanPreventivo)
+                .where(PlanPreventivo.id == plan.id, PlanPreventivo.proxima_fecha == plan.proxima_fecha)
+                .values(proxima_fecha=plan.siguiente_fecha(hoy), ultima_generacion=ahora)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not avanzado:
+                continue
+
+            ticket = Mantenimiento(f'[Preventivo] {plan.nombre}: {plan.descripcion}', plan.prioridad)
+            ticket.plan_id = plan.id
+            ticket.fecha_creacion = ahora
+            ticket._registrar_transicion(None, user_id)
+            if plan.responsable:
+                anterior = ticket.estado
+                ticket.responsable = plan.responsable
+                ticket._registrar_transicion(anterior, user_id)
+            tickets.append(ticket)
+
+        db.session.add_all(tickets)
+        db.session.commit()
+        return tickets
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'nombre': self.nombre,
+            'descripcion': self.descripcion,
+            'prioridad': self.prioridad,
+            'responsable': self.responsable,
+            'cada': self.cada,
+            'unidad': self.unidad,
+            'proxima_fecha': self.proxima_fecha.isoformat() if self.proxima_fecha else None,
+            'activo': bool(self.activo),
+            'ultima_generacion': self.ultima_generacion.strftime('%Y-%m-%d %H:%M:%S') if self.ultima_generacion else None
+        }
+
+
+class TransicionTicket(db.Model):
+    """Registro de cada cambio de estado de un ticket (base de las métricas SLA)"""
+    __tablename__ = 'transiciones_ticket'
+    __table_args__ = (
+        db.Index('ix_transiciones_ticket_ticket_estado', 'ticket_id', 'estado_nuevo', 'fecha'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('mantenimiento.id_mantenimiento'), nullable=False)
+    estado_anterior = db.Column(db.String(20), nullable=True)  # None al crear el ticket
+    estado_nuevo = db.Column(db.String(20), nullable=False)
+    fecha = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+
+    @staticmethod
+    def reconstruir_faltantes():
+        """
+        Crea transiciones aproximadas para tickets anteriores al registro,
+        usando fecha_creacion, fecha_ini y fecha_fin. Devuelve cuántos tickets completó.
+        """
+        con_registro = db.session.query(TransicionTicket.ticket_id).distinct()
+        tickets = Mantenimiento.query.filter(~Mantenimiento.id_mantenimiento.in_(con_registro)).all()
+        for ticket in tickets:
+            creado = ticket.fecha_creacion or datetime.utcnow()
+            pasos = [(None, 'pendiente', creado)]
+            if ticket.estado in ('iniciado', 'finalizado'):
+                inicio = datetime.combine(ticket.fecha_ini, datetime.min.time()) if ticket.fecha_ini else creado
+                pasos.append(('pendiente', 'iniciado', max(inicio, creado)))
+            if ticket.estado == 'finalizado':
+                fin = datetime.combine(ticket.fecha_fin, datetime.min.time()) if ticket.fecha_fin else pasos[-1][2]
+                pasos.append(('iniciado', 'finalizado', max(fin, pasos[-1][2])))
+            for anterior, nuevo, fecha in pasos:
+                db.session.add(TransicionTicket(
+                    ticket_id=ticket.id_mantenimiento, estado_anterior=anterior, estado_nuevo=nuevo, fecha=fecha
+                ))
+        db.session.commit()
+        if tickets:
+            cache_sla().invalidar()
+        return len(tickets)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'ticket_id': self.ticket_id,
+            'estado_anterior': self.estado_anterior,
+            'estado_nuevo': self.estado_nuevo,
+            'fecha': self.fecha.strftime('%Y-%m-%d %H:%M:%S') if self.fecha else None,
+            'user_id': self.user_id
+        }
+
+
+class Evidencia(db.Model):
+    """Imagen subida a un ticket; el archivo vive en el almacén por contenido"""
+    __tablename__ = 'evidencias'
+    __table_args__ = (
+        db.Index('ix_evidencias_ticket_id', 'ticket_id'),
+        db.Index('ix_evidencias_clave', 'clave'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('mantenimiento.id_mantenimiento'), nullable=False)
+    clave = db.Column(db.String(64), nullable=False)  # SHA-256 del contenido
+    extension = db.Column(db.String(10), nullable=False)
+    tamano = db.Column(db.Integer, nullable=False)
+    nombre_original = db.Column(db.String(255), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    fecha_subida = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def registrar(ticket_id, clave, extension, tamano, nombre_original=None, user_id=None):
+        """Asocia una imagen al ticket; la misma imagen en el mismo ticket se registra una vez"""
+        evidencia = Evidencia.query.filter_by(ticket_id=ticket_id, clave=clave).first()
+        if evidencia is None:
+            evidencia = Evidencia(
+                ticket_id=ticket_id,
+                clave=clave,
+                extension=extension,
+                tamano=tamano,
+                nombre_original=nombre_original,
+                user_id=user_id
+            )
+            db.session.add(evidencia)
+        return evidencia
+
+    @staticmethod
+    def get_por_clave(clave):
+        return Evidencia.query.filter_by(clave=clave).first()
+
+    @staticmethod
+    def en_uso(claves):
+        """Claves que todavía usa algún ticket"""
+        if not claves:
+            return set()
+        filas = db.session.query(Evidencia.clave).filter(Evidencia.clave.in_(claves)).distinct()
+        return {clave for (clave,) in filas}
+
+    @staticmethod
+    def uso_por_ticket(ticket_ids=None):
+        """{ticket_id: {'archivos', 'bytes'}} con lo que ocupa la evidencia de cada ticket"""
+        consulta = db.session.query(
+            Evidencia.ticket_id, func.count(Evidencia.id), func.sum(Evidencia.tamano)
+        ).group_by(Evidencia.ticket_id)
+        if ticket_ids is not None:
+            consulta = consulta.filter(Evidencia.ticket_id.in_(ticket_ids))
+        return {
+            ticket_id: {'archivos': archivos, 'bytes': int(total or 0)}
+            for ticket_id, archivos, total in consulta
+        }
+
+    @staticmethod
+    def uso_total():
+        """Bytes referenciados por los tickets y bytes reales en disco (sin duplicados)"""
+        referenciado = db.session.query(func.coalesce(func.sum(Evidencia.tamano), 0)).scalar()
+        unicos = db.session.query(Evidencia.clave, func.max(Evidencia.tamano).label('tamano')) \
+            .group_by(Evidencia.clave).subquery()
+        en_disco = db.session.query(func.coalesce(func.sum(unicos.c.tamano), 0)).scalar()
+        return {'referenciado': int(referenciado), 'en_disco': int(en_disco)}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'ticket_id': self.ticket_id,
+            'clave': self.clave,
+            'extension': self.extension,
+            'tamano': self.tamano,
+            'nombre_original': self.nombre_original,
+            'fecha_subida': self.fecha_subida.strftime('%Y-%m-%d %H:%M:%S') if self.fecha_subida else None
+        }
@@ -0,0 +1,74 @@
+# app/models/personal_model.py
+from database import db
+from datetime import datetime
+from models.user_model import User
+
+class Personal(db.Model):
+    """Ficha de mantenimiento de un usuario con rol 'personal'"""
+    __tablename__ = 'personal'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), unique=True, nullable=False)
+    especialidad = db.Column(db.String(100), nullable=True)  # 'electricidad', 'plomería', etc.
+    capacidad = db.Column(db.Integer, nullable=False, default=5)  # Tickets abiertos a la vez
+    activo = db.Column(db.Boolean, nullable=False, default=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # La ficha se elimina con su usuario; sus tickets quedan sin miembro asignado
+    usuario = db.relationship('User', backref=db.backref('personal', uselist=False, cascade='all, delete-orphan'))
+    tickets = db.relationship('Mantenimiento', lazy=True)
+
+    def __init__(self, user_id, especialidad=None, capacidad=5):
+        self.user_id = user_id
+        self.especialidad = especialidad
+        self.capacidad = capacidad
+        self.activo = True
+
+    def save(self):
+        db.session.add(self)
+        db.session.commit()
+
+    def update(self):
+        db.session.commit()
+
+    @property
+    def nombre(self):
+        return self.usuario.get_full_name() if self.usuario else f'Personal #{self.id}'
+
+    @staticmethod
+    def get_all():
+        return Personal.query.join(User).order_by(Personal.activo.desc(), User.first_name).all()
+
+    @staticmethod
+    def get_by_id(personal_id):
+        return Personal.query.get(personal_id)
+
+    @staticmethod
+    def sincronizar_usuarios():
+        """
+        Crea la ficha de los usuarios con rol 'personal' que todavía no la tienen
+        y desactiva la de quienes ya no tienen ese rol
+        """
+        sin_ficha = User.query.outerjoin(Personal, Personal.user_id == User.id).filter(
+            User.role == 'personal', Personal.id.is_(None)
+        ).all()
+        for usuario in sin_ficha:
+            db.session.add(Personal(user_id=usuario.id))
+        sin_rol = Personal.query.join(User).filter(
+            Personal.activo.is_(True), User.role != 'personal'
+        ).all()
+        for miembro in sin_rol:
+            miembro.activo = False
+        if sin_ficha or sin_rol:
+            db.session.commit()
+        return len(sin_ficha)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'nombre': self.nombre,
+            'especialidad': self.especialidad,
+            'capacidad': self.capacidad,
+            'activo': bool(self.activo)
+        }
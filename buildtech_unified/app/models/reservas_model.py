@@ -124,7 +124,7 @@ class Reserva(db.Model):
     area_id = db.Column(db.Integer, db.ForeignKey('areas_comunes.id'), nullable=False)
     
     # Departamento que reserva
-    departamento = db.Column(db.Integer, nullable=False, index=True)
+    departamento = db.Column(db.Integer, db.ForeignKey('departamentos.numero'), nullable=False, index=True)
     
     # Información del usuario que reserva
     usuario = db.Column(db.String(100), nullable=False)
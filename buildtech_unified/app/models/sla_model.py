@@ -0,0 +1,234 @@
+# models/sla_model.py
+"""
+Métricas SLA de mantenimiento
+Horas desde la creación de cada ticket hasta su inicio y hasta su fin,
+calculadas a partir de TransicionTicket y agrupadas por mes y prioridad
+(o responsable) en SQL. Los meses cerrados —ya terminados y sin tickets
+abiertos— casi no cambian, así que se cachean con una huella de sus
+tickets y transiciones leída de la base: un cambio hecho por otro proceso
+(p. ej. 'tareas.py reconstruir-transiciones') también descarta lo cacheado.
+"""
+
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, func, case, literal
+from database import db
+from models.mantenimiento_model import Mantenimiento, TransicionTicket, cache_sla
+
+PERCENTILES = (50, 90, 95)
+AGRUPACIONES = ('prioridad', 'responsable')
+
+
+# ============= PERIODOS =============
+
+def _primer_dia(mes):
+    return datetime.strptime(mes, '%Y-%m').date()
+
+
+def _siguiente(dia):
+    return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def meses_entre(desde, hasta):
+    """Lista 'YYYY-MM' de desde a hasta, ambos incluidos"""
+    meses = []
+    dia, fin = _primer_dia(desde), _primer_dia(hasta)
+    while dia <= fin:
+        meses.append(dia.strftime('%Y-%m'))
+        dia = _siguiente(dia)
+    return meses
+
+
+def _rango(meses):
+    """(primer día, último día) que cubre los meses dados"""
+    return _primer_dia(meses[0]), _siguiente(_primer_dia(meses[-1])) - timedelta(days=1)
+
+
+def meses_cerrados(meses, ahora):
+    """Meses ya terminados en los que no queda ningún ticket abierto"""
+    actual = ahora.strftime('%Y-%m')
+    pasados = [m for m in meses if m < actual]
+    if not pasados:
+        return set()
+    desde, hasta = _rango(pasados)
+    con_abiertos = {
+        mes for (mes,) in db.session.query(_mes(Mantenimiento.fecha_creacion)).filter(
+            *Mantenimiento.condiciones(estado='abiertos', desde=desde, hasta=hasta)
+        ).distinct()
+    }
+    return {m for m in pasados if m not in con_abiertos}
+
+
+def huellas(meses):
+    """
+    {mes: huella} de los tickets creados en cada mes: cantidad, última
+    modificación y cantidad y mayor id de sus transiciones (una consulta)
+    """
+    T = Mantenimiento
+    desde, hasta = _rango(meses)
+    mes = _mes(T.fecha_creacion)
+    filas = db.session.execute(
+        select(
+            mes,
+            func.count(func.distinct(T.id_mantenimiento)),
+            func.max(func.coalesce(T.fecha_modificacion, T.fecha_creacion)),
+            func.count(TransicionTicket.id),
+            func.max(TransicionTicket.id),
+        ).outerjoin(TransicionTicket, TransicionTicket.ticket_id == T.id_mantenimiento)
+        .where(*T.condiciones(desde=desde, hasta=hasta), mes.in_(meses))
+        .group_by(mes)
+    )
+    return {fila[0]: tuple(str(valor) for valor in fila[1:]) for fila in filas}
+
+
+# ============= CONSULTAS =============
+
+def _es_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _mes(fecha):
+    """'YYYY-MM' de una fecha en SQL"""
+    if _es_postgres():
+        return func.to_char(fecha, 'YYYY-MM')
+    return func.strftime('%Y-%m', fecha)
+
+
+def _horas(desde, hasta):
+    if _es_postgres():
+        return func.extract('epoch', hasta - desde) / 3600.0
+    return (func.julianday(hasta) - func.julianday(desde)) * 24.0
+
+
+def _base(meses, agrupar, objetivos, ahora):
+    """Una fila por ticket con sus tiempos y sus objetivos"""
+    T = Mantenimiento
+    iniciado = select(
+        TransicionTicket.ticket_id, func.min(TransicionTicket.fecha).label('fecha')
+    ).where(TransicionTicket.estado_nuevo != 'pendiente').group_by(TransicionTicket.ticket_id).subquery()
+    finalizado = select(
+        TransicionTicket.ticket_id, func.max(TransicionTicket.fecha).label('fecha')
+    ).where(TransicionTicket.estado_nuevo == 'finalizado').group_by(TransicionTicket.ticket_id).subquery()
+
+    def objetivo(tipo):
+        return case(
+            {prioridad: horas[tipo] for prioridad, horas in objetivos.items()},
+            value=T.prioridad, else_=None
+        )
+
+    grupo = T.prioridad if agrupar == 'prioridad' else func.coalesce(T.responsable, '-')
+    ahora_sql = literal(ahora.replace(microsecond=0), db.DateTime)
+    fin = case((T.trabajo_realizado.is_(True), finalizado.c.fecha), else_=None)
+    desde, hasta = _rango(meses)
+
+    return select(
+        _mes(T.fecha_creacion).label('mes'),
+        grupo.label('grupo'),
+        _horas(T.fecha_creacion, iniciado.c.fecha).label('horas_inicio'),
+        _horas(T.fecha_creacion, fin).label('horas_fin'),
+        # Para los incumplimientos, lo que sigue pendiente cuenta hasta ahora
+        _horas(T.fecha_creacion, func.coalesce(iniciado.c.fecha, ahora_sql)).label('espera_inicio'),
+        _horas(T.fecha_creacion, func.coalesce(fin, ahora_sql)).label('espera_fin'),
+        objetivo('inicio').label('objetivo_inicio'),
+        objetivo('fin').label('objetivo_fin'),
+    ).outerjoin(iniciado, iniciado.c.ticket_id == T.id_mantenimiento) \
+     .outerjoin(finalizado, finalizado.c.ticket_id == T.id_mantenimiento) \
+     .where(
+         *T.condiciones(desde=desde, hasta=hasta),
+         _mes(T.fecha_creacion).in_(meses)
+     ).subquery()
+
+
+def _resumen(base):
+    incumplido = lambda espera, objetivo: func.sum(case((espera > objetivo, 1), else_=0))
+    return select(
+        base.c.mes, base.c.grupo,
+        func.count().label('tickets'),
+        func.count(base.c.horas_inicio).label('iniciados'),
+        func.count(base.c.horas_fin).label('finalizados'),
+        func.avg(base.c.horas_inicio).label('promedio_inicio'),
+        func.avg(base.c.horas_fin).label('promedio_fin'),
+        incumplido(base.c.espera_inicio, base.c.objetivo_inicio).label('incumplidos_inicio'),
+        incumplido(base.c.espera_fin, base.c.objetivo_fin).label('incumplidos_fin'),
+    ).group_by(base.c.mes, base.c.grupo)
+
+
+def _percentiles(base, columna):
+    """Percentiles por rango más cercano con funciones de ventana"""
+    particion = (base.c.mes, base.c.grupo)
+    ordenadas = select(
+        base.c.mes, base.c.grupo, columna.label('horas'),
+        func.row_number().over(partition_by=particion, order_by=columna).label('n'),
+        func.count().over(partition_by=particion).label('total'),
+    ).where(columna.isnot(None)).subquery()
+    return select(
+        ordenadas.c.mes, ordenadas.c.grupo,
+        *[
+            func.max(case((ordenadas.c.n == (ordenadas.c.total * p + 99) // 100, ordenadas.c.horas)))
+            .label(f'p{p}')
+            for p in PERCENTILES
+        ]
+    ).group_by(ordenadas.c.mes, ordenadas.c.grupo)
+
+
+def _redondear(valor):
+    return round(valor, 2) if valor is not None else None
+
+
+def calcular(meses, agrupar, objetivos, ahora):
+    """{mes: [grupo, ...]} para los meses dados (tres consultas agrupadas)"""
+    base = _base(meses, agrupar, objetivos, ahora)
+    inicio = {(f.mes, f.grupo): f for f in db.session.execute(_percentiles(base, base.c.horas_inicio))}
+    fin = {(f.mes, f.grupo): f for f in db.session.execute(_percentiles(base, base.c.horas_fin))}
+
+    resultado = {mes: [] for mes in meses}
+    for fila in db.session.execute(_resumen(base).order_by(base.c.mes, base.c.grupo)):
+        clave = (fila.mes, fila.grupo)
+        grupo = {
+            'grupo': fila.grupo,
+            'tickets': fila.tickets,
+            'iniciados': fila.iniciados,
+            'finalizados': fila.finalizados,
+        }
+        for tipo, percentiles in (('inicio', inicio.get(clave)), ('fin', fin.get(clave))):
+            grupo[tipo] = {
+                'promedio_horas': _redondear(getattr(fila, f'promedio_{tipo}')),
+                'incumplidos': int(getattr(fila, f'incumplidos_{tipo}') or 0),
+                **{f'p{p}': _redondear(getattr(percentiles, f'p{p}', None)) for p in PERCENTILES},
+            }
+        resultado[fila.mes].append(grupo)
+    return resultado
+
+
+# ============= API =============
+
+def metricas_sla(desde, hasta, agrupar='prioridad', objetivos=None, ahora=None):
+    """
+    Métricas por mes entre 'desde' y 'hasta' ('YYYY-MM'). Los meses cerrados
+    salen de la caché; el resto se calcula junto en una sola pasada.
+    """
+    objetivos = objetivos or current_app.config['SLA_OBJETIVOS_HORAS']
+    ahora = ahora or datetime.utcnow()
+    meses = meses_entre(desde, hasta)
+    if not meses:
+        return []
+
+    cerrados = meses_cerrados(meses, ahora)
+    huella = huellas(sorted(cerrados)) if cerrados else {}
+    cache = cache_sla()
+    firma = tuple(sorted((p, h['inicio'], h['fin']) for p, h in objetivos.items()))
+
+    abiertos = [m for m in meses if m not in cerrados]
+    calculados = calcular(abiertos, agrupar, objetivos, ahora) if abiertos else {}
+
+    periodos = []
+    for mes in meses:
+        if mes in cerrados:
+            grupos = cache.obtener(
+                (mes, agrupar, firma, huella.get(mes)),
+                lambda mes=mes: calcular([mes], agrupar, objetivos, ahora)[mes]
+            )
+        else:
+            grupos = calculados[mes]
+        periodos.append({'mes': mes, 'cerrado': mes in cerrados, 'grupos': grupos})
+    return periodos
@@ -1,6 +1,7 @@
 # app/models/user_model.py
 from database import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils.contrasenas import politica_hash
+from utils import permisos
 from flask_login import UserMixin
 
 class User(db.Model, UserMixin):
@@ -22,7 +23,7 @@ class User(db.Model, UserMixin):
     # Roles: 'admin', 'residente', 'personal'
     
     # Departamento (si es residente)
-    departamento = db.Column(db.Integer, nullable=True)
+    departamento = db.Column(db.Integer, db.ForeignKey('departamentos.numero'), nullable=True, index=True)
     
     # Control de contraseña
     must_change_password = db.Column(db.Boolean, default=False)
@@ -46,10 +47,22 @@ class User(db.Model, UserMixin):
         self.telefono = telefono
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = politica_hash.generar(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return politica_hash.verificar(self.password_hash, password)[0]
+
+    def verificar_y_actualizar(self, password):
+        """
+        Verifica la contraseña; si es correcta y el hash usa parámetros
+        anteriores, lo rehace con los actuales. Devuelve (correcta, segundos de CPU).
+        """
+        correcta, segundos = politica_hash.verificar(self.password_hash, password)
+        if correcta and politica_hash.necesita_rehash(self.password_hash):
+            self.set_password(password)
+            db.session.commit()
+            politica_hash.metricas.registrar_rehash()
+        return correcta, segundos
     
     def save(self):
         db.session.add(self)
@@ -81,5 +94,11 @@ class User(db.Model, UserMixin):
     def has_role(self, role):
         return self.role == role
     
+    def puede(self, permiso):
+        return permisos.puede(self, permiso)
+    
+    def puede_departamento(self, departamento_id):
+        return permisos.puede_departamento(self, departamento_id)
+    
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}"
\ No newline at end of file
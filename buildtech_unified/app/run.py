@@ -21,14 +21,25 @@ from controllers.mantenimiento_controller import mantenimiento_bp
 from controllers.comunicacion_controller import comunicacion_bp
 from controllers.finanzas_controller import finanzas_bp
 from controllers.reservas_controller import reservas_bp
+from controllers.reportes_controller import reportes_bp
 
 # Importar eventos de Socket.IO
 from socket_events import register_socket_events
+from utils.notificaciones_push import configurar_canal
+from utils.reportes import configurar_almacen
+from utils.importacion_residentes import configurar_importaciones
+from utils.evidencias import configurar_evidencias
+from utils.programador_preventivo import iniciar_programador
+from utils.sesiones import configurar_sesiones
+from utils.principales import cache_principales
+from models.acceso_model import configurar_limite_login
+from utils.contrasenas import configurar_hash, METODO_POR_DEFECTO
+from utils.permisos import configurar_plantillas
 
-# Importar modelos para cargar usuario
-from models.user_model import User
+from models.departamento_model import Departamento
 
-def create_app():
+def create_app(config=None):
+    """Crea la aplicación; 'config' reemplaza valores por defecto (pruebas, tareas)"""
     app = Flask(__name__)
     
     # Configuración
@@ -36,9 +47,57 @@ def create_app():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = 'buildtech-secret-key-2025'
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
+    app.config['NOTIFICACIONES_VENTANA_SEGUNDOS'] = 1.0  # Agrupar ráfagas de notificaciones
+    
+    # Límites del chat en tiempo real
+    app.config['CHAT_PAQUETE_MAX_BYTES'] = 64 * 1024       # Tamaño máximo de un paquete Socket.IO
+    app.config['CHAT_MENSAJE_MAX_CARACTERES'] = 2000
+    app.config['CHAT_RAFAGA_CONEXION'] = 5                 # Mensajes seguidos permitidos por conexión
+    app.config['CHAT_MENSAJES_SEGUNDO_CONEXION'] = 1.0
+    app.config['CHAT_RAFAGA_USUARIO'] = 10                 # Suma de todas las pestañas del usuario
+    app.config['CHAT_MENSAJES_SEGUNDO_USUARIO'] = 2.0
+    app.config['CHAT_POLITICA_EXCESO'] = 'descartar'       # 'descartar' o 'encolar'
+    app.config['CHAT_COLA_MAX'] = 10                       # Mensajes retenidos por conexión al encolar
+    
+    # Reportes PDF (generados en procesos aparte y guardados en disco)
+    app.config['REPORTES_DIR'] = os.path.join(app.instance_path, 'reportes')
+    app.config['REPORTES_PROCESOS'] = 2                    # 0 = generar en el mismo proceso (también el hash de la importación)
+    app.config['REPORTES_ESPERA_SEGUNDOS'] = 5             # Luego se muestra la página de espera
+    
+    # Objetivos SLA de mantenimiento: horas hasta el inicio y hasta el fin por prioridad
+    app.config['SLA_OBJETIVOS_HORAS'] = {
+        'Alta': {'inicio': 4, 'fin': 24},
+        'Media': {'inicio': 24, 'fin': 72},
+        'Baja': {'inicio': 72, 'fin': 168},
+    }
+    
+    # Mantenimiento preventivo: cada cuánto revisa el servidor los planes vencidos
+    app.config['PREVENTIVO_INTERVALO_SEGUNDOS'] = 3600     # 0 = solo con 'tareas.py generar-preventivos'
+    
+    # Evidencias fotográficas (almacén por contenido con variantes WebP)
+    app.config['EVIDENCIAS_DIR'] = os.path.join(app.instance_path, 'evidencias')
+    app.config['EVIDENCIAS_PROCESOS'] = 1                  # 0 = generar variantes en el mismo proceso
+    
+    # Sesiones en el servidor: 'sqlite', 'memoria' (pruebas) o None (cookie firmada)
+    app.config['SESIONES_ALMACEN'] = 'sqlite'
+    app.config['SESIONES_RUTA'] = os.path.join(app.instance_path, 'sesiones.db')
+    app.config['USUARIOS_CACHE_SEGUNDOS'] = 30             # Copia en memoria del usuario logueado
+    
+    # Intentos de login fallidos permitidos por ventana deslizante (compartido entre procesos)
+    app.config['LOGIN_VENTANA_SEGUNDOS'] = 300
+    app.config['LOGIN_MAX_FALLOS_USUARIO'] = 5
+    app.config['LOGIN_MAX_FALLOS_IP'] = 20
+    
+    # Hash de contraseñas ('tareas.py benchmark-hash' sugiere un costo para este equipo)
+    app.config['PASSWORD_METODO'] = METODO_POR_DEFECTO    # Hashes con otro método se rehacen al iniciar sesión
+    
+    app.config.update(config or {})
     
     # Inicializar extensiones
     db.init_app(app)
+    os.makedirs(app.instance_path, exist_ok=True)
+    configurar_sesiones(app)
+    cache_principales.segundos = app.config['USUARIOS_CACHE_SEGUNDOS']
     
     # Configurar Flask-Login
     login_manager = LoginManager()
@@ -47,10 +106,14 @@ def create_app():
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.get_by_id(int(user_id))
+        return cache_principales.obtener(int(user_id))
     
     # Inicializar Socket.IO
-    socketio = SocketIO(app, cors_allowed_origins="*")
+    socketio = SocketIO(
+        app,
+        cors_allowed_origins="*",
+        max_http_buffer_size=app.config['CHAT_PAQUETE_MAX_BYTES']
+    )
     
     # Registrar blueprints
     app.register_blueprint(auth_bp)
@@ -58,21 +121,44 @@ def create_app():
     app.register_blueprint(comunicacion_bp)
     app.register_blueprint(finanzas_bp)
     app.register_blueprint(reservas_bp)
+    app.register_blueprint(reportes_bp)
     
     # Registrar eventos de Socket.IO
-    register_socket_events(socketio)
+    register_socket_events(socketio, app.config)
+    configurar_canal(socketio, app.config['NOTIFICACIONES_VENTANA_SEGUNDOS'])
+    configurar_almacen(app, socketio)
+    configurar_importaciones(app)
+    configurar_evidencias(app)
+    configurar_limite_login(app)
+    configurar_hash(app)
+    configurar_plantillas(app)
     
-    # Crear directorios necesarios
+    # Crear directorios necesarios (evidencias anteriores al almacén por contenido)
     os.makedirs('static/uploads/evidencias', exist_ok=True)
     
     # Crear tablas
     with app.app_context():
         db.create_all()
         
+        # Columnas e índices nuevos en tablas existentes
+        from utils.esquema import actualizar_esquema
+        actualizar_esquema()
+        
+        # Ficha de mantenimiento para los usuarios con rol 'personal'
+        from models.personal_model import Personal
+        Personal.sincronizar_usuarios()
+        
+        # Unidades usadas en usuarios, cargos, reservas y pagos, con sus contadores
+        Departamento.sincronizar()
+        
         # Inicializar áreas comunes si no existen
         from models.reservas_model import inicializar_areas_comunes
         inicializar_areas_comunes()
         
+        # Índice de búsqueda de texto completo
+        from models.busqueda_model import inicializar_busqueda
+        inicializar_busqueda()
+        
         print("\n" + "="*70)
         print("✓ Base de datos SQLite creada correctamente.")
         print("✓ Todas las tablas fueron creadas exitosamente.")
@@ -102,4 +188,5 @@ def create_app():
 
 if __name__ == "__main__":
     app, socketio = create_app()
+    iniciar_programador(app, socketio)
     socketio.run(app, debug=True, host='0.0.0.0', port=7000)
\ No newline at end of file
@@ -1,17 +1,180 @@
+import threading
+from collections import deque
+from flask import request, current_app
 from flask_socketio import emit, join_room, leave_room
+from flask_login import current_user
 from models.chat_model import ChatMessage, Notification
 from models.mantenimiento_model import Mantenimiento
+from utils.notificaciones_push import obtener_canal, SALA_ADMIN
+from utils.presencia import registro_presencia
+from utils.limite_tasa import LimitadorTasa, admitir
+from utils.formato_compacto import negociar, preparar, difundir
+from utils import permisos
 
-def register_socket_events(socketio):
+# Cada cuánto se eliminan del registro las conexiones caídas sin disconnect
+INTERVALO_PURGA_SEGUNDOS = 60
+
+def register_socket_events(socketio, config=None):
     """Registrar todos los eventos de Socket.IO"""
+    config = config or {}
+    
+    purga = {'iniciada': False}
+    
+    # Límites de envío de mensajes (por conexión y por usuario)
+    max_caracteres = config.get('CHAT_MENSAJE_MAX_CARACTERES', 2000)
+    politica_exceso = config.get('CHAT_POLITICA_EXCESO', 'descartar')  # 'descartar' o 'encolar'
+    cola_max = config.get('CHAT_COLA_MAX', 10)
+    limite_conexion = LimitadorTasa(
+        config.get('CHAT_RAFAGA_CONEXION', 5),
+        config.get('CHAT_MENSAJES_SEGUNDO_CONEXION', 1.0)
+    )
+    limite_usuario = LimitadorTasa(
+        config.get('CHAT_RAFAGA_USUARIO', 10),
+        config.get('CHAT_MENSAJES_SEGUNDO_USUARIO', 2.0)
+    )
+    
+    # sid -> mensajes retenidos por exceso de tasa (política 'encolar')
+    colas = {}
+    colas_lock = threading.Lock()
+    
+    def purgar_conexiones_caidas():
+        while True:
+            socketio.sleep(INTERVALO_PURGA_SEGUNDOS)
+            eliminadas = registro_presencia.purgar(
+                lambda sid: socketio.server.manager.is_connected(sid, '/')
+            )
+            if eliminadas:
+                print(f'Presencia: {eliminadas} conexiones caídas eliminadas')
+            limite_conexion.compactar()
+            limite_usuario.compactar()
+    
+    def emitir_error(evento, codigo, mensaje, **detalles):
+        """Error estructurado para el cliente"""
+        emit('error', dict(detalles, evento=evento, codigo=codigo, mensaje=mensaje))
+    
+    def publicar_mensaje(user_id, content, room, ticket_id=None):
+        """Guarda el mensaje y lo difunde a la sala"""
+        message = ChatMessage(content=content, user_id=user_id, ticket_id=ticket_id)
+        message.save()
+        registro_presencia.registrar_mensaje()
+        registro_presencia.medir_emit(
+            difundir, socketio, registro_presencia, 'new_message',
+            message.to_dict, message.to_compacto, room
+        )
+    
+    def vaciar_cola(app, sid, user_id):
+        """Publica los mensajes retenidos a medida que se liberan tokens"""
+        with app.app_context():
+            while True:
+                with colas_lock:
+                    cola = colas.get(sid)
+                    if not cola:
+                        colas.pop(sid, None)
+                        return
+                espera = admitir([(limite_conexion, sid), (limite_usuario, user_id)])
+                if espera:
+                    socketio.sleep(espera)
+                    continue
+                with colas_lock:
+                    if not cola:
+                        continue
+                    content, room, ticket_id = cola.popleft()
+                publicar_mensaje(user_id, content, room, ticket_id)
+    
+    def enviar_mensaje(evento, contexto, content, room, ticket_id=None):
+        """Aplica límites de tamaño y tasa antes de publicar"""
+        if not isinstance(content, str) or not content.strip():
+            return
+        if len(content) > max_caracteres:
+            emitir_error(evento, 'mensaje_muy_largo',
+                         f'El mensaje supera los {max_caracteres} caracteres',
+                         limite=max_caracteres)
+            return
+        
+        sid = request.sid
+        user_id = contexto['user_id']
+        with colas_lock:
+            cola = colas.get(sid)
+        
+        # Si ya hay mensajes retenidos se encola detrás para mantener el orden
+        espera = admitir([(limite_conexion, sid), (limite_usuario, user_id)]) if not cola else 1.0
+        if not espera:
+            publicar_mensaje(user_id, content, room, ticket_id)
+            return
+        
+        if politica_exceso == 'encolar':
+            with colas_lock:
+                cola = colas.get(sid)
+                nueva = cola is None
+                if nueva:
+                    cola = colas[sid] = deque()
+                if len(cola) < cola_max:
+                    cola.append((content, room, ticket_id))
+                    if nueva:
+                        socketio.start_background_task(
+                            vaciar_cola, current_app._get_current_object(), sid, user_id
+                        )
+                    emitir_error(evento, 'limite_tasa', 'Mensaje retenido por exceso de envíos',
+                                 accion='encolado', pendientes=len(cola))
+                    return
+        
+        emitir_error(evento, 'limite_tasa', 'Demasiados mensajes, espere un momento',
+                     accion='descartado', reintentar_en=round(espera, 2))
+    
+    def unirse(sala):
+        join_room(sala)
+        registro_presencia.unirse(request.sid, sala)
+    
+    def usuario_actual():
+        """Contexto del usuario ligado al sid en el connect (None si no hay)"""
+        contexto = registro_presencia.usuario(request.sid)
+        if not contexto or contexto['user_id'] is None:
+            emitir_error(None, 'no_autenticado', 'Sesión no autenticada')
+            return None
+        return contexto
+    
+    def puede_ver_ticket(contexto, ticket_id):
+        """Mismo criterio que la vista del ticket: usuarios autenticados y ticket existente"""
+        return contexto is not None and Mantenimiento.get_by_id(ticket_id) is not None
+    
+    def emitir_historial(contexto, messages):
+        """Envía el historial en el formato negociado por el cliente"""
+        ChatMessage.precargar_autores(messages)
+        emit('load_messages', preparar(
+            contexto['formato'],
+            lambda: [msg.to_dict() for msg in messages],
+            lambda: [msg.to_compacto() for msg in messages]
+        ))
+    
+    def salir(sala):
+        leave_room(sala)
+        registro_presencia.salir(request.sid, sala)
     
     @socketio.on('connect')
-    def handle_connect():
+    def handle_connect(auth=None):
+        # Solo se aceptan conexiones con sesión de Flask-Login
+        if not current_user.is_authenticated:
+            return False
+        
         print('Cliente conectado')
-        emit('connection_response', {'data': 'Conectado al servidor'})
+        formato = negociar(auth)
+        registro_presencia.conectar(request.sid, current_user, formato)
+        
+        # Sala personal: avisos dirigidos a este usuario (p. ej. reportes listos)
+        unirse(f'usuario_{current_user.id}')
+        
+        if not purga['iniciada']:
+            purga['iniciada'] = True
+            socketio.start_background_task(purgar_conexiones_caidas)
+        
+        emit('connection_response', {'data': 'Conectado al servidor', 'formato': formato})
     
     @socketio.on('disconnect')
-    def handle_disconnect():
+    def handle_disconnect(*args):
+        registro_presencia.desconectar(request.sid)
+        limite_conexion.olvidar(request.sid)
+        with colas_lock:
+            colas.pop(request.sid, None)
         print('Cliente desconectado')
     
     # ============= CHAT GENERAL =============
@@ -19,85 +182,147 @@ def register_socket_events(socketio):
     @socketio.on('join_general_chat')
     def handle_join_general():
         """Usuario se une al chat general"""
-        join_room('general')
+        contexto = usuario_actual()
+        if not contexto:
+            return
+        
+        unirse('general')
         print('Usuario se unió al chat general')
         
         # Enviar mensajes recientes
-        messages = ChatMessage.get_recent(50)
-        messages_data = [msg.to_dict() for msg in reversed(messages)]
-        emit('load_messages', messages_data)
+        emitir_historial(contexto, ChatMessage.get_anteriores(None)[0])
     
     @socketio.on('send_message')
     def handle_send_message(data):
         """Enviar mensaje al chat general"""
-        content = data.get('message')
-        username = data.get('username', 'Anónimo')
-        
-        if not content:
+        contexto = usuario_actual()
+        if not contexto or 'general' not in contexto['salas']:
             return
         
-        # Guardar en base de datos
-        message = ChatMessage(content=content, username=username)
-        message.save()
-        
-        # Broadcast a todos en el chat general
-        emit('new_message', message.to_dict(), room='general', broadcast=True)
+        # El autor sale de la sesión, no del payload del cliente
+        enviar_mensaje('send_message', contexto, data.get('message'), 'general')
     
     # ============= CHAT DE TICKET =============
     
     @socketio.on('join_ticket_chat')
     def handle_join_ticket(data):
         """Usuario se une al chat de un ticket específico"""
-        ticket_id = data.get('ticket_id')
+        contexto = usuario_actual()
+        try:
+            ticket_id = int(data.get('ticket_id'))
+        except (TypeError, ValueError):
+            return
+        
+        if not puede_ver_ticket(contexto, ticket_id):
+            emitir_error('join_ticket_chat', 'sin_acceso', 'No tiene acceso a este ticket')
+            return
+        
         room = f'ticket_{ticket_id}'
-        join_room(room)
+        unirse(room)
         print(f'Usuario se unió al chat del ticket {ticket_id}')
         
         # Enviar mensajes del ticket
-        messages = ChatMessage.get_by_ticket(ticket_id)
-        messages_data = [msg.to_dict() for msg in messages]
-        emit('load_messages', messages_data)
+        emitir_historial(contexto, ChatMessage.get_anteriores(ticket_id)[0])
     
     @socketio.on('send_ticket_message')
     def handle_send_ticket_message(data):
         """Enviar mensaje al chat de un ticket"""
+        contexto = usuario_actual()
         content = data.get('message')
-        username = data.get('username', 'Anónimo')
-        ticket_id = data.get('ticket_id')
-        
-        if not content or not ticket_id:
+        try:
+            ticket_id = int(data.get('ticket_id'))
+        except (TypeError, ValueError):
             return
         
-        # Guardar en base de datos
-        message = ChatMessage(content=content, username=username, ticket_id=ticket_id)
-        message.save()
+        if not contexto or not content:
+            return
         
-        # Broadcast a todos en ese chat de ticket
+        # Solo puede escribir quien pasó la verificación de join_ticket_chat
         room = f'ticket_{ticket_id}'
-        emit('new_message', message.to_dict(), room=room, broadcast=True)
+        if room not in contexto['salas']:
+            emitir_error('send_ticket_message', 'no_unido', 'No está unido al chat de este ticket')
+            return
+        
+        enviar_mensaje('send_ticket_message', contexto, content, room, ticket_id)
+    
+    @socketio.on('load_older_messages')
+    def handle_load_older(data):
+        """Mensajes anteriores al más antiguo que tiene el cliente (incluye archivados)"""
+        contexto = usuario_actual()
+        if not contexto:
+            return
+        
+        ticket_id = data.get('ticket_id')
+        try:
+            ticket_id = int(ticket_id) if ticket_id else None
+            antes_de = int(data.get('antes_de'))
+        except (TypeError, ValueError):
+            return
+        
+        room = f'ticket_{ticket_id}' if ticket_id else 'general'
+        if room not in contexto['salas']:
+            emitir_error('load_older_messages', 'no_unido', 'No está unido a este chat')
+            return
+        
+        messages, hay_mas = ChatMessage.get_anteriores(ticket_id, antes_de)
+        ChatMessage.precargar_autores(messages)
+        emit('older_messages', preparar(
+            contexto['formato'],
+            lambda: {'messages': [msg.to_dict() for msg in messages], 'hay_mas': hay_mas},
+            lambda: {'m': [msg.to_compacto() for msg in messages], 'h': hay_mas}
+        ))
     
     @socketio.on('leave_ticket_chat')
     def handle_leave_ticket(data):
         """Usuario sale del chat de un ticket"""
         ticket_id = data.get('ticket_id')
         room = f'ticket_{ticket_id}'
-        leave_room(room)
+        salir(room)
         print(f'Usuario salió del chat del ticket {ticket_id}')
     
     # ============= NOTIFICACIONES =============
     
     @socketio.on('join_notifications')
-    def handle_join_notifications():
+    def handle_join_notifications(data=None):
         """Unirse a la sala de notificaciones (admin)"""
-        join_room('admin_notifications')
+        contexto = registro_presencia.usuario(request.sid)
+        if not contexto or not permisos.puede(current_user, permisos.VER_NOTIFICACIONES):
+            return
+        
+        unirse(SALA_ADMIN)
         print('Admin se unió a notificaciones')
         
-        # Enviar notificaciones no leídas
-        notifications = Notification.get_no_leidas()
-        emit('unread_notifications', {
-            'count': len(notifications),
-            'notifications': [n.to_dict() for n in notifications]
-        })
+        # Al reconectar, el cliente indica el último evento recibido
+        ultimo_id = (data or {}).get('ultimo_id')
+        try:
+            ultimo_id = int(ultimo_id) if ultimo_id else None
+        except (TypeError, ValueError):
+            ultimo_id = None
+        
+        if ultimo_id:
+            notifications = Notification.get_desde(ultimo_id)
+        else:
+            notifications = Notification.get_no_leidas(limit=20)
+        
+        count = Notification.contar_no_leidas()
+        reanudado = ultimo_id is not None
+        ultimo_id = max([n.id for n in notifications], default=ultimo_id or 0)
+        
+        emit('unread_notifications', preparar(
+            contexto['formato'],
+            lambda: {
+                'count': count,
+                'reanudado': reanudado,
+                'ultimo_id': ultimo_id,
+                'notifications': [n.to_dict() for n in notifications]
+            },
+            lambda: {
+                'c': count,
+                'r': reanudado,
+                'u': ultimo_id,
+                'n': [n.to_compacto() for n in notifications]
+            }
+        ))
     
     @socketio.on('mark_notification_read')
     def handle_mark_read(data):
@@ -107,19 +332,36 @@ def register_socket_events(socketio):
         
         if notification:
             notification.marcar_leido()
-            emit('notification_marked', {'id': notification_id})
+            emit('notification_marked', {
+                'id': notification_id,
+                'count': Notification.contar_no_leidas()
+            })
 
 def notify_new_ticket(socketio, ticket):
-    """Notificar a los admins sobre un nuevo ticket"""
-    notification = Notification(
-        tipo='nuevo_ticket',
-        mensaje=f'Nuevo ticket creado: {ticket.descripcion[:50]}...',
-        ticket_id=ticket.id_mantenimiento
-    )
+    """
+    Notificar a los admins sobre un nuevo ticket. Acepta también una lista
+    (tickets generados en lote): se guarda y emite una sola notificación.
+    """
+    tickets = ticket if isinstance(ticket, (list, tuple)) else [ticket]
+    if not tickets:
+        return
+    if len(tickets) == 1:
+        notification = Notification(
+            tipo='nuevo_ticket',
+            mensaje=f'Nuevo ticket creado: {tickets[0].descripcion[:50]}...',
+            ticket_id=tickets[0].id_mantenimiento
+        )
+    else:
+        ids = ', '.join(f'#{t.id_mantenimiento}' for t in tickets[:10])
+        resto = f' y {len(tickets) - 10} más' if len(tickets) > 10 else ''
+        notification = Notification(
+            tipo='nuevo_ticket',
+            mensaje=f'{len(tickets)} tickets nuevos creados: {ids}{resto}'
+        )
     notification.save()
     
     # Emitir notificación a todos los admins
-    socketio.emit('new_notification', notification.to_dict(), room='admin_notifications')
+    obtener_canal(socketio).publicar(notification)
 
 def notify_ticket_updated(socketio, ticket, tipo_actualizacion):
     """Notificar sobre actualización de ticket"""
@@ -136,7 +378,7 @@ def notify_ticket_updated(socketio, ticket, tipo_actualizacion):
     )
     notification.save()
     
-    socketio.emit('new_notification', notification.to_dict(), room='admin_notifications')
+    obtener_canal(socketio).publicar(notification)
 
 def notify_new_queja(socketio, queja):
     """Notificar a los admins sobre una nueva queja"""
@@ -149,4 +391,4 @@ def notify_new_queja(socketio, queja):
     notification.save()
     
     # Emitir notificación a todos los admins
-    socketio.emit('new_notification', notification.to_dict(), room='admin_notifications')
\ No newline at end of file
+    obtener_canal(socketio).publicar(notification)
\ No newline at end of file
@@ -0,0 +1,92 @@
+// static/js/msgpack.js
+
+/**
+ * Decodificador MessagePack para el formato compacto del chat.
+ * Solo decodifica (el cliente nunca envía msgpack) y cubre los tipos que
+ * produce msgpack.packb(use_bin_type=True) en el servidor: nil, booleanos,
+ * enteros, flotantes, str, bin, arrays y maps. Se sirve desde el propio
+ * servidor, sin depender de un CDN, y solo en las páginas con Socket.IO.
+ */
+(function (global) {
+    const utf8 = new TextDecoder('utf-8');
+
+    function decode(bytes) {
+        const vista = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        let pos = 0;
+
+        function texto(largo) {
+            const valor = utf8.decode(bytes.subarray(pos, pos + largo));
+            pos += largo;
+            return valor;
+        }
+
+        function binario(largo) {
+            const valor = bytes.slice(pos, pos + largo);
+            pos += largo;
+            return valor;
+        }
+
+        function lista(largo) {
+            const valor = new Array(largo);
+            for (let i = 0; i < largo; i++) valor[i] = leer();
+            return valor;
+        }
+
+        function mapa(largo) {
+            const valor = {};
+            for (let i = 0; i < largo; i++) {
+                const clave = leer();
+                valor[clave] = leer();
+            }
+            return valor;
+        }
+
+        function entero64(conSigno) {
+            const alto = conSigno ? vista.getInt32(pos) : vista.getUint32(pos);
+            const bajo = vista.getUint32(pos + 4);
+            pos += 8;
+            return alto * 4294967296 + bajo;
+        }
+
+        function leer() {
+            const tipo = vista.getUint8(pos++);
+            if (tipo <= 0x7f) return tipo;
+            if (tipo >= 0xe0) return tipo - 0x100;
+            if ((tipo & 0xf0) === 0x80) return mapa(tipo & 0x0f);
+            if ((tipo & 0xf0) === 0x90) return lista(tipo & 0x0f);
+            if ((tipo & 0xe0) === 0xa0) return texto(tipo & 0x1f);
+
+            let valor;
+            switch (tipo) {
+                case 0xc0: return null;
+                case 0xc2: return false;
+                case 0xc3: return true;
+                case 0xc4: valor = vista.getUint8(pos); pos += 1; return binario(valor);
+                case 0xc5: valor = vista.getUint16(pos); pos += 2; return binario(valor);
+                case 0xc6: valor = vista.getUint32(pos); pos += 4; return binario(valor);
+                case 0xca: valor = vista.getFloat32(pos); pos += 4; return valor;
+                case 0xcb: valor = vista.getFloat64(pos); pos += 8; return valor;
+                case 0xcc: valor = vista.getUint8(pos); pos += 1; return valor;
+                case 0xcd: valor = vista.getUint16(pos); pos += 2; return valor;
+                case 0xce: valor = vista.getUint32(pos); pos += 4; return valor;
+                case 0xcf: return entero64(false);
+                case 0xd0: valor = vista.getInt8(pos); pos += 1; return valor;
+                case 0xd1: valor = vista.getInt16(pos); pos += 2; return valor;
+                case 0xd2: valor = vista.getInt32(pos); pos += 4; return valor;
+                case 0xd3: return entero64(true);
+                case 0xd9: valor = vista.getUint8(pos); pos += 1; return texto(valor);
+                case 0xda: valor = vista.getUint16(pos); pos += 2; return texto(valor);
+                case 0xdb: valor = vista.getUint32(pos); pos += 4; return texto(valor);
+                case 0xdc: valor = vista.getUint16(pos); pos += 2; return lista(valor);
+                case 0xdd: valor = vista.getUint32(pos); pos += 4; return lista(valor);
+                case 0xde: valor = vista.getUint16(pos); pos += 2; return mapa(valor);
+                case 0xdf: valor = vista.getUint32(pos); pos += 4; return mapa(valor);
+            }
+            throw new Error('MessagePack: tipo no soportado 0x' + tipo.toString(16));
+        }
+
+        return leer();
+    }
+
+    global.MessagePack = { decode: decode };
+})(window);
@@ -0,0 +1,82 @@
+// static/js/scripts.js
+
+/**
+ * Conexión Socket.IO con formato compacto opcional.
+ * Si static/js/msgpack.js está cargado (con defer, en las páginas que usan
+ * el socket), se pide el formato 'msgpack' al conectar y los eventos
+ * binarios se expanden a los mismos objetos que el formato JSON, así los
+ * manejadores de cada página no cambian.
+ */
+(function (global) {
+    // 'YYYY-MM-DD HH:MM:SS' en UTC, igual que los to_dict() del servidor
+    function fecha(epoch) {
+        if (epoch === null || epoch === undefined) return null;
+        return new Date(epoch * 1000).toISOString().slice(0, 19).replace('T', ' ');
+    }
+
+    function mensaje(m) {
+        return {
+            id: m.i,
+            content: m.c,
+            user_id: m.u,
+            username: m.n,
+            timestamp: fecha(m.t),
+            ticket_id: m.k
+        };
+    }
+
+    function notificacion(n) {
+        const notif = {
+            id: n.i,
+            tipo: n.y,
+            mensaje: n.m,
+            leido: n.l,
+            timestamp: fecha(n.t),
+            ticket_id: n.k
+        };
+        if ('e' in n) notif.event_id = n.e;
+        if ('g' in n) notif.agrupadas = n.g;
+        return notif;
+    }
+
+    const EXPANDIR = {
+        load_messages: (lista) => lista.map(mensaje),
+        new_message: mensaje,
+        older_messages: (d) => ({ messages: d.m.map(mensaje), hay_mas: d.h }),
+        new_notification: notificacion,
+        unread_notifications: (d) => ({
+            count: d.c,
+            reanudado: d.r,
+            ultimo_id: d.u,
+            notifications: d.n.map(notificacion)
+        })
+    };
+
+    function esBinario(datos) {
+        return datos instanceof ArrayBuffer || ArrayBuffer.isView(datos);
+    }
+
+    function decodificar(evento, datos) {
+        if (!esBinario(datos)) return datos;
+        const bytes = datos instanceof ArrayBuffer ? new Uint8Array(datos) : datos;
+        const compacto = global.MessagePack.decode(bytes);
+        const expandir = EXPANDIR[evento];
+        return expandir ? expandir(compacto) : compacto;
+    }
+
+    function conectar() {
+        // El formato se decide al abrir la conexión: el script diferido ya cargó
+        const socket = io({
+            auth: (cb) => cb({ formato: global.MessagePack ? 'msgpack' : 'json' })
+        });
+
+        // Los manejadores reciben siempre objetos en formato largo
+        const on = socket.on.bind(socket);
+        socket.on = (evento, manejador) => on(evento, (datos, ...resto) => {
+            manejador(decodificar(evento, datos), ...resto);
+        });
+        return socket;
+    }
+
+    global.BuildTechSocket = { conectar: conectar, decodificar: decodificar };
+})(window);
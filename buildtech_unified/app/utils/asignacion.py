@@ -0,0 +1,222 @@
+# app/utils/asignacion.py
+"""
+Sugerencia de responsable para tickets de mantenimiento
+Índice en memoria con la carga de tickets abiertos de cada miembro del
+personal (ponderada por prioridad) y un heap para obtener a los menos
+cargados sin recorrerlos a todos. Los eventos de Mantenimiento y Personal
+lo mantienen al día al confirmarse cada transacción; cada cierto tiempo se
+reconstruye desde la base por si otro proceso modificó tickets.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from sqlalchemy import event, select
+from database import db
+from models.mantenimiento_model import Mantenimiento, RANGO_PRIORIDAD
+from models.personal_model import Personal
+from utils.transaccion import al_confirmar
+
+# Reconstrucción completa desde la base cada tantos segundos
+VIGENCIA_SEGUNDOS = 300
+
+
+class IndiceCarga:
+    """Carga abierta por miembro del personal, con heap de entradas versionadas"""
+
+    def __init__(self, vigencia=VIGENCIA_SEGUNDOS):
+        self.vigencia = vigencia
+        self._lock = threading.Lock()
+        self._cargado_en = None
+        self._personal = {}  # personal_id -> {'capacidad', 'carga', 'abiertos', 'version'}
+        self._tickets = {}   # ticket_id -> (personal_id, peso)
+        self._heap = []      # (saturado, carga relativa, abiertos, version, personal_id)
+        self._versiones = itertools.count()
+
+    # ============= CARGA DESDE LA BASE =============
+
+    def reconstruir(self):
+        """Lee personal activo y tickets abiertos asignados (dos consultas)"""
+        personal = db.session.execute(
+            select(Personal.id, Personal.capacidad).where(Personal.activo.is_(True))
+        ).all()
+        abiertos = db.session.execute(
+            select(Mantenimiento.id_mantenimiento, Mantenimiento.personal_id, Mantenimiento.prioridad).where(
+                Mantenimiento.personal_id.isnot(None),
+                *Mantenimiento.condiciones(estado='abiertos')
+            )
+        ).all()
+
+        with self._lock:
+            self._personal = {
+                pid: {'capacidad': max(capacidad or 1, 1), 'carga': 0, 'abiertos': 0, 'version': 0}
+                for pid, capacidad in personal
+            }
+            self._tickets = {}
+            for ticket_id, pid, prioridad in abiertos:
+                peso = RANGO_PRIORIDAD.get(prioridad, 1)
+                self._tickets[ticket_id] = (pid, peso)
+                if pid in self._personal:
+                    self._personal[pid]['carga'] += peso
+                    self._personal[pid]['abiertos'] += 1
+            self._heap = []
+            for pid in self._personal:
+                self._heap.append(self._entrada(pid))
+            heapq.heapify(self._heap)
+            self._cargado_en = time.monotonic()
+
+    def _asegurar(self):
+        if self._cargado_en is None or time.monotonic() - self._cargado_en > self.vigencia:
+            self.reconstruir()
+
+    # ============= HEAP (con el lock tomado) =============
+
+    def _entrada(self, pid):
+        datos = self._personal[pid]
+        datos['version'] = next(self._versiones)
+        return (
+            datos['abiertos'] >= datos['capacidad'],
+            datos['carga'] / datos['capacidad'],
+            datos['abiertos'],
+            datos['version'],
+            pid
+        )
+
+    def _ajustar(self, pid, peso, cantidad):
+        datos = self._personal.get(pid)
+        if datos is None:
+            return
+        datos['carga'] += peso
+        datos['abiertos'] += cantidad
+        heapq.heappush(self._heap, self._entrada(pid))
+
+    def _compactar(self):
+        """Descarta entradas obsoletas cuando el heap crece demasiado"""
+        if len(self._heap) > 4 * len(self._personal) + 64:
+            self._heap = [self._entrada(pid) for pid in self._personal]
+            heapq.heapify(self._heap)
+
+    # ============= EVENTOS =============
+
+    def actualizar_ticket(self, ticket_id, personal_id, prioridad, abierto):
+        """Reemplaza el aporte de un ticket a la carga de su responsable"""
+        if self._cargado_en is None:
+            return  # Se leerá todo en la primera sugerencia
+        nuevo = (personal_id, RANGO_PRIORIDAD.get(prioridad, 1)) if personal_id and abierto else None
+        with self._lock:
+            anterior = self._tickets.get(ticket_id)
+            if anterior == nuevo:
+                return
+            if anterior:
+                del self._tickets[ticket_id]
+                self._ajustar(anterior[0], -anterior[1], -1)
+            if nuevo:
+                self._tickets[ticket_id] = nuevo
+                self._ajustar(nuevo[0], nuevo[1], 1)
+            self._compactar()
+
+    def quitar_ticket(self, ticket_id):
+        self.actualizar_ticket(ticket_id, None, None, False)
+
+    def actualizar_personal(self, personal_id, capacidad, activo):
+        if self._cargado_en is None:
+            return
+        with self._lock:
+            if not activo:
+                # Sus entradas del heap quedan obsoletas y se saltan
+                self._personal.pop(personal_id, None)
+                return
+            datos = self._personal.get(personal_id)
+            if datos is None:
+                asignados = [peso for pid, peso in self._tickets.values() if pid == personal_id]
+                datos = {'carga': sum(asignados), 'abiertos': len(asignados), 'version': 0}
+                self._personal[personal_id] = datos
+            datos['capacidad'] = max(capacidad or 1, 1)
+            heapq.heappush(self._heap, self._entrada(personal_id))
+
+    # ============= CONSULTAS =============
+
+    def sugerir(self, cantidad=1, excluir=()):
+        """Los miembros menos cargados, primero los que aún tienen capacidad libre"""
+        self._asegurar()
+        elegidos, revisadas = [], []
+        with self._lock:
+            while self._heap and len(elegidos) < cantidad:
+                entrada = heapq.heappop(self._heap)
+                saturado, _, abiertos, version, pid = entrada
+                datos = self._personal.get(pid)
+                if datos is None or datos['version'] != version:
+                    continue  # Entrada obsoleta: se descarta
+                revisadas.append(entrada)
+                if pid in excluir:
+                    continue
+                elegidos.append({
+                    'personal_id': pid,
+                    'abiertos': abiertos,
+                    'carga': datos['carga'],
+                    'capacidad': datos['capacidad'],
+                    'saturado': saturado
+                })
+            for entrada in revisadas:
+                heapq.heappush(self._heap, entrada)
+        return elegidos
+
+    def carga(self, personal_id):
+        self._asegurar()
+        with self._lock:
+            datos = self._personal.get(personal_id)
+            return dict(datos) if datos else None
+
+
+indice_carga = IndiceCarga()
+
+
+def sugerir_responsables(cantidad=3):
+    """Sugerencias con el nombre de cada miembro (una consulta por los nombres)"""
+    sugerencias = indice_carga.sugerir(cantidad)
+    if not sugerencias:
+        return []
+    personal = {p.id: p for p in Personal.query.filter(
+        Personal.id.in_([s['personal_id'] for s in sugerencias])
+    )}
+    for sugerencia in sugerencias:
+        miembro = personal.get(sugerencia['personal_id'])
+        sugerencia['nombre'] = miembro.nombre if miembro else None
+        sugerencia['especialidad'] = miembro.especialidad if miembro else None
+    return sugerencias
+
+
+# ============= EVENTOS ORM =============
+
+def _ticket_guardado(mapper, connection, target):
+    al_confirmar(
+        target, indice_carga.actualizar_ticket,
+        target.id_mantenimiento, target.personal_id, target.prioridad, not target.trabajo_realizado
+    )
+
+
+def _ticket_eliminado(mapper, connection, target):
+    al_confirmar(target, indice_carga.quitar_ticket, target.id_mantenimiento)
+
+
+def _personal_guardado(mapper, connection, target):
+    al_confirmar(target, indice_carga.actualizar_personal, target.id, target.capacidad, target.activo)
+
+
+def _personal_eliminado(mapper, connection, target):
+    al_confirmar(target, indice_carga.actualizar_personal, target.id, None, False)
+
+
+def registrar_eventos():
+    if event.contains(Mantenimiento, 'after_insert', _ticket_guardado):
+        return
+    event.listen(Mantenimiento, 'after_insert', _ticket_guardado)
+    event.listen(Mantenimiento, 'after_update', _ticket_guardado)
+    event.listen(Mantenimiento, 'after_delete', _ticket_eliminado)
+    event.listen(Personal, 'after_insert', _personal_guardado)
+    event.listen(Personal, 'after_update', _personal_guardado)
+    event.listen(Personal, 'after_delete', _personal_eliminado)
+
+
+registrar_eventos()
@@ -0,0 +1,78 @@
+# app/utils/cache_versionada.py
+"""
+Caché en memoria invalidada por contador de versión
+Cada modificación de los datos de origen incrementa la versión; las
+entradas de versiones anteriores dejan de usarse y se descartan.
+"""
+
+import threading
+import time
+
+_caches = {}
+
+
+class CacheVersionada:
+    """Caché de valores renderizados con contador de versión y métricas"""
+
+    def __init__(self, nombre, max_entradas=64):
+        self.nombre = nombre
+        self.max_entradas = max_entradas
+        self.version = 1
+        self._entradas = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.tiempo_generacion = 0.0
+
+    def invalidar(self):
+        """Incrementa la versión: todo lo cacheado queda obsoleto"""
+        with self._lock:
+            self.version += 1
+            self._entradas.clear()
+
+    def obtener(self, clave, generar):
+        """Devuelve el valor cacheado para la clave o lo genera con generar()"""
+        version = self.version
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] == version:
+                self.aciertos += 1
+                return entrada[1]
+
+        inicio = time.perf_counter()
+        valor = generar()
+        duracion = time.perf_counter() - inicio
+
+        with self._lock:
+            self.fallos += 1
+            self.tiempo_generacion += duracion
+            # Si la versión cambió mientras se generaba, no se guarda
+            if version == self.version:
+                if len(self._entradas) >= self.max_entradas:
+                    self._entradas.pop(next(iter(self._entradas)))
+                self._entradas[clave] = (version, valor)
+        return valor
+
+    def estadisticas(self):
+        total = self.aciertos + self.fallos
+        return {
+            'nombre': self.nombre,
+            'version': self.version,
+            'entradas': len(self._entradas),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': round(self.aciertos / total, 4) if total else 0.0,
+            'tiempo_generacion_promedio_ms': round(self.tiempo_generacion / self.fallos * 1000, 3) if self.fallos else 0.0,
+        }
+
+
+def obtener_cache(nombre, max_entradas=64):
+    """Devuelve la caché con ese nombre (la crea si no existe)"""
+    cache = _caches.get(nombre)
+    if cache is None:
+        cache = _caches.setdefault(nombre, CacheVersionada(nombre, max_entradas))
+    return cache
+
+
+def estadisticas_caches():
+    return [cache.estadisticas() for cache in _caches.values()]
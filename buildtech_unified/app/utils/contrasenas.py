@@ -0,0 +1,149 @@
+# app/utils/contrasenas.py
+"""
+Hash de contraseñas con costo configurable
+El método (PASSWORD_METODO, en el formato de werkzeug: 'scrypt:n:r:p' o
+'pbkdf2:sha256:iteraciones') define cuánto tarda cada login. Los hashes
+guardados con otro método se rehacen al iniciar sesión correctamente, y el
+tiempo de CPU de cada verificación queda medido.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+)
+
+METODO_POR_DEFECTO = 'scrypt:32768:8:1'
+
+# Verificaciones que se guardan para los percentiles
+MUESTRAS = 500
+
+
+def normalizar_metodo(metodo):
+    """Método con todos sus parámetros, igual al prefijo que werkzeug guarda"""
+    nombre, *args = metodo.split(':')
+    if nombre == 'scrypt':
+        n, r, p = (list(map(int, args)) + [2 ** 15, 8, 1][len(args):])[:3]
+        return f'scrypt:{n}:{r}:{p}'
+    if nombre == 'pbkdf2':
+        hash_nombre = args[0] if args else 'sha256'
+        iteraciones = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_nombre}:{iteraciones}'
+    raise ValueError(f'Método de hash no soportado: {metodo}')
+
+
+class MetricasLogin:
+    """Tiempo de CPU de las verificaciones de contraseña"""
+
+    def __init__(self, muestras=MUESTRAS):
+        self._tiempos = deque(maxlen=muestras)
+        self._lock = threading.Lock()
+        self.verificaciones = 0
+        self.rehechos = 0
+
+    def registrar(self, segundos):
+        with self._lock:
+            self.verificaciones += 1
+            self._tiempos.append(segundos)
+
+    def registrar_rehash(self):
+        with self._lock:
+            self.rehechos += 1
+
+    def resumen(self):
+        with self._lock:
+            tiempos = sorted(self._tiempos)
+        ms = lambda s: round(s * 1000, 2)
+        return {
+            'verificaciones': self.verificaciones,
+            'rehechos': self.rehechos,
+            'muestras': len(tiempos),
+            'cpu_ms_promedio': ms(statistics.fmean(tiempos)) if tiempos else None,
+            'cpu_ms_p50': ms(tiempos[len(tiempos) // 2]) if tiempos else None,
+            'cpu_ms_p95': ms(tiempos[min(len(tiempos) - 1, len(tiempos) * 95 // 100)]) if tiempos else None,
+            'cpu_ms_max': ms(tiempos[-1]) if tiempos else None,
+        }
+
+
+class PoliticaHash:
+    """Genera y verifica hashes con el método configurado"""
+
+    def __init__(self, metodo=METODO_POR_DEFECTO):
+        self.metricas = MetricasLogin()
+        self.configurar(metodo)
+
+    def configurar(self, metodo):
+        self.metodo = normalizar_metodo(metodo)
+        self._falso = None
+
+    def generar(self, password):
+        return generate_password_hash(password, method=self.metodo)
+
+    def verificar(self, password_hash, password):
+        """Compara y registra el tiempo de CPU del hilo; devuelve (correcta, segundos)"""
+        inicio = time.thread_time()
+        correcta = check_password_hash(password_hash, password)
+        segundos = time.thread_time() - inicio
+        self.metricas.registrar(segundos)
+        return correcta, segundos
+
+    def verificar_inexistente(self, password):
+        """Mismo costo que un usuario real, para no delatar qué usuarios existen"""
+        if self._falso is None:
+            self._falso = self.generar('usuario-inexistente')
+        return self.verificar(self._falso, password)[1]
+
+    def necesita_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.metodo
+
+
+politica_hash = PoliticaHash()
+
+
+def configurar_hash(app):
+    politica_hash.configurar(app.config['PASSWORD_METODO'])
+    return politica_hash
+
+
+# ============= CALIBRACIÓN =============
+
+def medir_metodo(metodo, repeticiones=3):
+    """Mediana en segundos de verificar una contraseña con ese método"""
+    password_hash = generate_password_hash('calibracion', method=metodo)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        check_password_hash(password_hash, 'calibracion')
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def calibrar(tipo, objetivo_ms, repeticiones=3):
+    """
+    Método de mayor costo que no supere el objetivo en este equipo.
+    Devuelve una lista de (método, ms) medidos y el método elegido.
+    """
+    medidos = []
+    if tipo == 'scrypt':
+        elegido = 'scrypt:16384:8:1'
+        n = 2 ** 14
+        while n <= 2 ** 18:  # Más memoria por login no es razonable
+            metodo = f'scrypt:{n}:8:1'
+            ms = medir_metodo(metodo, repeticiones) * 1000
+            medidos.append((metodo, ms))
+            if ms > objetivo_ms:
+                break
+            elegido = metodo
+            n *= 2
+        return medidos, elegido
+
+    # pbkdf2 crece linealmente: se mide una vez y se escala
+    base = 100000
+    ms = medir_metodo(f'pbkdf2:sha256:{base}', repeticiones) * 1000
+    medidos.append((f'pbkdf2:sha256:{base}', ms))
+    iteraciones = max(base, int(base * objetivo_ms / ms) // 10000 * 10000)
+    elegido = f'pbkdf2:sha256:{iteraciones}'
+    medidos.append((elegido, medir_metodo(elegido, repeticiones) * 1000))
+    return medidos, elegido
@@ -8,10 +8,10 @@ def role_required(role):
         def decorated_function(*args, **kwargs):
             if not current_user.is_authenticated:
                 flash('Por favor, inicie sesión para acceder a esta página.', 'warning')
-                return redirect(url_for('user.login'))
+                return redirect(url_for('auth.login'))
             if current_user.role != role:
                 flash('No tienes permiso para acceder a esta página.', 'danger')
-                return redirect(url_for('user.index'))
+                return redirect(url_for('auth.home'))
             return f(*args, **kwargs)
         return decorated_function
     return decorator
\ No newline at end of file
@@ -0,0 +1,159 @@
+# app/utils/detalle_ticket.py
+"""
+Detalle de ticket en una sola respuesta
+Reúne el ticket, su historial de estados, las evidencias, los últimos
+mensajes del chat y (para administradores) sus notificaciones con un
+número fijo de consultas. El resultado se cachea por versión del ticket:
+los eventos ORM de cualquiera de esas entidades incrementan la versión de
+su ticket al confirmarse la transacción, así que solo se regenera el
+detalle que cambió. Como las
+versiones viven en este proceso, cada entrada además vence a los
+DETALLE_VIGENCIA_SEGUNDOS por si otro proceso (tareas.py) escribió.
+"""
+
+import itertools
+import threading
+import time
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import selectinload
+from models.mantenimiento_model import Mantenimiento, Evidencia, TransicionTicket, PREFIJO_EVIDENCIA
+from models.chat_model import ChatMessage, Notification
+from models.user_model import User
+from utils.cache_versionada import obtener_cache
+from utils.transaccion import al_confirmar
+
+CACHE_DETALLE = 'detalle_ticket'
+MENSAJES_POR_DEFECTO = 20
+MENSAJES_MAXIMO = 100
+NOTIFICACIONES_MAXIMO = 20
+DETALLE_VIGENCIA_SEGUNDOS = 60
+
+# Distingue las versiones de este proceso de las de un arranque anterior (ETag)
+_arranque = format(int(time.time()), 'x')
+_versiones = {}  # ticket_id -> versión
+_contador = itertools.count(1)
+_lock = threading.Lock()
+
+
+def cache_detalle():
+    return obtener_cache(CACHE_DETALLE, max_entradas=512)
+
+
+def version_ticket(ticket_id):
+    with _lock:
+        return _versiones.setdefault(ticket_id, next(_contador))
+
+
+def tocar_ticket(ticket_id):
+    """Nueva versión: el detalle cacheado de este ticket deja de usarse"""
+    if ticket_id is None:
+        return
+    with _lock:
+        _versiones[ticket_id] = next(_contador)
+
+
+def olvidar_versiones():
+    """Todos los tickets cambian de versión (p. ej. al renombrar un usuario)"""
+    with _lock:
+        _versiones.clear()
+    cache_detalle().invalidar()
+
+
+def etag_detalle(ticket_id, version, mensajes, admin):
+    return f'{_arranque}-{ticket_id}-{version}-{mensajes}-{int(admin)}'
+
+
+# ============= CARGA =============
+
+def cargar_detalle(ticket_id, mensajes=MENSAJES_POR_DEFECTO, admin=False):
+    """Diccionario con todo el detalle, o None si el ticket no existe"""
+    ticket = Mantenimiento.query.options(
+        selectinload(Mantenimiento.evidencias),
+        selectinload(Mantenimiento.transiciones)
+    ).filter_by(id_mantenimiento=ticket_id).first()
+    if ticket is None:
+        return None
+
+    historial, hay_mas = ChatMessage.get_anteriores(ticket_id, limit=mensajes)
+    ChatMessage.precargar_autores(historial)
+
+    # Autores de evidencias y transiciones en una sola consulta
+    ids = {e.user_id for e in ticket.evidencias} | {t.user_id for t in ticket.transiciones}
+    ids.discard(None)
+    nombres = {
+        u.id: u.get_full_name() for u in User.query.filter(User.id.in_(ids))
+    } if ids else {}
+
+    detalle = ticket.to_dict()
+    detalle.update({
+        'estado': ticket.estado,
+        'personal_id': ticket.personal_id,
+        'plan_id': ticket.plan_id,
+        'transiciones': [
+            dict(t.to_dict(), usuario=nombres.get(t.user_id)) for t in ticket.transiciones
+        ],
+        'evidencias': [
+            dict(
+                e.to_dict(),
+                subida_por=nombres.get(e.user_id),
+                url=f'{PREFIJO_EVIDENCIA}{e.clave}',
+                mini=f'{PREFIJO_EVIDENCIA}{e.clave}/mini'
+            )
+            for e in ticket.evidencias
+        ],
+        'mensajes': [m.to_dict() for m in historial],
+        'hay_mas_mensajes': hay_mas,
+    })
+    if admin:
+        notificaciones = Notification.query.filter_by(ticket_id=ticket_id).order_by(
+            Notification.id.desc()
+        ).limit(NOTIFICACIONES_MAXIMO).all()
+        detalle['notificaciones'] = [n.to_dict() for n in notificaciones]
+    return detalle
+
+
+def obtener_detalle(ticket_id, mensajes=MENSAJES_POR_DEFECTO, admin=False):
+    """(detalle, etag) desde la caché o recién cargado; detalle es None si no existe"""
+    mensajes = min(max(mensajes, 1), MENSAJES_MAXIMO)
+    cache = cache_detalle()
+    for _ in range(2):
+        version = version_ticket(ticket_id)
+        creado, detalle = cache.obtener(
+            (ticket_id, version, mensajes, admin),
+            lambda: (time.monotonic(), cargar_detalle(ticket_id, mensajes, admin))
+        )
+        if time.monotonic() - creado <= DETALLE_VIGENCIA_SEGUNDOS:
+            break
+        tocar_ticket(ticket_id)  # Vencida: se carga de nuevo con otra versión
+    return detalle, etag_detalle(ticket_id, version, mensajes, admin)
+
+
+# ============= EVENTOS ORM =============
+
+def _ticket_modificado(mapper, connection, target):
+    al_confirmar(target, tocar_ticket, target.id_mantenimiento)
+
+
+def _relacionado_modificado(mapper, connection, target):
+    al_confirmar(target, tocar_ticket, target.ticket_id)
+
+
+def _autor_modificado(mapper, connection, target):
+    # El nombre aparece en mensajes, evidencias e historial de cualquier ticket
+    estado = inspect(target)
+    if estado.attrs.first_name.history.has_changes() or estado.attrs.last_name.history.has_changes():
+        al_confirmar(target, olvidar_versiones)
+
+
+def registrar_eventos():
+    if event.contains(Mantenimiento, 'after_update', _ticket_modificado):
+        return
+    for evento in ('after_update', 'after_delete'):
+        event.listen(Mantenimiento, evento, _ticket_modificado)
+    for modelo in (ChatMessage, Notification, Evidencia, TransicionTicket):
+        for evento in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(modelo, evento, _relacionado_modificado)
+    event.listen(User, 'after_update', _autor_modificado)
+
+
+registrar_eventos()
@@ -0,0 +1,36 @@
+# app/utils/esquema.py
+"""
+Actualización incremental del esquema
+db.create_all() solo crea tablas nuevas: aquí se agregan las columnas
+e índices declarados en los modelos que todavía no existen en la base.
+"""
+
+from sqlalchemy import inspect, text
+from database import db
+
+
+def actualizar_esquema():
+    """Agrega columnas e índices faltantes en tablas ya existentes"""
+    with db.engine.begin() as connection:
+        inspector = inspect(connection)
+        tablas_existentes = set(inspector.get_table_names())
+
+        for tabla in db.metadata.sorted_tables:
+            if tabla.name not in tablas_existentes:
+                continue
+
+            columnas = {c['name'] for c in inspector.get_columns(tabla.name)}
+            for columna in tabla.columns:
+                if columna.name in columnas:
+                    continue
+                tipo = columna.type.compile(dialect=connection.dialect)
+                connection.execute(text(
+                    f'ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}'
+                ))
+                print(f"✓ Columna agregada: {tabla.name}.{columna.name}")
+
+            indices = {i['name'] for i in inspector.get_indexes(tabla.name)}
+            for indice in tabla.indexes:
+                if indice.name not in indices:
+                    indice.create(connection)
+                    print(f"✓ Índice creado: {indice.name}")
@@ -0,0 +1,230 @@
+# app/utils/evidencias.py
+"""
+Almacén de evidencias fotográficas
+Las imágenes se copian al disco por bloques mientras se calcula su SHA-256;
+el hash es el nombre del archivo, así una foto subida dos veces se guarda
+una sola vez. Las variantes reducidas (WebP) se generan en un pool de
+procesos y, como el contenido nunca cambia, se sirven con caché inmutable.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from flask import current_app, send_file
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Sin Pillow se sirve siempre la imagen original
+    Image = None
+
+BLOQUE_BYTES = 64 * 1024
+PATRON_CLAVE = re.compile(r'^[0-9a-f]{64}$')
+
+# Lado máximo en píxeles de cada variante
+VARIANTES = {'mini': 320, 'web': 1280}
+
+# Firmas de los formatos aceptados (se valida el contenido, no el nombre)
+FIRMAS = {
+    b'\x89PNG\r\n\x1a\n': 'png',
+    b'\xff\xd8\xff': 'jpg',
+    b'GIF87a': 'gif',
+    b'GIF89a': 'gif',
+}
+
+MIMETYPES = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+}
+
+CACHE_INMUTABLE = 'private, max-age=31536000, immutable'
+
+
+def variantes_disponibles():
+    return Image is not None
+
+
+def extension_por_firma(cabecera):
+    for firma, extension in FIRMAS.items():
+        if cabecera.startswith(firma):
+            return extension
+    return None
+
+
+def generar_variantes(ruta_original, rutas):
+    """Punto de entrada del proceso de trabajo: escribe cada variante WebP"""
+    with Image.open(ruta_original) as original:
+        imagen = ImageOps.exif_transpose(original)
+        if imagen.mode not in ('RGB', 'RGBA'):
+            imagen = imagen.convert('RGBA' if 'transparency' in imagen.info else 'RGB')
+        for variante, ruta in rutas.items():
+            copia = imagen.copy()
+            copia.thumbnail((VARIANTES[variante], VARIANTES[variante]))
+            temporal = f'{ruta}.{os.getpid()}.tmp'
+            try:
+                copia.save(temporal, 'WEBP', quality=80, method=4)
+                os.replace(temporal, ruta)
+            finally:
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+    return list(rutas.values())
+
+
+class AlmacenEvidencias:
+    """Imágenes direccionadas por contenido, con variantes en segundo plano"""
+
+    def __init__(self, directorio, procesos=1):
+        self.directorio = directorio
+        self.procesos = procesos
+        self._pool = None
+        self._pendientes = set()
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    # ============= RUTAS =============
+
+    def _carpeta(self, clave):
+        if not PATRON_CLAVE.match(clave):
+            raise ValueError(f'Clave de evidencia inválida: {clave}')
+        # Subcarpeta por los dos primeros caracteres para no llenar un solo directorio
+        return os.path.join(self.directorio, clave[:2])
+
+    def ruta(self, clave, extension):
+        return os.path.join(self._carpeta(clave), f'{clave}.{extension}')
+
+    def ruta_variante(self, clave, variante):
+        return os.path.join(self._carpeta(clave), f'{clave}_{variante}.webp')
+
+    # ============= GUARDAR =============
+
+    def guardar(self, stream):
+        """
+        Copia el stream al almacén por bloques. Devuelve (clave, extension,
+        tamano, nueva); nueva es False si el mismo contenido ya estaba guardado.
+        Lanza ValueError si el contenido no es una imagen aceptada.
+        """
+        temporal = os.path.join(self.directorio, f'subida.{os.getpid()}.{threading.get_ident()}.tmp')
+        sha = hashlib.sha256()
+        tamano = 0
+        extension = None
+        try:
+            with open(temporal, 'wb') as destino:
+                while True:
+                    bloque = stream.read(BLOQUE_BYTES)
+                    if not bloque:
+                        break
+                    if extension is None:
+                        extension = extension_por_firma(bloque)
+                        if extension is None:
+                            raise ValueError('El archivo no es una imagen PNG, JPG o GIF')
+                    sha.update(bloque)
+                    destino.write(bloque)
+                    tamano += len(bloque)
+            if extension is None:
+                raise ValueError('El archivo está vacío')
+
+            clave = sha.hexdigest()
+            ruta = self.ruta(clave, extension)
+            if os.path.exists(ruta):
+                return clave, extension, tamano, False
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            os.replace(temporal, ruta)
+            return clave, extension, tamano, True
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+    def eliminar(self, clave, extension):
+        """Borra el original y sus variantes (cuando ningún ticket lo usa)"""
+        rutas = [self.ruta(clave, extension)] + [self.ruta_variante(clave, v) for v in VARIANTES]
+        for ruta in rutas:
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+    # ============= VARIANTES =============
+
+    def _ejecutor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.procesos)
+        return self._pool
+
+    def encargar_variantes(self, clave, extension):
+        """Pide las variantes que falten; no bloquea"""
+        if not variantes_disponibles():
+            return None
+        faltantes = {
+            v: self.ruta_variante(clave, v)
+            for v in VARIANTES if not os.path.exists(self.ruta_variante(clave, v))
+        }
+        if not faltantes:
+            return None
+        with self._lock:
+            if clave in self._pendientes:
+                return None
+            self._pendientes.add(clave)
+
+        original = self.ruta(clave, extension)
+        if self.procesos:
+            futuro = self._ejecutor().submit(generar_variantes, original, faltantes)
+        else:
+            futuro = Future()
+            try:
+                futuro.set_result(generar_variantes(original, faltantes))
+            except Exception as error:
+                futuro.set_exception(error)
+        futuro.add_done_callback(lambda f: self._terminado(clave, f))
+        return futuro
+
+    def _terminado(self, clave, futuro):
+        with self._lock:
+            self._pendientes.discard(clave)
+        if futuro.exception():
+            print(f'Error generando variantes de {clave}: {futuro.exception()}')
+
+
+def configurar_evidencias(app):
+    almacen = AlmacenEvidencias(
+        app.config['EVIDENCIAS_DIR'],
+        procesos=app.config['EVIDENCIAS_PROCESOS']
+    )
+    app.extensions['evidencias'] = almacen
+    return almacen
+
+
+def obtener_almacen_evidencias():
+    return current_app.extensions['evidencias']
+
+
+def enviar_evidencia(clave, extension, variante=None):
+    """
+    Respuesta con la imagen original o una variante. Admite peticiones
+    condicionales y por rangos (Range). Si la variante todavía no existe se
+    sirve el original sin caché larga y se encarga la variante.
+    """
+    almacen = obtener_almacen_evidencias()
+    ruta = almacen.ruta(clave, extension)
+    mimetype = MIMETYPES[extension]
+    servida = 'original'
+
+    if variante:
+        ruta_variante = almacen.ruta_variante(clave, variante)
+        if os.path.exists(ruta_variante):
+            ruta, mimetype, servida = ruta_variante, MIMETYPES['webp'], variante
+        else:
+            almacen.encargar_variantes(clave, extension)
+
+    respuesta = send_file(
+        ruta,
+        mimetype=mimetype,
+        conditional=True,
+        etag=f'{clave}-{servida}'
+    )
+    # Una URL de variante que todavía entrega el original no debe quedar en caché
+    inmutable = servida == (variante or 'original')
+    respuesta.headers['Cache-Control'] = CACHE_INMUTABLE if inmutable else 'private, no-cache'
+    return respuesta
@@ -0,0 +1,195 @@
+# app/utils/exportacion_tickets.py
+"""
+Exportación masiva de tickets de mantenimiento (CSV, PDF consolidado, XLSX)
+Las filas se leen con un cursor en streaming (yield_per) y se escriben a
+medida que llegan: nunca se cargan todos los tickets en memoria.
+"""
+
+import csv
+import io
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import select, create_engine, func
+from models.mantenimiento_model import Mantenimiento
+
+try:
+    import openpyxl
+except ImportError:  # XLSX opcional
+    openpyxl = None
+
+FILAS_POR_LOTE = 1000
+
+ENCABEZADOS = ['ID', 'Creado', 'Descripción', 'Prioridad', 'Responsable',
+               'Fecha Inicio', 'Fecha Fin', 'Costo', 'Realizado']
+
+
+def xlsx_disponible():
+    return openpyxl is not None
+
+
+def consulta(filtros):
+    """SELECT de solo las columnas exportadas, con los filtros y orden de la lista"""
+    filtros = dict(filtros)
+    orden = filtros.pop('orden', 'recientes')
+    return select(
+        Mantenimiento.id_mantenimiento,
+        Mantenimiento.fecha_creacion,
+        Mantenimiento.descripcion,
+        Mantenimiento.prioridad,
+        Mantenimiento.responsable,
+        Mantenimiento.fecha_ini,
+        Mantenimiento.fecha_fin,
+        Mantenimiento.costo,
+        Mantenimiento.trabajo_realizado,
+    ).where(*Mantenimiento.condiciones(**filtros)).order_by(*Mantenimiento.orden_sql(orden))
+
+
+def huella(session, filtros):
+    """
+    Resumen de los tickets que cumplen el filtro: cantidad, suma de ids y
+    última modificación. Cambia si se crea, borra o edita cualquiera de ellos,
+    así que un reporte guardado con otra huella ya no se reutiliza.
+    """
+    filtros = dict(filtros)
+    filtros.pop('orden', None)
+    cantidad, suma, modificado = session.execute(select(
+        func.count(),
+        func.coalesce(func.sum(Mantenimiento.id_mantenimiento), 0),
+        func.max(func.coalesce(Mantenimiento.fecha_modificacion, Mantenimiento.fecha_creacion)),
+    ).where(*Mantenimiento.condiciones(**filtros))).one()
+    return [cantidad, suma, str(modificado)]
+
+
+def filtros_a_texto(filtros):
+    """Filtros serializables (fechas en ISO) para enviarlos a otro proceso"""
+    return {k: v.isoformat() if isinstance(v, date) else v for k, v in filtros.items()}
+
+
+def filtros_desde_texto(filtros):
+    return {
+        k: date.fromisoformat(v) if k in ('desde', 'hasta') and v else v
+        for k, v in filtros.items()
+    }
+
+
+def _valores(fila):
+    return [
+        fila.id_mantenimiento,
+        fila.fecha_creacion.strftime('%Y-%m-%d %H:%M') if fila.fecha_creacion else '',
+        fila.descripcion or '',
+        fila.prioridad or '',
+        fila.responsable or '',
+        fila.fecha_ini.isoformat() if fila.fecha_ini else '',
+        fila.fecha_fin.isoformat() if fila.fecha_fin else '',
+        fila.costo if fila.costo is not None else '',
+        'Sí' if fila.trabajo_realizado else 'No',
+    ]
+
+
+# ============= CSV (en la misma petición) =============
+
+def filas_csv(session, filtros):
+    """Genera el CSV por trozos para una respuesta en streaming"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    def vaciar():
+        datos = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return datos
+
+    buffer.write('﻿')  # BOM para que Excel reconozca UTF-8
+    escritor.writerow(ENCABEZADOS)
+    resultado = session.execute(consulta(filtros).execution_options(yield_per=FILAS_POR_LOTE))
+    for numero, fila in enumerate(resultado, 1):
+        escritor.writerow(_valores(fila))
+        if numero % FILAS_POR_LOTE == 0:
+            yield vaciar()
+    yield vaciar()
+
+
+# ============= PDF y XLSX (en el pool de procesos) =============
+
+def _filas(datos):
+    """Filas desde un motor propio del proceso de trabajo"""
+    engine = create_engine(datos['db_uri'])
+    try:
+        with engine.connect() as conexion:
+            resultado = conexion.execution_options(
+                stream_results=True, yield_per=FILAS_POR_LOTE
+            ).execute(consulta(filtros_desde_texto(datos['filtros'])))
+            for fila in resultado:
+                yield fila
+    finally:
+        engine.dispose()
+
+
+def exportar_pdf(datos, ruta):
+    """
+    PDF consolidado dibujado fila a fila en el canvas: cada página se
+    comprime y cierra al llenarse, en lugar de armar una tabla gigante.
+    """
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter, landscape
+
+    ancho, alto = landscape(letter)
+    margen = 36
+    alto_fila = 14
+    # (x, ancho máximo en caracteres) de cada columna
+    columnas = [(36, 8), (80, 16), (170, 48), (430, 8), (480, 20),
+                (590, 10), (650, 10), (710, 12), (760, 4)]
+
+    c = canvas.Canvas(ruta, pagesize=(ancho, alto), pageCompression=1)
+    c.setTitle('Exportación de tickets de mantenimiento')
+
+    def encabezado(pagina):
+        c.setFont('Helvetica-Bold', 14)
+        c.drawString(margen, alto - margen, 'REPORTE CONSOLIDADO DE MANTENIMIENTO')
+        c.setFont('Helvetica', 8)
+        c.drawRightString(ancho - margen, alto - margen, f"Generado: {datos['solicitado']}  ·  Página {pagina}")
+        y = alto - margen - 24
+        c.setFont('Helvetica-Bold', 8)
+        for (x, _), titulo in zip(columnas, ENCABEZADOS):
+            c.drawString(x, y, titulo)
+        c.line(margen, y - 3, ancho - margen, y - 3)
+        c.setFont('Helvetica', 8)
+        return y - alto_fila
+
+    pagina = 1
+    y = encabezado(pagina)
+    total = 0
+    total_costo = Decimal('0')
+
+    for fila in _filas(datos):
+        if y < margen:
+            c.showPage()
+            pagina += 1
+            y = encabezado(pagina)
+        for (x, maximo), valor in zip(columnas, _valores(fila)):
+            texto = str(valor)
+            c.drawString(x, y, texto if len(texto) <= maximo else texto[:maximo - 1] + '…')
+        y -= alto_fila
+        total += 1
+        if fila.costo is not None:
+            total_costo += Decimal(fila.costo)
+
+    if y < margen + alto_fila * 2:
+        c.showPage()
+        pagina += 1
+        y = encabezado(pagina)
+    c.setFont('Helvetica-Bold', 9)
+    c.drawString(margen, y - alto_fila, f'Total de tickets: {total}    Costo total: Bs. {total_costo:,.2f}')
+    c.save()
+
+
+def exportar_xlsx(datos, ruta):
+    """XLSX en modo solo escritura (openpyxl vuelca las filas a disco)"""
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet('Tickets')
+    hoja.append(ENCABEZADOS)
+    for fila in _filas(datos):
+        valores = _valores(fila)
+        valores[7] = float(fila.costo) if fila.costo is not None else None
+        hoja.append(valores)
+    libro.save(ruta)
@@ -0,0 +1,62 @@
+# app/utils/formato_compacto.py
+"""
+Formato compacto para eventos de chat y notificaciones
+Los clientes que lo piden al conectar reciben MessagePack (binario) con
+claves cortas y fechas en segundos epoch; el resto sigue recibiendo JSON.
+"""
+
+from datetime import timezone
+
+try:
+    import msgpack
+except ImportError:  # Sin msgpack todos los clientes usan JSON
+    msgpack = None
+
+FORMATO_JSON = 'json'
+FORMATO_COMPACTO = 'msgpack'
+
+
+def disponible():
+    return msgpack is not None
+
+
+def negociar(auth):
+    """Formato a usar según lo que el cliente envió en el connect"""
+    pedido = (auth or {}).get('formato') if isinstance(auth, dict) else None
+    if pedido == FORMATO_COMPACTO and disponible():
+        return FORMATO_COMPACTO
+    return FORMATO_JSON
+
+
+def epoch(fecha):
+    """Segundos epoch de un datetime guardado en UTC sin zona horaria"""
+    if fecha is None:
+        return None
+    return int(fecha.replace(tzinfo=timezone.utc).timestamp())
+
+
+def codificar(datos):
+    return msgpack.packb(datos, use_bin_type=True)
+
+
+def preparar(formato, largo, compacto):
+    """
+    Devuelve el payload para un formato. 'largo' y 'compacto' son funciones
+    para no serializar la variante que no se va a enviar.
+    """
+    if formato == FORMATO_COMPACTO:
+        return codificar(compacto())
+    return largo()
+
+
+def difundir(socketio, registro, evento, largo, compacto, room):
+    """
+    Emite a una sala enviando cada variante una sola vez: JSON a la sala
+    (omitiendo los clientes compactos) y MessagePack a cada cliente compacto.
+    """
+    compactos = registro.sids_con_formato(room, FORMATO_COMPACTO)
+    socketio.emit(evento, largo(), room=room, skip_sid=compactos or None)
+    if compactos:
+        datos = codificar(compacto())
+        for sid in compactos:
+            socketio.emit(evento, datos, to=sid)
@@ -0,0 +1,379 @@
+# app/utils/importacion_residentes.py
+"""
+Importación masiva de residentes desde CSV o XLSX
+Las filas se validan en una sola pasada mientras se leen; la unicidad de
+username, email y ci se comprueba con consultas IN por lotes (no una por
+fila). Las contraseñas se hashean en el pool de procesos de los reportes y
+los usuarios se insertan por lotes, un lote por transacción. El resultado
+es un reporte por fila (creado, error o válido si solo se simula).
+Desde el panel la importación corre en segundo plano (ver
+TrabajosImportacion); la tarea de consola la ejecuta directamente.
+"""
+
+import csv
+import io
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+from database import db
+from models.user_model import User
+from models.departamento_model import Departamento
+from utils.contrasenas import politica_hash
+
+try:
+    import openpyxl
+except ImportError:  # XLSX opcional
+    openpyxl = None
+
+COLUMNAS = ('username', 'email', 'first_name', 'last_name', 'departamento',
+            'ci', 'telefono', 'role', 'password')
+OBLIGATORIAS = ('username', 'email', 'first_name', 'last_name')
+UNICAS = ('username', 'email', 'ci')
+ROLES_IMPORTABLES = ('residente', 'personal')
+
+# Largo máximo de cada columna (igual que en el modelo User)
+LARGOS = {'username': 100, 'email': 120, 'first_name': 100, 'last_name': 100,
+          'ci': 20, 'telefono': 15}
+
+FILAS_POR_LOTE = 500
+HASHES_POR_TAREA = 50
+MAX_TRABAJOS = 20  # Importaciones del panel recordadas en memoria
+PATRON_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+ENCABEZADOS_REPORTE = ['fila', 'username', 'estado', 'mensaje', 'password_temporal']
+
+
+def xlsx_disponible():
+    return openpyxl is not None
+
+
+# ============= LECTURA =============
+
+def _normalizar_encabezado(valor):
+    return str(valor or '').strip().lower()
+
+
+def leer_filas(stream, nombre_archivo):
+    """Genera (número de fila, dict) desde un CSV o XLSX; la fila 1 son los encabezados"""
+    if nombre_archivo.lower().endswith('.xlsx'):
+        if not xlsx_disponible():
+            raise ValueError('Para importar XLSX se necesita openpyxl')
+        libro = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+        filas = libro.active.iter_rows(values_only=True)
+        encabezados = [_normalizar_encabezado(v) for v in next(filas, ())]
+        for numero, valores in enumerate(filas, start=2):
+            yield numero, dict(zip(encabezados, valores))
+        libro.close()
+        return
+
+    texto = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    lector = csv.reader(texto)
+    encabezados = [_normalizar_encabezado(v) for v in next(lector, [])]
+    for numero, valores in enumerate(lector, start=2):
+        yield numero, dict(zip(encabezados, valores))
+
+
+# ============= VALIDACIÓN =============
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)  # Celdas numéricas de XLSX (ci, teléfono)
+    return str(valor).strip()
+
+
+def validar_fila(datos):
+    """(usuario normalizado, lista de errores) de una fila"""
+    usuario = {columna: _texto(datos.get(columna)) for columna in COLUMNAS}
+    errores = [f'Falta {columna}' for columna in OBLIGATORIAS if not usuario[columna]]
+
+    usuario['email'] = usuario['email'].lower()
+    if usuario['email'] and not PATRON_EMAIL.match(usuario['email']):
+        errores.append('Email inválido')
+    for columna, largo in LARGOS.items():
+        if len(usuario[columna]) > largo:
+            errores.append(f'{columna} supera {largo} caracteres')
+
+    usuario['role'] = usuario['role'].lower() or 'residente'
+    if usuario['role'] not in ROLES_IMPORTABLES:
+        errores.append(f"Rol no permitido: {usuario['role']}")
+
+    if usuario['departamento']:
+        try:
+            usuario['departamento'] = int(usuario['departamento'])
+        except ValueError:
+            errores.append('Departamento debe ser un número')
+    else:
+        usuario['departamento'] = None
+    if usuario['password'] and len(usuario['password']) < 8:
+        errores.append('La contraseña debe tener mínimo 8 caracteres')
+
+    for columna in ('ci', 'telefono'):
+        usuario[columna] = usuario[columna] or None
+    return usuario, errores
+
+
+def validar(filas):
+    """
+    Una pasada sobre las filas: errores propios y duplicados dentro del archivo.
+    Devuelve (válidas, reporte) donde válidas es [(fila, usuario)].
+    """
+    validas, reporte = [], []
+    vistos = {columna: {} for columna in UNICAS}
+    for numero, datos in filas:
+        if not any(_texto(v) for v in datos.values()):
+            continue  # Fila vacía
+        usuario, errores = validar_fila(datos)
+        for columna in UNICAS:
+            valor = usuario[columna]
+            if valor is None or valor == '':
+                continue
+            clave = valor.lower()
+            if clave in vistos[columna]:
+                errores.append(f'{columna} repetido en la fila {vistos[columna][clave]}')
+            else:
+                vistos[columna][clave] = numero
+        if errores:
+            reporte.append(_linea(numero, usuario['username'], 'error', '; '.join(errores)))
+        else:
+            validas.append((numero, usuario))
+    return validas, reporte
+
+
+def existentes(validas):
+    """{columna: valores ya registrados} con consultas IN por lotes"""
+    encontrados = {}
+    for columna in UNICAS:
+        # Sin distinguir mayúsculas, igual que los duplicados dentro del archivo
+        atributo = func.lower(getattr(User, columna))
+        valores = [u[columna].lower() for _, u in validas if u[columna]]
+        encontrados[columna] = set()
+        for inicio in range(0, len(valores), FILAS_POR_LOTE):
+            lote = valores[inicio:inicio + FILAS_POR_LOTE]
+            encontrados[columna].update(
+                db.session.execute(select(atributo).where(atributo.in_(lote))).scalars()
+            )
+    return encontrados
+
+
+# ============= HASH E INSERCIÓN =============
+
+def _hashear(passwords, metodo):
+    """Punto de entrada del proceso de trabajo"""
+    return [generate_password_hash(password, method=metodo) for password in passwords]
+
+
+def hashear(passwords, ejecutor=None, dormir=time.sleep):
+    """
+    Hashes en el pool 'ejecutor' (o aquí mismo si es None). La espera consulta
+    los futuros cediendo con dormir(), sin bloquear el bucle del servidor.
+    """
+    metodo = politica_hash.metodo
+    if ejecutor is None or len(passwords) < 2:
+        return _hashear(passwords, metodo)
+    futuros = [
+        ejecutor.submit(_hashear, passwords[inicio:inicio + HASHES_POR_TAREA], metodo)
+        for inicio in range(0, len(passwords), HASHES_POR_TAREA)
+    ]
+    while not all(futuro.done() for futuro in futuros):
+        dormir(0.05)
+    return [password_hash for futuro in futuros for password_hash in futuro.result()]
+
+
+def _registro(usuario, password_hash, temporal):
+    return {
+        'username': usuario['username'],
+        'email': usuario['email'],
+        'password_hash': password_hash,
+        'first_name': usuario['first_name'],
+        'last_name': usuario['last_name'],
+        'ci': usuario['ci'],
+        'telefono': usuario['telefono'],
+        'role': usuario['role'],
+        'departamento': usuario['departamento'],
+        'must_change_password': temporal,
+        'estado': 'activo',
+    }
+
+
+def _insertar(registros):
+    """
+    El INSERT masivo no dispara los eventos del ORM: las unidades y sus
+    contadores se actualizan aquí, en la misma transacción
+    """
+    numeros = {registro['departamento'] for registro in registros}
+    connection = db.session.connection()
+    Departamento.asegurar(connection, numeros)
+    db.session.execute(insert(User), registros)
+    Departamento.recalcular(connection, numeros)
+    db.session.commit()
+
+
+def _insertar_lote(lote):
+    """Inserta el lote en una transacción; si choca con otro alta, fila por fila"""
+    try:
+        _insertar([registro for _, _, registro, _ in lote])
+        return [(numero, usuario, None) for numero, usuario, _, _ in lote]
+    except IntegrityError:
+        db.session.rollback()
+
+    resultados = []
+    for numero, usuario, registro, _ in lote:
+        try:
+            _insertar([registro])
+            resultados.append((numero, usuario, None))
+        except IntegrityError:
+            db.session.rollback()
+            resultados.append((numero, usuario, 'Ya existe un usuario con ese username, email o ci'))
+    return resultados
+
+
+def _linea(numero, username, estado, mensaje='', password_temporal=''):
+    return {'fila': numero, 'username': username, 'estado': estado,
+            'mensaje': mensaje, 'password_temporal': password_temporal}
+
+
+def importar(filas, simular=False, ejecutor=None, dormir=time.sleep):
+    """
+    Importa residentes desde (fila, dict). Las filas sin contraseña reciben
+    una temporal que deben cambiar al entrar. Devuelve el resumen y el reporte.
+    """
+    validas, reporte = validar(filas)
+
+    registrados = existentes(validas)
+    nuevas = []
+    for numero, usuario in validas:
+        repetidos = [c for c in UNICAS if usuario[c] and usuario[c].lower() in registrados[c]]
+        if repetidos:
+            reporte.append(_linea(numero, usuario['username'], 'error',
+                                  'Ya registrado: ' + ', '.join(repetidos)))
+        else:
+            nuevas.append((numero, usuario))
+
+    if simular:
+        reporte += [_linea(numero, usuario['username'], 'valido') for numero, usuario in nuevas]
+    else:
+        temporales = [not usuario['password'] for _, usuario in nuevas]
+        passwords = [usuario['password'] or secrets.token_urlsafe(9) for _, usuario in nuevas]
+        hashes = hashear(passwords, ejecutor, dormir)
+        preparadas = [
+            (numero, usuario, _registro(usuario, password_hash, temporal), password if temporal else '')
+            for (numero, usuario), password_hash, temporal, password in zip(nuevas, hashes, temporales, passwords)
+        ]
+        for inicio in range(0, len(preparadas), FILAS_POR_LOTE):
+            lote = preparadas[inicio:inicio + FILAS_POR_LOTE]
+            temporales_lote = {numero: temporal for numero, _, _, temporal in lote}
+            for numero, usuario, error in _insertar_lote(lote):
+                if error:
+                    reporte.append(_linea(numero, usuario['username'], 'error', error))
+                else:
+                    reporte.append(_linea(numero, usuario['username'], 'creado',
+                                          password_temporal=temporales_lote[numero]))
+
+        if any(usuario['role'] == 'personal' for _, usuario in nuevas):
+            from models.personal_model import Personal
+            Personal.sincronizar_usuarios()
+
+    reporte.sort(key=lambda linea: linea['fila'])
+    estados = [linea['estado'] for linea in reporte]
+    return {
+        'simulado': simular,
+        'filas': len(reporte),
+        'creados': estados.count('creado'),
+        'validos': estados.count('valido'),
+        'errores': estados.count('error'),
+        'reporte': reporte,
+    }
+
+
+# ============= TRABAJOS EN SEGUNDO PLANO =============
+
+class TrabajosImportacion:
+    """
+    Importaciones pedidas desde el panel. Corren en una tarea del servidor
+    (Socket.IO) y el resultado queda en memoria hasta que se descarga: el
+    reporte lleva contraseñas temporales y se entrega una sola vez.
+    """
+
+    def __init__(self, max_trabajos=MAX_TRABAJOS):
+        self.max_trabajos = max_trabajos
+        self._trabajos = OrderedDict()  # id -> {'estado', 'user_id', 'simulado', 'resultado', 'error'}
+        self._lock = threading.Lock()
+
+    def iniciar(self, filas, simular, user_id):
+        """Encola la importación de filas ya leídas; devuelve el id del trabajo"""
+        app = current_app._get_current_object()
+        socketio = app.extensions.get('socketio')
+        almacen = app.extensions.get('reportes')
+        ejecutor = almacen.ejecutor() if almacen else None
+        dormir = socketio.sleep if socketio else time.sleep
+
+        trabajo_id = secrets.token_urlsafe(12)
+        with self._lock:
+            self._trabajos[trabajo_id] = {'estado': 'pendiente', 'user_id': user_id, 'simulado': simular,
+                                          'resultado': None, 'error': None}
+            while len(self._trabajos) > self.max_trabajos:
+                self._trabajos.popitem(last=False)
+
+        def ejecutar():
+            with app.app_context():
+                try:
+                    resultado = importar(filas, simular=simular, ejecutor=ejecutor, dormir=dormir)
+                    cambios = {'estado': 'listo', 'resultado': resultado}
+                except Exception as error:
+                    db.session.rollback()
+                    cambios = {'estado': 'error', 'error': str(error)}
+                finally:
+                    db.session.remove()
+            with self._lock:
+                trabajo = self._trabajos.get(trabajo_id)
+                if trabajo:
+                    trabajo.update(cambios)
+
+        if socketio:
+            socketio.start_background_task(ejecutar)
+        else:
+            threading.Thread(target=ejecutar, daemon=True).start()
+        return trabajo_id
+
+    def trabajo(self, trabajo_id, user_id):
+        """El trabajo si pertenece al usuario, o None"""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            return dict(trabajo) if trabajo and trabajo['user_id'] == user_id else None
+
+    def entregar(self, trabajo_id, user_id):
+        """Resultado de un trabajo terminado; se olvida al entregarlo"""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            if not trabajo or trabajo['user_id'] != user_id or trabajo['estado'] != 'listo':
+                return None
+            return self._trabajos.pop(trabajo_id)['resultado']
+
+
+def configurar_importaciones(app):
+    app.extensions['importaciones'] = TrabajosImportacion()
+
+
+def obtener_trabajos():
+    return current_app.extensions['importaciones']
+
+
+def resumen(resultado):
+    """El resultado sin el reporte por fila"""
+    return {clave: valor for clave, valor in resultado.items() if clave != 'reporte'}
+
+
+def reporte_csv(resultado):
+    salida = io.StringIO()
+    escritor = csv.DictWriter(salida, fieldnames=ENCABEZADOS_REPORTE)
+    escritor.writeheader()
+    escritor.writerows(resultado['reporte'])
+    return '﻿' + salida.getvalue()  # BOM para que Excel reconozca UTF-8
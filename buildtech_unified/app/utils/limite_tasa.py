@@ -0,0 +1,76 @@
+# app/utils/limite_tasa.py
+"""
+Limitación de tasa con cubetas de tokens (token bucket)
+Cada clave (sid, usuario) tiene una cubeta que se recarga a ritmo fijo
+y admite ráfagas de hasta 'capacidad' eventos.
+"""
+
+import threading
+import time
+
+# Verificación y consumo de varias cubetas como una sola operación
+_lock_admision = threading.Lock()
+
+
+class LimitadorTasa:
+    """Cubetas de tokens por clave, con recarga continua"""
+
+    def __init__(self, capacidad, por_segundo):
+        self.capacidad = float(capacidad)
+        self.por_segundo = float(por_segundo)
+        self._cubetas = {}  # clave -> [tokens, último instante]
+        self._lock = threading.Lock()
+
+    def _recargar(self, clave, ahora):
+        cubeta = self._cubetas.get(clave)
+        if cubeta is None:
+            cubeta = self._cubetas[clave] = [self.capacidad, ahora]
+        else:
+            cubeta[0] = min(self.capacidad, cubeta[0] + (ahora - cubeta[1]) * self.por_segundo)
+            cubeta[1] = ahora
+        return cubeta
+
+    def espera(self, clave):
+        """Segundos hasta que haya un token disponible (0 si ya lo hay)"""
+        with self._lock:
+            tokens = self._recargar(clave, time.monotonic())[0]
+            if tokens >= 1:
+                return 0.0
+            return (1 - tokens) / self.por_segundo
+
+    def consumir(self, clave):
+        with self._lock:
+            cubeta = self._recargar(clave, time.monotonic())
+            cubeta[0] -= 1
+
+    def olvidar(self, clave):
+        with self._lock:
+            self._cubetas.pop(clave, None)
+
+    def compactar(self):
+        """Descarta las cubetas llenas: equivalen a una clave nueva"""
+        ahora = time.monotonic()
+        with self._lock:
+            llenas = [
+                clave for clave, (tokens, instante) in self._cubetas.items()
+                if tokens + (ahora - instante) * self.por_segundo >= self.capacidad
+            ]
+            for clave in llenas:
+                del self._cubetas[clave]
+            return len(llenas)
+
+
+def admitir(limitadores):
+    """
+    Verifica varias cubetas a la vez [(limitador, clave), ...].
+    Solo consume si todas tienen token; si no, devuelve la espera mayor.
+    Todo ocurre bajo un mismo lock: dos eventos simultáneos no pueden ver
+    el mismo token disponible y consumirlo ambos.
+    """
+    with _lock_admision:
+        espera = max(limitador.espera(clave) for limitador, clave in limitadores)
+        if espera:
+            return espera
+        for limitador, clave in limitadores:
+            limitador.consumir(clave)
+        return 0.0
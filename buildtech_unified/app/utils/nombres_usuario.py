@@ -0,0 +1,68 @@
+# app/utils/nombres_usuario.py
+"""
+Caché de nombres visibles de usuario (id -> nombre)
+Los mensajes del chat guardan solo el user_id; el nombre se resuelve aquí
+y se invalida cuando el usuario se modifica o elimina.
+"""
+
+import threading
+from sqlalchemy import event, select
+from database import db
+from models.user_model import User
+
+_nombres = {}
+_lock = threading.Lock()
+
+
+def _nombre(first_name):
+    return first_name or 'Usuario'
+
+
+def nombre_usuario(user_id, connection=None):
+    """Nombre visible de un usuario; consulta la base solo si no está en caché"""
+    if user_id is None:
+        return None
+    with _lock:
+        nombre = _nombres.get(user_id)
+    if nombre is not None:
+        return nombre
+
+    consulta = select(User.first_name).where(User.id == user_id)
+    if connection is not None:
+        first_name = connection.execute(consulta).scalar()
+    else:
+        first_name = db.session.execute(consulta).scalar()
+    nombre = _nombre(first_name) if first_name is not None else 'Usuario eliminado'
+
+    with _lock:
+        _nombres[user_id] = nombre
+    return nombre
+
+
+def cargar_nombres(user_ids):
+    """Carga en una sola consulta los nombres que faltan en la caché"""
+    with _lock:
+        faltantes = {uid for uid in user_ids if uid is not None and uid not in _nombres}
+    if not faltantes:
+        return
+
+    filas = db.session.execute(
+        select(User.id, User.first_name).where(User.id.in_(faltantes))
+    ).all()
+    with _lock:
+        for user_id, first_name in filas:
+            _nombres[user_id] = _nombre(first_name)
+
+
+def invalidar_nombre(user_id):
+    with _lock:
+        _nombres.pop(user_id, None)
+
+
+def _invalidar_evento(mapper, connection, target):
+    invalidar_nombre(target.id)
+
+
+if not event.contains(User, 'after_update', _invalidar_evento):
+    event.listen(User, 'after_update', _invalidar_evento)
+    event.listen(User, 'after_delete', _invalidar_evento)
@@ -0,0 +1,85 @@
+# app/utils/notificaciones_push.py
+"""
+Canal de notificaciones en tiempo real (Socket.IO)
+Agrupa ráfagas de eventos del mismo ticket en un único envío
+"""
+
+import threading
+from utils.presencia import registro_presencia
+from utils.formato_compacto import difundir
+
+SALA_ADMIN = 'admin_notifications'
+
+_canales = {}
+
+
+class CanalNotificaciones:
+    """
+    Envía notificaciones por Socket.IO agrupando las que llegan dentro
+    de una ventana de tiempo para el mismo (sala, tipo, ticket).
+    """
+
+    def __init__(self, socketio, ventana=1.0):
+        self.socketio = socketio
+        self.ventana = ventana
+        self._pendientes = {}
+        self._lock = threading.Lock()
+
+    def publicar(self, notification, room=SALA_ADMIN):
+        """Encola una notificación ya guardada para enviarla a la sala"""
+        payload = notification.to_dict()
+        payload['event_id'] = notification.id
+        compacto = notification.to_compacto()
+        compacto['e'] = notification.id
+
+        if not self.ventana:
+            self._emitir(room, payload, compacto, 1)
+            return
+
+        # Las notificaciones sin ticket no se agrupan
+        objetivo = notification.ticket_id if notification.ticket_id else f'n{notification.id}'
+        clave = (room, notification.tipo, objetivo)
+
+        with self._lock:
+            pendiente = self._pendientes.get(clave)
+            if pendiente:
+                pendiente['payload'] = payload
+                pendiente['compacto'] = compacto
+                pendiente['agrupadas'] += 1
+                return
+            self._pendientes[clave] = {'payload': payload, 'compacto': compacto, 'agrupadas': 1}
+
+        self.socketio.start_background_task(self._enviar_tras_ventana, clave)
+
+    def _enviar_tras_ventana(self, clave):
+        self.socketio.sleep(self.ventana)
+        with self._lock:
+            pendiente = self._pendientes.pop(clave, None)
+        if not pendiente:
+            return
+
+        self._emitir(clave[0], pendiente['payload'], pendiente['compacto'], pendiente['agrupadas'])
+
+    def _emitir(self, room, payload, compacto, agrupadas):
+        payload['agrupadas'] = agrupadas
+        compacto['g'] = agrupadas
+        registro_presencia.medir_emit(
+            difundir, self.socketio, registro_presencia, 'new_notification',
+            lambda: payload, lambda: compacto, room
+        )
+
+
+def obtener_canal(socketio):
+    """Devuelve el canal asociado a la instancia de Socket.IO (lo crea si no existe)"""
+    canal = _canales.get(id(socketio))
+    if canal is None:
+        canal = CanalNotificaciones(socketio)
+        _canales[id(socketio)] = canal
+    return canal
+
+
+def configurar_canal(socketio, ventana):
+    """Crea el canal con la ventana de agrupación configurada"""
+    canal = CanalNotificaciones(socketio, ventana=ventana)
+    _canales[id(socketio)] = canal
+    return canal
@@ -0,0 +1,135 @@
+# app/utils/permisos.py
+"""
+Permisos por rol
+Cada rol tiene un conjunto fijo de permisos (frozenset calculado una vez);
+el usuario de la sesión lo guarda junto con su departamento, así que cada
+comprobación es una búsqueda en un conjunto, sin consultas. Los blueprints
+declaran en una tabla qué permiso exige cada endpoint.
+"""
+
+from functools import wraps
+from types import SimpleNamespace
+from flask import current_app, flash, jsonify, redirect, request, url_for
+from flask_login import current_user
+
+# Permisos base: cualquier usuario del edificio
+USAR_MANTENIMIENTO = 'mantenimiento.usar'
+USAR_COMUNICACION = 'comunicacion.usar'
+USAR_RESERVAS = 'reservas.usar'
+USAR_FINANZAS = 'finanzas.usar'
+DESCARGAR_REPORTES = 'reportes.descargar'
+
+# Administración
+GESTIONAR_MANTENIMIENTO = 'mantenimiento.gestionar'
+EXPORTAR_MANTENIMIENTO = 'mantenimiento.exportar'
+METRICAS_MANTENIMIENTO = 'mantenimiento.metricas'
+GESTIONAR_AVISOS = 'comunicacion.avisos'
+GESTIONAR_QUEJAS = 'comunicacion.quejas'
+MONITOREAR_COMUNICACION = 'comunicacion.monitoreo'
+VER_NOTIFICACIONES = 'notificaciones.ver'
+GESTIONAR_FINANZAS = 'finanzas.gestionar'
+GESTIONAR_RESERVAS = 'reservas.gestionar'
+GESTIONAR_USUARIOS = 'usuarios.gestionar'
+REPORTES_ADMIN = 'reportes.admin'
+TODOS_LOS_DEPARTAMENTOS = 'departamentos.todos'  # Sin esto, solo el propio departamento
+
+BASE = frozenset({
+    USAR_MANTENIMIENTO, USAR_COMUNICACION, USAR_RESERVAS, USAR_FINANZAS, DESCARGAR_REPORTES,
+})
+
+ADMINISTRACION = frozenset({
+    GESTIONAR_MANTENIMIENTO, EXPORTAR_MANTENIMIENTO, METRICAS_MANTENIMIENTO,
+    GESTIONAR_AVISOS, GESTIONAR_QUEJAS, MONITOREAR_COMUNICACION, VER_NOTIFICACIONES,
+    GESTIONAR_FINANZAS, GESTIONAR_RESERVAS, GESTIONAR_USUARIOS, REPORTES_ADMIN,
+    TODOS_LOS_DEPARTAMENTOS,
+})
+
+PERMISOS_POR_ROL = {
+    'admin': BASE | ADMINISTRACION,
+    'residente': BASE,
+    'personal': BASE,
+}
+
+SIN_PERMISOS = frozenset()
+
+# Constantes visibles en las plantillas como permisos.GESTIONAR_QUEJAS, etc.
+CONSTANTES = SimpleNamespace(**{
+    nombre: valor for nombre, valor in globals().items()
+    if nombre.isupper() and isinstance(valor, str)
+})
+
+
+def permisos_de_rol(rol):
+    """Conjunto inmutable de permisos del rol (vacío si el rol no existe)"""
+    return PERMISOS_POR_ROL.get(rol, SIN_PERMISOS)
+
+
+def puede(usuario, permiso):
+    if not usuario.is_authenticated:
+        return False
+    permisos = getattr(usuario, 'permisos', None)
+    if permisos is None:
+        permisos = permisos_de_rol(usuario.role)
+    return permiso in permisos
+
+
+def puede_departamento(usuario, departamento_id):
+    """Administradores: cualquier departamento; el resto, solo el propio"""
+    return puede(usuario, TODOS_LOS_DEPARTAMENTOS) or (
+        usuario.is_authenticated and usuario.departamento is not None
+        and usuario.departamento == departamento_id
+    )
+
+
+# ============= RESPUESTAS =============
+
+def _espera_json():
+    return '/api/' in request.path or request.accept_mimetypes.best == 'application/json'
+
+
+def denegar():
+    """Sin sesión: al login; sin permiso: 403 en APIs o aviso y vuelta al inicio"""
+    if not current_user.is_authenticated:
+        return current_app.login_manager.unauthorized()
+    if _espera_json():
+        return jsonify({'error': 'Permiso denegado'}), 403
+    flash('No tienes permiso para acceder a esta página.', 'danger')
+    return redirect(url_for('auth.home'))
+
+
+# ============= DECLARACIÓN =============
+
+def permiso_requerido(permiso):
+    """Decorador para vistas sueltas (los blueprints usan proteger_blueprint)"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not puede(current_user, permiso):
+                return denegar()
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def proteger_blueprint(blueprint, permisos, por_defecto=None):
+    """
+    Exige permisos[endpoint] (o por_defecto) antes de cada vista del blueprint.
+    Los endpoints sin permiso y sin valor por defecto quedan sin restricción.
+    """
+    prefijo = f'{blueprint.name}.'
+    tabla = {prefijo + endpoint: permiso for endpoint, permiso in permisos.items()}
+
+    @blueprint.before_request
+    def verificar_permiso():
+        permiso = tabla.get(request.endpoint, por_defecto)
+        if permiso is not None and not puede(current_user, permiso):
+            return denegar()
+
+    return tabla
+
+
+def configurar_plantillas(app):
+    """Expone las constantes a Jinja: current_user.puede(permisos.X)"""
+    @app.context_processor
+    def permisos_en_plantillas():
+        return {'permisos': CONSTANTES}
@@ -0,0 +1,177 @@
+# app/utils/presencia.py
+"""
+Registro de presencia de Socket.IO
+Relaciona cada sid con su usuario y sus salas, y lleva métricas de
+conexiones, mensajes por segundo y latencia de los emit.
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+
+# Ventana para calcular mensajes por segundo y latencia de emit
+VENTANA_SEGUNDOS = 60
+
+
+def _tamano_aprox(objeto, vistos=None):
+    """Tamaño aproximado en bytes de una estructura (dict/list/set/tuplas)"""
+    vistos = vistos if vistos is not None else set()
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+    tamano = sys.getsizeof(objeto)
+    if isinstance(objeto, dict):
+        tamano += sum(_tamano_aprox(k, vistos) + _tamano_aprox(v, vistos) for k, v in objeto.items())
+    elif isinstance(objeto, (list, tuple, set, frozenset, deque)):
+        tamano += sum(_tamano_aprox(x, vistos) for x in objeto)
+    return tamano
+
+
+class RegistroPresencia:
+    """Estado en memoria de las conexiones Socket.IO de este proceso"""
+
+    def __init__(self):
+        self._conexiones = {}  # sid -> {'user_id', 'nombre', 'role', 'departamento', 'formato', 'salas', 'conectado_en'}
+        self._salas = {}       # sala -> set(sid)
+        self._mensajes = deque()  # (instante, None)
+        self._emits = deque()     # (instante, duración)
+        self._lock = threading.Lock()
+
+    # ============= CONEXIONES =============
+
+    def conectar(self, sid, user=None, formato='json'):
+        """Asocia el sid con un contexto compacto del usuario autenticado"""
+        with self._lock:
+            self._conexiones[sid] = {
+                'user_id': user.id if user else None,
+                'nombre': user.get_full_name() if user else 'Anónimo',
+                'role': user.role if user else None,
+                'departamento': user.departamento if user else None,
+                'formato': formato,
+                'salas': set(),
+                'conectado_en': time.time(),
+            }
+
+    def desconectar(self, sid):
+        """Quita el sid de todas sus salas. Es idempotente."""
+        with self._lock:
+            conexion = self._conexiones.pop(sid, None)
+            if not conexion:
+                return False
+            for sala in conexion['salas']:
+                miembros = self._salas.get(sala)
+                if miembros is not None:
+                    miembros.discard(sid)
+                    if not miembros:
+                        del self._salas[sala]
+            return True
+
+    def unirse(self, sid, sala):
+        with self._lock:
+            conexion = self._conexiones.get(sid)
+            if conexion is None:
+                return
+            conexion['salas'].add(sala)
+            self._salas.setdefault(sala, set()).add(sid)
+
+    def salir(self, sid, sala):
+        with self._lock:
+            conexion = self._conexiones.get(sid)
+            if conexion is not None:
+                conexion['salas'].discard(sala)
+            miembros = self._salas.get(sala)
+            if miembros is not None:
+                miembros.discard(sid)
+                if not miembros:
+                    del self._salas[sala]
+
+    def sids(self):
+        with self._lock:
+            return list(self._conexiones)
+
+    def usuario(self, sid):
+        """Copia del contexto del sid (None si no está registrado)"""
+        with self._lock:
+            conexion = self._conexiones.get(sid)
+            if not conexion:
+                return None
+            contexto = dict(conexion)
+            contexto['salas'] = set(conexion['salas'])
+            return contexto
+
+    def sids_con_formato(self, sala, formato):
+        """Sids de una sala que negociaron un formato de envío"""
+        with self._lock:
+            return [
+                sid for sid in self._salas.get(sala, ())
+                if self._conexiones[sid]['formato'] == formato
+            ]
+
+    def en_linea(self, sala):
+        """Usuarios distintos presentes en una sala"""
+        with self._lock:
+            usuarios = {}
+            for sid in self._salas.get(sala, ()):
+                conexion = self._conexiones[sid]
+                clave = conexion['user_id'] or sid
+                usuarios[clave] = {'user_id': conexion['user_id'], 'nombre': conexion['nombre']}
+            return list(usuarios.values())
+
+    def purgar(self, esta_conectado):
+        """Elimina los sid que el servidor ya no reconoce (caídas sin disconnect)"""
+        eliminados = 0
+        for sid in self.sids():
+            if not esta_conectado(sid) and self.desconectar(sid):
+                eliminados += 1
+        return eliminados
+
+    # ============= MÉTRICAS =============
+
+    def _recortar(self, cola, ahora):
+        while cola and ahora - cola[0][0] > VENTANA_SEGUNDOS:
+            cola.popleft()
+
+    def registrar_mensaje(self):
+        ahora = time.time()
+        with self._lock:
+            self._mensajes.append((ahora, None))
+            self._recortar(self._mensajes, ahora)
+
+    def registrar_emit(self, duracion):
+        ahora = time.time()
+        with self._lock:
+            self._emits.append((ahora, duracion))
+            self._recortar(self._emits, ahora)
+
+    def medir_emit(self, funcion, *args, **kwargs):
+        """Ejecuta un emit y registra cuánto tardó"""
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            self.registrar_emit(time.perf_counter() - inicio)
+
+    def metricas(self):
+        ahora = time.time()
+        with self._lock:
+            self._recortar(self._mensajes, ahora)
+            self._recortar(self._emits, ahora)
+            duraciones = sorted(d for _, d in self._emits)
+            usuarios = {c['user_id'] for c in self._conexiones.values() if c['user_id']}
+            return {
+                'conexiones': len(self._conexiones),
+                'usuarios_conectados': len(usuarios),
+                'salas': len(self._salas),
+                'por_sala': {sala: len(sids) for sala, sids in self._salas.items()},
+                'mensajes_por_segundo': round(len(self._mensajes) / VENTANA_SEGUNDOS, 3),
+                'emit_latencia_ms': {
+                    'promedio': round(sum(duraciones) / len(duraciones) * 1000, 3) if duraciones else 0.0,
+                    'p95': round(duraciones[min(len(duraciones) - 1, int(len(duraciones) * 0.95))] * 1000, 3) if duraciones else 0.0,
+                    'max': round(duraciones[-1] * 1000, 3) if duraciones else 0.0,
+                },
+                'memoria_aprox_bytes': _tamano_aprox(self._conexiones) + _tamano_aprox(self._salas),
+            }
+
+
+registro_presencia = RegistroPresencia()
@@ -0,0 +1,130 @@
+# app/utils/principales.py
+"""
+Caché de usuarios autenticados para Flask-Login
+load_user entrega un PrincipalUsuario: una copia liviana de los campos que
+usan las vistas y plantillas, guardada unos segundos en memoria para no
+consultar la tabla users en cada petición. Se invalida al confirmarse la
+transacción que modifica (perfil, rol o contraseña) o elimina al usuario. Lo que no está copiado se
+lee del User de la base, cargado una sola vez por petición.
+"""
+
+import threading
+import time
+from flask import g, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+from models.user_model import User
+from utils import permisos
+from utils.transaccion import al_confirmar
+
+USUARIOS_CACHE_SEGUNDOS = 30
+MAX_ENTRADAS = 2048
+
+CAMPOS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'ci', 'telefono',
+    'role', 'departamento', 'must_change_password', 'estado'
+)
+
+
+class PrincipalUsuario(UserMixin):
+    """Usuario de la sesión sin acceso a la base para los datos habituales"""
+
+    def __init__(self, user):
+        for campo in CAMPOS:
+            self.__dict__[campo] = getattr(user, campo)
+        self.__dict__['nombre_completo'] = user.get_full_name()
+        # Permisos del rol, calculados una vez por copia (el cambio de rol la invalida)
+        self.__dict__['permisos'] = permisos.permisos_de_rol(user.role)
+
+    def has_role(self, role):
+        return self.role == role
+
+    def puede(self, permiso):
+        return permiso in self.permisos
+
+    def puede_departamento(self, departamento_id):
+        return permisos.puede_departamento(self, departamento_id)
+
+    def get_full_name(self):
+        return self.nombre_completo
+
+    def usuario(self):
+        """El User de la base (para modificarlo o leer relaciones)"""
+        cargados = g.setdefault('usuarios_cargados', {})
+        if self.id not in cargados:
+            cargados[self.id] = User.get_by_id(self.id)
+        return cargados[self.id]
+
+    def __getattr__(self, nombre):
+        # Solo se llama para atributos que no están copiados
+        if nombre.startswith('__') or not has_app_context():
+            raise AttributeError(nombre)
+        return getattr(self.usuario(), nombre)
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError(f"PrincipalUsuario es de solo lectura: use usuario().{nombre}")
+
+
+class CachePrincipales:
+    """user_id -> (vence, PrincipalUsuario)"""
+
+    def __init__(self, segundos=USUARIOS_CACHE_SEGUNDOS, max_entradas=MAX_ENTRADAS):
+        self.segundos = segundos
+        self.max_entradas = max_entradas
+        self._entradas = {}
+        self._lock = threading.Lock()
+        self._generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, user_id):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+            if entrada is not None and entrada[0] > ahora:
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+            generacion = self._generacion
+
+        user = User.get_by_id(user_id)
+        if user is None:
+            return None
+        principal = PrincipalUsuario(user)
+        with self._lock:
+            # Si hubo una invalidación mientras se leía, no se guarda la copia
+            if generacion != self._generacion:
+                return principal
+            if len(self._entradas) >= self.max_entradas:
+                self._entradas.pop(next(iter(self._entradas)))
+            self._entradas[user_id] = (ahora + self.segundos, principal)
+        return principal
+
+    def invalidar(self, user_id=None):
+        with self._lock:
+            self._generacion += 1
+            if user_id is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(user_id, None)
+
+    def estadisticas(self):
+        return {
+            'entradas': len(self._entradas),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'segundos': self.segundos,
+        }
+
+
+cache_principales = CachePrincipales()
+
+
+def _invalidar_evento(mapper, connection, target):
+    # Antes del commit otra petición podría volver a cachear los datos anteriores
+    al_confirmar(target, cache_principales.invalidar, target.id)
+
+
+if not event.contains(User, 'after_update', _invalidar_evento):
+    event.listen(User, 'after_update', _invalidar_evento)
+    event.listen(User, 'after_delete', _invalidar_evento)
@@ -0,0 +1,37 @@
+# app/utils/programador_preventivo.py
+"""
+Programador de mantenimiento preventivo
+Revisa periódicamente los planes vencidos, crea sus tickets en lote y
+avisa a los admins con una sola notificación.
+"""
+
+from models.mantenimiento_model import PlanPreventivo
+
+
+def ejecutar_planes(socketio=None, hoy=None, user_id=None):
+    """Genera los tickets de los planes vencidos; devuelve la lista creada"""
+    tickets = PlanPreventivo.generar_tickets(hoy=hoy, user_id=user_id)
+    if tickets and socketio is not None:
+        from socket_events import notify_new_ticket
+        notify_new_ticket(socketio, tickets)
+    return tickets
+
+
+def iniciar_programador(app, socketio):
+    """Tarea en segundo plano del servidor (intervalo en PREVENTIVO_INTERVALO_SEGUNDOS)"""
+    intervalo = app.config['PREVENTIVO_INTERVALO_SEGUNDOS']
+    if not intervalo:
+        return
+
+    def revisar_planes():
+        while True:
+            with app.app_context():
+                try:
+                    tickets = ejecutar_planes(socketio)
+                    if tickets:
+                        print(f'Preventivo: {len(tickets)} tickets generados')
+                except Exception as e:
+                    print(f'Error en el programador preventivo: {e}')
+            socketio.sleep(intervalo)
+
+    socketio.start_background_task(revisar_planes)
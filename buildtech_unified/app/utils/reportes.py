@@ -0,0 +1,294 @@
+# app/utils/reportes.py
+"""
+Almacén de reportes PDF
+Los PDFs se generan en un pool de procesos (fuera del hilo de la petición)
+y se guardan en disco con una clave derivada del contenido: tipo, entidad y
+una huella de los datos. Si los datos no cambian, la descarga sirve el
+archivo existente; si cambian, la huella es otra y se genera uno nuevo.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from flask import current_app, request, jsonify, redirect, url_for, flash, send_file, render_template
+from flask_login import current_user
+from utils.reportes_pdf import generar
+
+PATRON_CLAVE = re.compile(r'^(?P<tipo>[a-z_]+)-(?P<entidad>\w+)-[0-9a-f]{20}$')
+
+# Nombre del archivo descargado según el tipo de reporte
+NOMBRES_DESCARGA = {
+    'ticket': 'ticket_{entidad}.pdf',
+    'finanzas': 'reporte_financiero_{entidad}.pdf',
+    'tickets_pdf': 'exportacion_tickets.pdf',
+    'tickets_xlsx': 'exportacion_tickets.xlsx',
+}
+
+# Extensión y tipo MIME de los reportes que no son PDF
+FORMATOS_ARCHIVO = {
+    'tickets_xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+FORMATO_PDF = ('pdf', 'application/pdf')
+
+# Cada cuánto entrega el servidor los avisos de reportes terminados
+INTERVALO_DESPACHO_SEGUNDOS = 0.2
+
+
+def formato_archivo(clave):
+    return FORMATOS_ARCHIVO.get(clave.split('-', 1)[0], FORMATO_PDF)
+
+
+class AlmacenReportes:
+    """Reportes en disco con generación en segundo plano"""
+
+    def __init__(self, directorio, procesos=2):
+        self.directorio = directorio
+        self.procesos = procesos
+        self._pool = None
+        self._trabajos = {}  # clave -> {'estado', 'user_id', 'url', 'error'}
+        self._lock = threading.Lock()
+        self._al_terminar = []
+        self._terminados = queue.SimpleQueue()  # (clave, trabajo) por avisar
+        self._bucle = None                      # (iniciar_tarea, dormir) del servidor
+        self._despacho_activo = False
+        self._en_curso = 0                      # Trabajos enviados al pool sin terminar
+        os.makedirs(directorio, exist_ok=True)
+
+    # ============= CLAVES Y RUTAS =============
+
+    @staticmethod
+    def clave(tipo, entidad, datos):
+        huella = hashlib.sha256(
+            json.dumps(datos, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()[:20]
+        return f'{tipo}-{entidad}-{huella}'
+
+    def ruta(self, clave):
+        if not PATRON_CLAVE.match(clave):
+            raise ValueError(f'Clave de reporte inválida: {clave}')
+        return os.path.join(self.directorio, f'{clave}.{formato_archivo(clave)[0]}')
+
+    def estado(self, clave):
+        """'listo', 'pendiente', 'error' o None si no se conoce"""
+        if os.path.exists(self.ruta(clave)):
+            return 'listo'
+        trabajo = self._trabajos.get(clave)
+        return trabajo['estado'] if trabajo else None
+
+    def trabajo(self, clave):
+        return self._trabajos.get(clave)
+
+    # ============= GENERACIÓN =============
+
+    def al_terminar(self, funcion):
+        """Registra funcion(clave, trabajo), llamada al terminar cada reporte"""
+        self._al_terminar.append(funcion)
+
+    def despachar_en(self, iniciar_tarea, dormir):
+        """
+        Entrega los avisos desde un bucle del propio servidor (start_background_task
+        y sleep de Socket.IO) y no desde el hilo que administra el pool de procesos.
+        El bucle corre solo mientras hay reportes en curso; solicitar lo reinicia.
+        """
+        self._bucle = (iniciar_tarea, dormir)
+
+    def _iniciar_despacho(self):
+        with self._lock:
+            if self._bucle is None or self._despacho_activo:
+                return
+            self._despacho_activo = True
+        iniciar_tarea, dormir = self._bucle
+
+        def despachar_pendientes():
+            while True:
+                dormir(INTERVALO_DESPACHO_SEGUNDOS)
+                self.despachar_terminados()
+                with self._lock:
+                    # _terminado encola con el lock tomado: no se pierde ningún aviso
+                    if not self._en_curso and self._terminados.empty():
+                        self._despacho_activo = False
+                        return
+
+        iniciar_tarea(despachar_pendientes)
+
+    def despachar_terminados(self):
+        """Llama a los al_terminar con los reportes terminados desde la última vez"""
+        while True:
+            try:
+                clave, trabajo = self._terminados.get_nowait()
+            except queue.Empty:
+                return
+            for funcion in self._al_terminar:
+                try:
+                    funcion(clave, trabajo)
+                except Exception as e:
+                    print(f'Error notificando reporte {clave}: {e}')
+
+    def _ejecutor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.procesos)
+        return self._pool
+
+    def ejecutor(self):
+        """Pool de procesos compartido con otras tareas pesadas; None si procesos es 0"""
+        return self._ejecutor() if self.procesos else None
+
+    def solicitar(self, tipo, entidad, datos, user_id=None, url=None, contexto=None):
+        """
+        Pide un reporte; devuelve su clave. No bloquea. La clave sale solo de
+        'datos'; 'contexto' llega al generador sin afectarla.
+        """
+        clave = self.clave(tipo, entidad, datos)
+        ruta = self.ruta(clave)
+        if os.path.exists(ruta):
+            return clave
+
+        with self._lock:
+            trabajo = self._trabajos.get(clave)
+            if trabajo and trabajo['estado'] == 'pendiente':
+                return clave
+            self._trabajos[clave] = {'estado': 'pendiente', 'user_id': user_id, 'url': url, 'error': None}
+            self._en_curso += 1
+        self._iniciar_despacho()
+
+        if self.procesos:
+            futuro = self._ejecutor().submit(generar, tipo, datos, ruta, contexto)
+        else:
+            # Sin procesos (pruebas o entornos limitados): se genera aquí mismo
+            futuro = Future()
+            try:
+                futuro.set_result(generar(tipo, datos, ruta, contexto))
+            except Exception as error:
+                futuro.set_exception(error)
+        futuro.add_done_callback(lambda f: self._terminado(clave, f))
+        return clave
+
+    def _terminado(self, clave, futuro):
+        error = futuro.exception()
+        if not error:
+            self._descartar_versiones_anteriores(clave)
+        with self._lock:
+            trabajo = self._trabajos[clave]
+            if error:
+                trabajo['estado'] = 'error'
+                trabajo['error'] = str(error)
+            else:
+                trabajo['estado'] = 'listo'
+            self._en_curso -= 1
+            # Este hilo es el del pool: los avisos se encolan para el bucle del servidor
+            self._terminados.put((clave, trabajo))
+        if self._bucle is None:
+            self.despachar_terminados()
+
+    def _descartar_versiones_anteriores(self, clave):
+        """Borra los reportes de la misma entidad con otra huella (datos viejos)"""
+        prefijo = clave.rsplit('-', 1)[0] + '-'
+        actual = os.path.basename(self.ruta(clave))
+        for nombre in os.listdir(self.directorio):
+            if nombre.startswith(prefijo) and not nombre.endswith('.tmp') and nombre != actual:
+                try:
+                    os.remove(os.path.join(self.directorio, nombre))
+                except OSError:
+                    pass
+        with self._lock:
+            for otra in [c for c, t in self._trabajos.items()
+                         if c.startswith(prefijo) and c != clave and t['estado'] != 'pendiente']:
+                del self._trabajos[otra]
+
+    def esperar(self, clave, segundos, dormir=time.sleep):
+        """Espera hasta 'segundos' a que el reporte termine, cediendo con dormir()"""
+        limite = time.monotonic() + segundos
+        while self.estado(clave) == 'pendiente' and time.monotonic() < limite:
+            dormir(0.05)
+        return self.estado(clave)
+
+
+def configurar_almacen(app, socketio=None):
+    """Crea el almacén de la app y avisa por Socket.IO cuando termina un reporte"""
+    almacen = AlmacenReportes(
+        app.config['REPORTES_DIR'],
+        procesos=app.config['REPORTES_PROCESOS']
+    )
+    if socketio is not None:
+        def notificar(clave, trabajo):
+            if trabajo['user_id']:
+                socketio.emit('reporte_listo', {
+                    'clave': clave,
+                    'estado': trabajo['estado'],
+                    'url': trabajo['url']
+                }, room=f"usuario_{trabajo['user_id']}")
+        almacen.al_terminar(notificar)
+        almacen.despachar_en(socketio.start_background_task, socketio.sleep)
+    app.extensions['reportes'] = almacen
+    return almacen
+
+
+def obtener_almacen():
+    return current_app.extensions['reportes']
+
+
+def nombre_descarga(clave):
+    datos = PATRON_CLAVE.match(clave).groupdict()
+    return NOMBRES_DESCARGA.get(datos['tipo'], '{entidad}.pdf').format(entidad=datos['entidad'])
+
+
+def enviar_reporte(clave):
+    """Respuesta con el reporte ya generado (la URL es inmutable: depende del contenido)"""
+    respuesta = send_file(
+        obtener_almacen().ruta(clave),
+        mimetype=formato_archivo(clave)[1],
+        as_attachment=True,
+        download_name=nombre_descarga(clave),
+        conditional=True,
+        etag=clave
+    )
+    respuesta.headers['Cache-Control'] = 'private, max-age=86400'
+    return respuesta
+
+
+def servir_reporte(tipo, entidad, datos, contexto=None):
+    """
+    Sirve un reporte desde disco o lo encarga al pool. Si no termina dentro de
+    REPORTES_ESPERA_SEGUNDOS responde 202 (JSON) o redirige a la página de espera.
+    """
+    almacen = obtener_almacen()
+    clave = almacen.clave(tipo, entidad, datos)
+    url = url_for('reportes.descargar', clave=clave)
+    almacen.solicitar(tipo, entidad, datos, user_id=current_user.id, url=url, contexto=contexto)
+
+    socketio = current_app.extensions.get('socketio')
+    estado = almacen.esperar(
+        clave,
+        current_app.config['REPORTES_ESPERA_SEGUNDOS'],
+        dormir=socketio.sleep if socketio else time.sleep
+    )
+
+    if estado == 'listo':
+        return enviar_reporte(clave)
+    if estado == 'error':
+        flash('No se pudo generar el reporte. Intente nuevamente.', 'error')
+        return redirect(request.referrer or url_for('auth.home'))
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            'estado': estado,
+            'clave': clave,
+            'url': url,
+            'url_estado': url_for('reportes.estado', clave=clave)
+        }), 202
+    return redirect(url)
+
+
+def pagina_espera(clave):
+    return render_template(
+        'reportes/generando.html',
+        title='Generando reporte',
+        clave=clave,
+        url=url_for('reportes.descargar', clave=clave),
+        url_estado=url_for('reportes.estado', clave=clave)
+    )
@@ -0,0 +1,183 @@
+# app/utils/reportes_pdf.py
+"""
+Generación de PDFs con ReportLab
+Las funciones reciben datos simples (dict/list) y escriben el PDF en una
+ruta, para poder ejecutarse en un proceso aparte (ver utils/reportes.py).
+"""
+
+import os
+from datetime import datetime
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_CENTER
+
+
+def reporte_ticket(datos, ruta):
+    """PDF con el detalle de un ticket de mantenimiento"""
+    doc = SimpleDocTemplate(ruta, pagesize=letter)
+    elements = []
+
+    styles = getSampleStyleSheet()
+    title_style = styles['Heading1']
+    # Configurar el estilo del título
+    title_style.alignment = 1 # Centro
+
+    # Título
+    elements.append(Paragraph("REPORTE DE MANTENIMIENTO", title_style))
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Crear tabla con la información
+    data = [
+        ['ID Ticket:', str(datos['id'])],
+        ['Descripción:', datos['descripcion'] or 'N/A'],
+        ['Prioridad:', datos['prioridad'] or 'N/A'],
+        ['Responsable:', datos['responsable'] or 'N/A'],
+        ['Fecha Inicio:', datos['fecha_ini'] or 'N/A'],
+        ['Fecha Fin:', datos['fecha_fin'] or 'N/A'],
+        ['Costo:', f"${datos['costo']}" if datos['costo'] else 'N/A'],
+        ['Trabajo Realizado:', 'Sí' if datos['trabajo_realizado'] else 'No'],
+        ['Evidencia:', 'Disponible' if datos['evidencia_url'] else 'No disponible'],
+    ]
+
+    table = Table(data, colWidths=[2*inch, 4*inch])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.grey),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('BACKGROUND', (1, 0), (1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+
+    elements.append(table)
+    doc.build(elements)
+
+
+def reporte_mensual(datos, ruta):
+    """PDF con el resumen financiero de un mes y el detalle de gastos"""
+    ingresos_cargos = datos['ingresos_cargos']
+    ingresos_reservas = datos['ingresos_reservas']
+    gastos = datos['gastos']
+    total_gastos = sum(g['monto'] for g in gastos)
+
+    doc = SimpleDocTemplate(ruta, pagesize=letter)
+    elements = []
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#2c3e50'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+
+    # Título
+    mes_nombre = datetime(datos['anio'], datos['mes'], 1).strftime('%B %Y')
+    title = Paragraph(f"REPORTE FINANCIERO<br/>{mes_nombre.upper()}", title_style)
+    elements.append(title)
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Tabla de resumen
+    data_resumen = [
+        ['CONCEPTO', 'MONTO (Bs.)'],
+        ['Ingresos por Cargos Mensuales', f'{ingresos_cargos:,.2f}'],
+        ['Ingresos por Reservas', f'{ingresos_reservas:,.2f}'],
+        ['TOTAL INGRESOS', f'{ingresos_cargos + ingresos_reservas:,.2f}'],
+        ['', ''],
+        ['TOTAL GASTOS', f'{total_gastos:,.2f}'],
+        ['', ''],
+        ['BALANCE', f'{(ingresos_cargos + ingresos_reservas) - total_gastos:,.2f}'],
+    ]
+
+    table_resumen = Table(data_resumen, colWidths=[4*inch, 2*inch])
+    table_resumen.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 2), (-1, 2), colors.lightblue),
+        ('BACKGROUND', (0, 4), (-1, 4), colors.lightcoral),
+        ('BACKGROUND', (0, 6), (-1, 6), colors.lightgreen),
+        ('FONTNAME', (0, 2), (-1, 2), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 4), (-1, 4), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 6), (-1, 6), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+
+    elements.append(table_resumen)
+    elements.append(PageBreak())
+
+    # Detalle de gastos
+    if gastos:
+        elements.append(Paragraph("DETALLE DE GASTOS", styles['Heading2']))
+        elements.append(Spacer(1, 0.2*inch))
+
+        data_gastos = [['Fecha', 'Concepto', 'Categoría', 'Monto (Bs.)']]
+        for gasto in gastos:
+            data_gastos.append([
+                gasto['fecha'],
+                gasto['concepto'][:40],
+                gasto['categoria'],
+                f"{gasto['monto']:,.2f}"
+            ])
+
+        table_gastos = Table(data_gastos, colWidths=[1*inch, 3*inch, 1.5*inch, 1.5*inch])
+        table_gastos.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (3, 0), (3, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+
+        elements.append(table_gastos)
+
+    doc.build(elements)
+
+
+def exportacion_tickets_pdf(datos, ruta):
+    """PDF consolidado de todos los tickets que cumplen un filtro"""
+    from utils.exportacion_tickets import exportar_pdf
+    exportar_pdf(datos, ruta)
+
+
+def exportacion_tickets_xlsx(datos, ruta):
+    """Planilla XLSX de todos los tickets que cumplen un filtro"""
+    from utils.exportacion_tickets import exportar_xlsx
+    exportar_xlsx(datos, ruta)
+
+
+# Generadores disponibles por tipo de reporte
+GENERADORES = {
+    'ticket': reporte_ticket,
+    'finanzas': reporte_mensual,
+    'tickets_pdf': exportacion_tickets_pdf,
+    'tickets_xlsx': exportacion_tickets_xlsx,
+}
+
+
+def generar(tipo, datos, ruta_final, contexto=None):
+    """
+    Punto de entrada del proceso de trabajo: escribe el PDF de forma atómica.
+    'contexto' (conexión, hora) se agrega a los datos pero no forma parte de la clave.
+    """
+    temporal = f'{ruta_final}.{os.getpid()}.tmp'
+    try:
+        GENERADORES[tipo](dict(datos, **(contexto or {})), temporal)
+        os.replace(temporal, ruta_final)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    return ruta_final
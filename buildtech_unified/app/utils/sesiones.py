@@ -0,0 +1,232 @@
+# app/utils/sesiones.py
+"""
+Sesiones del lado del servidor
+La cookie solo lleva un identificador firmado; los datos de la sesión se
+guardan en un almacén intercambiable: SQLite (archivo propio, aparte de la
+base principal) o memoria para pruebas. Solo se escribe cuando la sesión
+cambia o cuando le queda menos de la mitad de su vigencia.
+"""
+
+import secrets
+import sqlite3
+import threading
+import time
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+# Escrituras entre cada limpieza de sesiones vencidas
+PURGAR_CADA = 500
+
+
+class SesionServidor(CallbackDict, SessionMixin):
+    """Diccionario de sesión que recuerda su identificador y si fue modificado"""
+
+    def __init__(self, datos=None, sid=None, expira=None):
+        def al_modificar(self):
+            self.modified = True
+        super().__init__(datos, al_modificar)
+        self.sid = sid
+        self.expira = expira
+        self.anterior = None
+        self.modified = False
+
+    def regenerar(self):
+        """Nuevo identificador (al iniciar sesión) para evitar la fijación de sesión"""
+        if self.sid and not self.anterior:
+            self.anterior = self.sid
+        self.sid = None
+        self.modified = True
+
+
+# ============= ALMACENES =============
+
+class AlmacenMemoria:
+    """Sesiones en un diccionario del proceso (pruebas o un solo servidor)"""
+
+    def __init__(self):
+        self._datos = {}  # sid -> (expira, bytes)
+        self._lock = threading.Lock()
+
+    def leer(self, sid):
+        with self._lock:
+            entrada = self._datos.get(sid)
+        if entrada is None or entrada[0] < time.time():
+            return None
+        return entrada
+
+    def guardar(self, sid, datos, expira):
+        with self._lock:
+            self._datos[sid] = (expira, datos)
+
+    def eliminar(self, sid):
+        with self._lock:
+            self._datos.pop(sid, None)
+
+    def purgar(self):
+        ahora = time.time()
+        with self._lock:
+            vencidas = [sid for sid, (expira, _) in self._datos.items() if expira < ahora]
+            for sid in vencidas:
+                del self._datos[sid]
+        return len(vencidas)
+
+    def contar(self):
+        return len(self._datos)
+
+
+class AlmacenSQLite:
+    """Sesiones en un archivo SQLite propio, con una conexión por hilo"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._local = threading.local()
+        conexion = self._conexion()
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.execute(
+            'CREATE TABLE IF NOT EXISTS sesiones ('
+            ' sid TEXT PRIMARY KEY, expira REAL NOT NULL, datos BLOB NOT NULL)'
+        )
+        conexion.execute('CREATE INDEX IF NOT EXISTS ix_sesiones_expira ON sesiones (expira)')
+        conexion.commit()
+
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=10)
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexion = conexion
+        return conexion
+
+    def leer(self, sid):
+        return self._conexion().execute(
+            'SELECT expira, datos FROM sesiones WHERE sid = ? AND expira >= ?', (sid, time.time())
+        ).fetchone()
+
+    def guardar(self, sid, datos, expira):
+        conexion = self._conexion()
+        conexion.execute(
+            'INSERT INTO sesiones (sid, expira, datos) VALUES (?, ?, ?) '
+            'ON CONFLICT(sid) DO UPDATE SET expira = excluded.expira, datos = excluded.datos',
+            (sid, expira, datos)
+        )
+        conexion.commit()
+
+    def eliminar(self, sid):
+        conexion = self._conexion()
+        conexion.execute('DELETE FROM sesiones WHERE sid = ?', (sid,))
+        conexion.commit()
+
+    def purgar(self):
+        conexion = self._conexion()
+        borradas = conexion.execute('DELETE FROM sesiones WHERE expira < ?', (time.time(),)).rowcount
+        conexion.commit()
+        return borradas
+
+    def contar(self):
+        return self._conexion().execute('SELECT COUNT(*) FROM sesiones').fetchone()[0]
+
+
+ALMACENES = {
+    'sqlite': lambda app: AlmacenSQLite(app.config['SESIONES_RUTA']),
+    'memoria': lambda app: AlmacenMemoria(),
+}
+
+
+# ============= INTERFAZ PARA FLASK =============
+
+class InterfazSesiones(SessionInterface):
+    """Cookie con el identificador firmado y datos en el almacén"""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, almacen):
+        self.almacen = almacen
+        self._escrituras = 0
+        self._lock = threading.Lock()
+
+    def _firmador(self, app):
+        return Signer(app.secret_key, salt='sesion-servidor', key_derivation='hmac')
+
+    def _vigencia(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._firmador(app).unsign(cookie).decode('ascii')
+            except BadSignature:
+                sid = None
+            entrada = self.almacen.leer(sid) if sid else None
+            if entrada is not None:
+                expira, datos = entrada
+                return SesionServidor(self.serializer.loads(datos), sid=sid, expira=expira)
+        return SesionServidor()
+
+    def save_session(self, app, session, response):
+        nombre = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        ruta = self.get_cookie_path(app)
+        response.vary.add('Cookie')
+
+        if session.anterior:
+            self.almacen.eliminar(session.anterior)
+            session.anterior = None
+
+        if not session:
+            if session.sid and session.modified:
+                self.almacen.eliminar(session.sid)
+                response.delete_cookie(nombre, domain=dominio, path=ruta)
+            return
+
+        ahora = time.time()
+        vigencia = self._vigencia(app)
+        # Sin cambios solo se renueva cuando ya consumió la mitad de su vigencia
+        renovar = session.expira is not None and session.expira - ahora < vigencia / 2
+        if not (session.modified or session.sid is None or renovar):
+            return
+
+        session.sid = session.sid or secrets.token_urlsafe(32)
+        session.expira = ahora + vigencia
+        self.almacen.guardar(session.sid, self.serializer.dumps(dict(session)), session.expira)
+        self._purgar_si_corresponde()
+
+        response.set_cookie(
+            nombre,
+            self._firmador(app).sign(session.sid).decode('ascii'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=dominio,
+            path=ruta,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+    def _purgar_si_corresponde(self):
+        with self._lock:
+            self._escrituras += 1
+            if self._escrituras < PURGAR_CADA:
+                return
+            self._escrituras = 0
+        self.almacen.purgar()
+
+
+def configurar_sesiones(app):
+    """Instala el almacén elegido en SESIONES_ALMACEN (None = cookie firmada de Flask)"""
+    tipo = app.config.get('SESIONES_ALMACEN')
+    if not tipo:
+        return None
+    almacen = ALMACENES[tipo](app)
+    app.session_interface = InterfazSesiones(almacen)
+    app.extensions['sesiones'] = almacen
+    return almacen
+
+
+def regenerar_sesion(session):
+    """Cambia el identificador de la sesión si el almacén lo permite"""
+    if isinstance(session, SesionServidor):
+        session.regenerar()
@@ -0,0 +1,35 @@
+# app/utils/transaccion.py
+"""
+Acciones diferidas hasta el commit de la sesión
+Los eventos de mapper ocurren durante el flush, antes de saber si la
+transacción se confirma. Los índices y cachés en memoria encolan aquí su
+actualización: se aplica en after_commit y se descarta en after_rollback.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+_CLAVE = 'al_confirmar'
+
+
+def al_confirmar(target, accion, *args):
+    """Ejecuta accion(*args) cuando se confirme la sesión del objeto"""
+    session = object_session(target)
+    if session is None:
+        accion(*args)
+        return
+    session.info.setdefault(_CLAVE, []).append((accion, args))
+
+
+def _confirmada(session):
+    for accion, args in session.info.pop(_CLAVE, ()):
+        accion(*args)
+
+
+def _revertida(session):
+    session.info.pop(_CLAVE, None)
+
+
+if not event.contains(Session, 'after_commit', _confirmada):
+    event.listen(Session, 'after_commit', _confirmada)
+    event.listen(Session, 'after_rollback', _revertida)
@@ -7,18 +7,32 @@ def crear_ticket():
         title="Crear ticket"
     )
 
-def list_ticket(tickets):
+def list_ticket(tickets, filtros=None, siguiente=None, responsables=None, es_continuacion=False):
+    filtros = filtros or {}
+    # Filtros en forma de parámetros de URL (para los enlaces de paginación)
+    parametros = {
+        clave: valor.isoformat() if hasattr(valor, 'isoformat') else valor
+        for clave, valor in filtros.items()
+        if valor and not (clave == 'orden' and valor == 'recientes')
+    }
     return render_template(
         "mantenimiento/list_tickets.html",  # ✅ CORREGIDO: era maintenance/
         tickets=tickets,
+        filtros=filtros,
+        parametros=parametros,
+        siguiente=siguiente,
+        responsables=responsables or [],
+        es_continuacion=es_continuacion,
         title="Lista de tickets"
     )
 
-def update_ticket_ini(ticket):
+def update_ticket_ini(ticket, sugerencias=None, personal=None):
     return render_template(
         "mantenimiento/actualizar_ini.html",  # ✅ CORREGIDO: era maintenance/
         title="Actualizar ticket",
-        ticket=ticket
+        ticket=ticket,
+        sugerencias=sugerencias or [],
+        personal=personal or []
     )
 
 def update_ticket_fin(ticket):
@@ -28,10 +42,26 @@ def update_ticket_fin(ticket):
         ticket=ticket
     )
 
-def generate_ticket(ticket):
+def generate_ticket(ticket, uso_evidencias=None):
     return render_template(
         "mantenimiento/generate_ticket.html",  # ✅ CORREGIDO: era maintenance/
         title="Ticket",
         ticket=ticket,
+        uso_evidencias=uso_evidencias,
         download_url=url_for('mantenimiento.download_report', id=ticket.id_mantenimiento)
-    )
\ No newline at end of file
+    )
+
+def list_planes(planes):
+    return render_template(
+        "mantenimiento/planes.html",
+        title="Mantenimiento preventivo",
+        planes=planes
+    )
+
+def list_personal(personal, cargas):
+    return render_template(
+        "mantenimiento/personal.html",
+        title="Personal de mantenimiento",
+        personal=personal,
+        cargas=cargas
+    )
@@ -0,0 +1,221 @@
+# tareas.py
+"""
+Tareas programadas de BuildTech (para cron o ejecución manual)
+Ejecutar: python3 tareas.py <tarea>
+
+Ejemplo de cron (todos los días a las 00:05):
+    5 0 * * * cd /ruta/buildtech_unified && python3 tareas.py archivar-avisos
+    30 3 * * 0 cd /ruta/buildtech_unified && python3 tareas.py archivar-chat --dias 90
+    0 6 * * * cd /ruta/buildtech_unified && python3 tareas.py generar-preventivos
+    0 4 * * * cd /ruta/buildtech_unified && python3 tareas.py compactar-intentos
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# Agregar el directorio app al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'app'))
+
+
+def archivar_avisos(args):
+    """Archiva los avisos cuya fecha de vigencia ya pasó"""
+    from models.comunicacion_model import Aviso
+
+    archivados = Aviso.archivar_vencidos()
+    print(f"✅ Avisos archivados por vencimiento: {archivados}")
+
+
+def archivar_chat(args):
+    """Mueve el historial antiguo del chat a bloques mensuales comprimidos"""
+    from models.chat_model import ChatArchivo
+
+    archivados = ChatArchivo.archivar_mensajes(dias=args.dias)
+    print(f"✅ Mensajes de chat archivados: {archivados}")
+
+
+def benchmark_formato(args):
+    """Compara tamaño y CPU de JSON vs formato compacto en un historial de chat"""
+    from models.chat_model import ChatMessage
+    from utils.formato_compacto import disponible, codificar
+
+    if not disponible():
+        print("❌ msgpack no está instalado: pip install msgpack")
+        return
+
+    # Mensajes en memoria (no se guardan), con textos de largo variable
+    inicio = datetime(2025, 1, 1)
+    mensajes = []
+    for i in range(args.mensajes):
+        msg = ChatMessage(content=f"Mensaje de prueba número {i} " + "x" * (i % 80),
+                          username=f"Residente {i % 40}", ticket_id=(i % 7) or None)
+        msg.id = i + 1
+        msg.timestamp = inicio + timedelta(seconds=37 * i)
+        mensajes.append(msg)
+
+    def medir(serializar):
+        tiempos = []
+        for _ in range(args.repeticiones):
+            t0 = time.perf_counter()
+            datos = serializar()
+            tiempos.append(time.perf_counter() - t0)
+        return len(datos), statistics.median(tiempos) * 1000
+
+    # Socket.IO serializa con separadores compactos
+    json_bytes, json_ms = medir(lambda: json.dumps(
+        [m.to_dict() for m in mensajes], separators=(',', ':')
+    ).encode('utf-8'))
+    mp_bytes, mp_ms = medir(lambda: codificar([m.to_compacto() for m in mensajes]))
+
+    print(f"📊 Historial de {args.mensajes} mensajes (mediana de {args.repeticiones} repeticiones)")
+    print(f"   JSON:        {json_bytes:>10,} bytes  {json_ms:8.1f} ms")
+    print(f"   MessagePack: {mp_bytes:>10,} bytes  {mp_ms:8.1f} ms")
+    print(f"   Reducción:   {100 * (1 - mp_bytes / json_bytes):.1f}% tamaño, {100 * (1 - mp_ms / json_ms):.1f}% CPU")
+
+
+def benchmark_hash(args):
+    """Mide el costo del hash de contraseñas y sugiere PASSWORD_METODO para un objetivo"""
+    from utils.contrasenas import calibrar
+
+    medidos, elegido = calibrar(args.metodo, args.objetivo_ms, args.repeticiones)
+    print(f"📊 Verificación de contraseña con {args.metodo} (objetivo: {args.objetivo_ms} ms)")
+    for metodo, ms in medidos:
+        print(f"   {metodo:<28} {ms:8.1f} ms")
+    print(f"✅ Configuración sugerida: app.config['PASSWORD_METODO'] = '{elegido}'")
+
+
+def reconstruir_transiciones(args):
+    """Crea el historial de estados de los tickets anteriores al registro de transiciones"""
+    from models.mantenimiento_model import TransicionTicket
+
+    completados = TransicionTicket.reconstruir_faltantes()
+    print(f"✅ Tickets con historial reconstruido: {completados}")
+
+
+def vincular_quejas(args):
+    """Asigna su autor a las quejas antiguas cuyo nombre coincide con un solo usuario"""
+    from models.comunicacion_model import Queja
+
+    vinculadas = Queja.vincular_autores()
+    print(f"✅ Quejas vinculadas con su autor: {vinculadas}")
+
+
+def generar_preventivos(args):
+    """Crea los tickets de los planes de mantenimiento preventivo vencidos"""
+    from flask import current_app
+    from utils.programador_preventivo import ejecutar_planes
+
+    # La notificación queda guardada; los admins la reciben al reconectar
+    tickets = ejecutar_planes(current_app.extensions.get('socketio'))
+    print(f"✅ Tickets preventivos generados: {len(tickets)}")
+
+
+def conciliar_gastos(args):
+    """Sincroniza los costos de tickets finalizados con los gastos del edificio"""
+    from models.finanzas_model import GastoEdificio
+
+    resultado = GastoEdificio.conciliar_mantenimiento(simular=args.simular)
+    prefijo = "🔎 Diferencias encontradas" if args.simular else "✅ Gastos conciliados"
+    print(f"{prefijo}: {resultado['creados']} por crear, {resultado['actualizados']} por actualizar, "
+          f"{resultado['eliminados']} por eliminar")
+
+
+def importar_residentes(args):
+    """Crea usuarios en lote desde un CSV/XLSX y escribe el reporte por fila"""
+    from flask import current_app
+    from utils import importacion_residentes
+
+    with open(args.archivo, 'rb') as archivo:
+        resultado = importacion_residentes.importar(
+            importacion_residentes.leer_filas(archivo, args.archivo),
+            simular=args.simular,
+            ejecutor=current_app.extensions['reportes'].ejecutor()
+        )
+    with open(args.reporte, 'w', encoding='utf-8', newline='') as reporte:
+        reporte.write(importacion_residentes.reporte_csv(resultado))
+
+    prefijo = "🔎 Validación" if args.simular else "✅ Importación"
+    print(f"{prefijo}: {resultado['creados']} creados, {resultado['validos']} válidos, "
+          f"{resultado['errores']} con error. Reporte: {args.reporte}")
+
+
+def compactar_intentos(args):
+    """Borra los contadores de login fallido que ya salieron de la ventana"""
+    from flask import current_app
+
+    borrados = current_app.extensions['limite_login'].compactar()
+    print(f"✅ Contadores de login eliminados: {borrados}")
+
+
+def recalcular_departamentos(args):
+    """Recalcula los contadores de todas las unidades desde las tablas de origen"""
+    from models.departamento_model import Departamento
+
+    recalculados = Departamento.sincronizar()
+    print(f"✅ Departamentos recalculados: {recalculados}")
+
+
+TAREAS = {
+    'archivar-avisos': archivar_avisos,
+    'archivar-chat': archivar_chat,
+    'benchmark-formato': benchmark_formato,
+    'benchmark-hash': benchmark_hash,
+    'reconstruir-transiciones': reconstruir_transiciones,
+    'vincular-quejas': vincular_quejas,
+    'generar-preventivos': generar_preventivos,
+    'conciliar-gastos': conciliar_gastos,
+    'compactar-intentos': compactar_intentos,
+    'importar-residentes': importar_residentes,
+    'recalcular-departamentos': recalcular_departamentos,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tareas programadas de BuildTech')
+    subparsers = parser.add_subparsers(dest='tarea', required=True)
+
+    subparsers.add_parser('archivar-avisos', help='Archivar avisos vencidos')
+    
+    chat = subparsers.add_parser('archivar-chat', help='Archivar mensajes antiguos y de tickets finalizados')
+    chat.add_argument('--dias', type=int, default=90, help='Antigüedad mínima en días (default: 90)')
+    
+    bench = subparsers.add_parser('benchmark-formato', help='Comparar JSON y MessagePack en el chat')
+    bench.add_argument('--mensajes', type=int, default=10000)
+    bench.add_argument('--repeticiones', type=int, default=5)
+    
+    hash_pw = subparsers.add_parser('benchmark-hash', help='Elegir el costo del hash de contraseñas para este equipo')
+    hash_pw.add_argument('--metodo', choices=['scrypt', 'pbkdf2'], default='scrypt')
+    hash_pw.add_argument('--objetivo-ms', type=float, default=250, help='Tiempo por login deseado (default: 250)')
+    hash_pw.add_argument('--repeticiones', type=int, default=3)
+    
+    subparsers.add_parser('reconstruir-transiciones', help='Historial de estados aproximado para tickets antiguos (SLA)')
+    subparsers.add_parser('vincular-quejas', help='Asignar autor a quejas antiguas (solo nombres sin homónimos)')
+    subparsers.add_parser('generar-preventivos', help='Crear tickets de los planes preventivos vencidos')
+    
+    gastos = subparsers.add_parser('conciliar-gastos', help='Reflejar el costo de los tickets en los gastos del edificio')
+    gastos.add_argument('--simular', action='store_true', help='Solo mostrar las diferencias')
+    
+    subparsers.add_parser('compactar-intentos', help='Eliminar contadores vencidos de intentos de login')
+    
+    importar = subparsers.add_parser('importar-residentes', help='Alta masiva de residentes desde CSV o XLSX')
+    importar.add_argument('archivo')
+    importar.add_argument('--reporte', default='reporte_importacion.csv', help='Reporte por fila (CSV)')
+    importar.add_argument('--simular', action='store_true', help='Solo validar, sin crear usuarios')
+    
+    subparsers.add_parser('recalcular-departamentos', help='Reconstruir los contadores de cada departamento')
+
+    args = parser.parse_args()
+
+    from run import create_app
+    app, socketio = create_app()
+
+    with app.app_context():
+        TAREAS[args.tarea](args)
+
+
+if __name__ == '__main__':
+    main()
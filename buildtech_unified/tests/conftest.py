@@ -0,0 +1,67 @@
+# tests/conftest.py
+"""
+Aplicación de prueba con base SQLite temporal, sesiones en memoria y
+trabajos (reportes, evidencias) en el mismo proceso.
+Ejecutar desde buildtech_unified: python -m pytest -q tests
+"""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+PASSWORD = 'Passw0rd!'
+
+
+@pytest.fixture(scope='session')
+def app_socketio(tmp_path_factory):
+    from run import create_app
+    from database import db
+    from models.user_model import User
+
+    carpeta = tmp_path_factory.mktemp('buildtech')
+    app, socketio = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{carpeta / 'buildtech.db'}",
+        'SESIONES_ALMACEN': 'memoria',
+        'REPORTES_DIR': str(carpeta / 'reportes'),
+        'REPORTES_PROCESOS': 0,
+        'EVIDENCIAS_DIR': str(carpeta / 'evidencias'),
+        'EVIDENCIAS_PROCESOS': 0,
+        'PREVENTIVO_INTERVALO_SEGUNDOS': 0,
+        'PASSWORD_METODO': 'pbkdf2:sha256:1000',  # Logins rápidos en las pruebas
+        # Ráfaga suficiente para los mensajes de la otra sala; un flood de cientos sigue limitado
+        'CHAT_RAFAGA_CONEXION': 20,
+        'CHAT_RAFAGA_USUARIO': 40,
+    })
+    with app.app_context():
+        for username, role, departamento in [('admin', 'admin', None),
+                                             ('res1', 'residente', 101),
+                                             ('res2', 'residente', 102)]:
+            User(username=username, email=f'{username}@x.com', password=PASSWORD,
+                 first_name=username.capitalize(), last_name='Prueba',
+                 role=role, departamento=departamento).save()
+        db.session.remove()
+    return app, socketio
+
+
+@pytest.fixture(scope='session')
+def app(app_socketio):
+    return app_socketio[0]
+
+
+@pytest.fixture(scope='session')
+def socketio(app_socketio):
+    return app_socketio[1]
+
+
+@pytest.fixture
+def login(app):
+    """Cliente HTTP con sesión iniciada para el usuario indicado"""
+    def iniciar(username):
+        cliente = app.test_client()
+        respuesta = cliente.post('/login', data={'username': username, 'password': PASSWORD})
+        assert respuesta.status_code == 302
+        return cliente
+    return iniciar
@@ -0,0 +1,74 @@
+# tests/test_asignacion.py
+"""Índice de carga del personal: solo refleja transacciones confirmadas"""
+
+from conftest import PASSWORD
+
+
+def _miembro(username):
+    from models.user_model import User
+    from models.personal_model import Personal
+
+    usuario = User(username=username, email=f'{username}@x.com', password=PASSWORD,
+                   first_name=username.capitalize(), last_name='Prueba', role='personal')
+    usuario.save()
+    Personal.sincronizar_usuarios()
+    return usuario, usuario.personal
+
+
+def test_rollback_no_modifica_el_indice(app):
+    from database import db
+    from models.mantenimiento_model import Mantenimiento
+    from utils.asignacion import indice_carga
+
+    with app.app_context():
+        _, miembro = _miembro('tecnico1')
+        indice_carga.reconstruir()
+
+        ticket = Mantenimiento('Ascensor detenido', 'alta')
+        ticket.personal_id = miembro.id
+        db.session.add(ticket)
+        db.session.flush()
+        db.session.rollback()
+        assert indice_carga.carga(miembro.id)['abiertos'] == 0
+
+        ticket = Mantenimiento('Ascensor detenido', 'alta')
+        ticket.personal_id = miembro.id
+        ticket.save()
+        assert indice_carga.carga(miembro.id)['abiertos'] == 1
+        db.session.remove()
+
+
+def test_eliminar_usuario_elimina_su_ficha(app):
+    from database import db
+    from models.mantenimiento_model import Mantenimiento
+    from models.personal_model import Personal
+    from utils.asignacion import indice_carga
+
+    with app.app_context():
+        usuario, miembro = _miembro('tecnico2')
+        miembro_id = miembro.id
+        ticket = Mantenimiento('Luz del pasillo', 'baja')
+        ticket.personal_id = miembro_id
+        ticket.save()
+        ticket_id = ticket.id_mantenimiento
+        indice_carga.reconstruir()
+
+        usuario.delete()
+        assert db.session.get(Personal, miembro_id) is None
+        assert db.session.get(Mantenimiento, ticket_id).personal_id is None
+        assert indice_carga.carga(miembro_id) is None
+        db.session.remove()
+
+
+def test_sincronizar_desactiva_a_quien_perdio_el_rol(app):
+    from database import db
+    from models.personal_model import Personal
+
+    with app.app_context():
+        usuario, miembro = _miembro('tecnico3')
+        usuario.role = 'residente'
+        usuario.departamento = 301
+        usuario.update()
+        Personal.sincronizar_usuarios()
+        assert miembro.activo is False
+        db.session.remove()
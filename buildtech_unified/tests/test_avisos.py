@@ -0,0 +1,30 @@
+# tests/test_avisos.py
+"""Huella del tablón de avisos"""
+
+from datetime import date, timedelta
+
+
+def test_huella_cambia_con_cada_modificacion(app):
+    from database import db
+    from models.comunicacion_model import Aviso
+
+    with app.app_context():
+        avisos = [Aviso(f'Aviso {i}', 'Contenido', 'informativo', 'Admin') for i in range(4)]
+        for aviso in avisos:
+            aviso.save()
+        avisos[1].archivar()
+        vistas = {Aviso.huella_tablon()}
+
+        # Mismo número de activos, otro conjunto
+        avisos[0].archivar()
+        avisos[1].reactivar()
+        assert Aviso.huella_tablon() not in vistas
+        vistas.add(Aviso.huella_tablon())
+
+        # Reactivar un vencido cambia su vigencia aunque el conjunto vuelva a ser el mismo
+        avisos[2].vigente_hasta = date.today() - timedelta(days=1)
+        avisos[2].archivar()
+        avisos[2].reactivar()
+        assert avisos[2].vigente_hasta is None
+        assert Aviso.huella_tablon() not in vistas
+        db.session.remove()
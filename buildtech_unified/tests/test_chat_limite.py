@@ -0,0 +1,79 @@
+# tests/test_chat_limite.py
+"""Límite de tasa del chat: aislamiento entre salas y admisión atómica"""
+
+import threading
+import time
+from utils.limite_tasa import LimitadorTasa, admitir
+
+MENSAJES_FLOOD = 200
+RONDAS = 8  # Mensajes en la otra sala, intercalados con el flood
+
+
+def _mensajes(recibidos, nombre='new_message'):
+    return [r for r in recibidos if r['name'] == nombre]
+
+
+def test_flood_en_una_sala_no_afecta_a_otra(app, socketio, login):
+    from models.mantenimiento_model import Mantenimiento
+
+    with app.app_context():
+        ticket = Mantenimiento('Fuga en el baño', 'alta')
+        ticket.save()
+        ticket_id = ticket.id_mantenimiento
+
+    flood = socketio.test_client(app, flask_test_client=login('res1'))
+    otro = socketio.test_client(app, flask_test_client=login('res2'))
+    observador = socketio.test_client(app, flask_test_client=login('admin'))
+    flood.emit('join_general_chat')
+    otro.emit('join_ticket_chat', {'ticket_id': ticket_id})
+    observador.emit('join_ticket_chat', {'ticket_id': ticket_id})
+    for cliente in (flood, otro, observador):
+        cliente.get_received()
+
+    # Ráfagas en el chat general intercaladas con mensajes en la sala del ticket
+    for ronda in range(RONDAS):
+        for i in range(MENSAJES_FLOOD // RONDAS):
+            flood.emit('send_message', {'message': f'spam {ronda}-{i}'})
+        otro.emit('send_ticket_message', {'message': f'carga {ronda}', 'ticket_id': ticket_id})
+
+    recibidos_flood = flood.get_received()
+    assert _mensajes(recibidos_flood, 'error'), 'el flood debería quedar limitado'
+    assert len(_mensajes(recibidos_flood)) < MENSAJES_FLOOD
+
+    # Las cubetas son por conexión y por usuario: la otra sala recibe todo, sin errores de tasa
+    assert len(_mensajes(observador.get_received())) == RONDAS
+    assert not _mensajes(otro.get_received(), 'error')
+
+    for cliente in (flood, otro, observador):
+        cliente.disconnect()
+
+
+class LimitadorLento(LimitadorTasa):
+    """Ensancha la ventana entre verificar y consumir para provocar la carrera"""
+
+    def espera(self, clave):
+        resultado = super().espera(clave)
+        time.sleep(0.0005)
+        return resultado
+
+
+def test_admitir_no_entrega_mas_tokens_que_la_capacidad():
+    capacidad = 50
+    conexion = LimitadorLento(capacidad, por_segundo=0.0001)
+    usuario = LimitadorLento(capacidad * 10, por_segundo=0.0001)
+    admitidos = []
+    inicio = threading.Barrier(16)
+
+    def enviar():
+        inicio.wait()
+        for _ in range(20):
+            if not admitir([(conexion, 'sid'), (usuario, 1)]):
+                admitidos.append(1)
+
+    hilos = [threading.Thread(target=enviar) for _ in range(16)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert len(admitidos) == capacidad
@@ -0,0 +1,49 @@
+# tests/test_detalle_ticket.py
+"""Versiones del detalle de ticket: cambian solo con transacciones confirmadas"""
+
+
+def test_version_cambia_al_confirmar(app):
+    from database import db
+    from models.mantenimiento_model import Mantenimiento
+    from utils.detalle_ticket import version_ticket
+
+    with app.app_context():
+        ticket = Mantenimiento('Puerta del garaje', 'media')
+        ticket.save()
+        version = version_ticket(ticket.id_mantenimiento)
+
+        ticket.prioridad = 'alta'
+        db.session.flush()
+        assert version_ticket(ticket.id_mantenimiento) == version
+        db.session.rollback()
+        assert version_ticket(ticket.id_mantenimiento) == version
+
+        ticket.prioridad = 'alta'
+        db.session.commit()
+        assert version_ticket(ticket.id_mantenimiento) != version
+        db.session.remove()
+
+
+def test_solo_el_nombre_del_usuario_invalida_todo(app):
+    from models.mantenimiento_model import Mantenimiento
+    from models.user_model import User
+    from utils.detalle_ticket import version_ticket
+    from database import db
+
+    with app.app_context():
+        ticket = Mantenimiento('Timbre', 'baja')
+        ticket.save()
+        version = version_ticket(ticket.id_mantenimiento)
+        usuario = User.get_by_username('res2')
+
+        usuario.estado = 'provisional'
+        usuario.update()
+        assert version_ticket(ticket.id_mantenimiento) == version
+
+        usuario.estado = 'activo'
+        usuario.first_name = 'Otro'
+        usuario.update()
+        assert version_ticket(ticket.id_mantenimiento) != version
+        usuario.first_name = 'Res2'
+        usuario.update()
+        db.session.remove()
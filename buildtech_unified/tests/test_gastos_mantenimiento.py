@@ -0,0 +1,34 @@
+# tests/test_gastos_mantenimiento.py
+"""El gasto de un ticket es el mismo por el alta incremental y por la conciliación"""
+
+from datetime import datetime
+
+
+def _campos(gasto):
+    return gasto.concepto, gasto.fecha_gasto, gasto.monto, gasto.categoria
+
+
+def test_alta_incremental_y_conciliacion_coinciden(app):
+    from database import db
+    from models.finanzas_model import GastoEdificio
+    from models.mantenimiento_model import Mantenimiento
+
+    with app.app_context():
+        ticket = Mantenimiento('Portón eléctrico', 'Media')
+        ticket.save()
+        ticket.fecha_creacion = datetime(2021, 6, 15, 23, 30)
+        # Sin fecha_fin: el gasto queda con el día de creación
+        ticket.update_mantenimiento_inicio(responsable='Ana', costo=150)
+        ticket.update_mantenimiento_fin(trabajo_realizado=True)
+        incremental = _campos(ticket.gasto)
+        assert incremental[1] == datetime(2021, 6, 15).date()
+
+        assert not any(GastoEdificio.conciliar_mantenimiento(simular=True).values())
+
+        db.session.delete(ticket.gasto)
+        db.session.commit()
+        assert GastoEdificio.conciliar_mantenimiento()['creados'] == 1
+        db.session.expire_all()
+        assert _campos(ticket.gasto) == incremental
+        assert not any(GastoEdificio.conciliar_mantenimiento(simular=True).values())
+        db.session.remove()
@@ -0,0 +1,54 @@
+# tests/test_importacion.py
+"""Importación masiva desde el panel: trabajo en segundo plano con URL de estado"""
+
+import io
+import time
+
+CSV = (
+    'username,email,first_name,last_name,departamento\n'
+    'imp1,imp1@x.com,Ana,Uno,501\n'
+    'imp2,imp2@x.com,Luis,Dos,502\n'
+    'res1,otro@x.com,Repetido,Tres,503\n'
+)
+JSON = {'Accept': 'application/json'}
+
+
+def test_importacion_en_segundo_plano(app, login):
+    from models.user_model import User
+
+    cliente = login('admin')
+    respuesta = cliente.post('/usuarios/importar', headers=JSON, data={
+        'archivo': (io.BytesIO(CSV.encode('utf-8')), 'residentes.csv')
+    }, content_type='multipart/form-data')
+    assert respuesta.status_code == 202
+    trabajo = respuesta.get_json()
+
+    limite = time.monotonic() + 10
+    while True:
+        estado = cliente.get(trabajo['url_estado']).get_json()
+        if estado['estado'] != 'pendiente' or time.monotonic() > limite:
+            break
+        time.sleep(0.05)
+    assert estado['estado'] == 'listo'
+    assert estado['resumen']['creados'] == 2
+    assert estado['resumen']['errores'] == 1
+
+    resultado = cliente.get(trabajo['url'], headers=JSON).get_json()
+    assert [linea['estado'] for linea in resultado['reporte']] == ['creado', 'creado', 'error']
+    assert all(linea['password_temporal'] for linea in resultado['reporte'][:2])
+
+    # El reporte con contraseñas temporales se entrega una sola vez
+    assert cliente.get(trabajo['url_estado']).status_code == 404
+    with app.app_context():
+        assert User.get_by_username('imp2').must_change_password
+
+
+def test_importacion_ajena_no_es_visible(login):
+    admin = login('admin')
+    respuesta = admin.post('/usuarios/importar', headers=JSON, data={
+        'archivo': (io.BytesIO(b'username,email,first_name,last_name\n'), 'vacio.csv'),
+        'simular': 'si'
+    }, content_type='multipart/form-data')
+    trabajo = respuesta.get_json()
+
+    assert login('res1').get(trabajo['url_estado']).status_code in (302, 403, 404)
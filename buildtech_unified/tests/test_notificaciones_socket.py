@@ -0,0 +1,16 @@
+# tests/test_notificaciones_socket.py
+"""La sala de notificaciones sigue la tabla de permisos"""
+
+
+def _se_unio(app, socketio, cliente_http):
+    cliente = socketio.test_client(app, flask_test_client=cliente_http)
+    cliente.get_received()
+    cliente.emit('join_notifications')
+    recibidos = [r['name'] for r in cliente.get_received()]
+    cliente.disconnect()
+    return 'unread_notifications' in recibidos
+
+
+def test_solo_quien_ve_notificaciones_se_une(app, socketio, login):
+    assert _se_unio(app, socketio, login('admin'))
+    assert not _se_unio(app, socketio, login('res1'))
@@ -0,0 +1,17 @@
+# tests/test_permisos.py
+"""Las plantillas muestran las acciones según la tabla de permisos, no según el rol"""
+
+
+def test_menu_segun_permisos(login):
+    admin = login('admin').get('/home').get_data(as_text=True)
+    assert '/usuarios/importar' in admin
+    assert '/comunicacion/notificaciones' in admin
+
+    residente = login('res1').get('/home').get_data(as_text=True)
+    assert '/usuarios/importar' not in residente
+    assert '/comunicacion/notificaciones' not in residente
+
+
+def test_acciones_de_quejas_segun_permisos(login):
+    assert 'class="quejas-filters"' in login('admin').get('/comunicacion/quejas').get_data(as_text=True)
+    assert 'class="quejas-filters"' not in login('res1').get('/comunicacion/quejas').get_data(as_text=True)
@@ -0,0 +1,30 @@
+# tests/test_quejas.py
+"""Vinculación de quejas antiguas con su autor"""
+
+from conftest import PASSWORD
+
+
+def test_vincular_autores_ignora_homonimos(app):
+    from database import db
+    from models.user_model import User
+    from models.comunicacion_model import Queja
+
+    with app.app_context():
+        for username in ('homo1', 'homo2'):
+            User(username=username, email=f'{username}@x.com', password=PASSWORD,
+                 first_name='Carla', last_name='Repetida', departamento=401).save()
+        unica = User(username='unica', email='unica@x.com', password=PASSWORD,
+                     first_name='Marta', last_name='Sola', departamento=402)
+        unica.save()
+        ambigua = Queja('Ruido', 'convivencia', autor='Carla Repetida')
+        propia = Queja('Goteras', 'mantenimiento', autor='Marta Sola')
+        huerfana = Queja('Basura', 'limpieza', autor='Nadie Conocido')
+        for queja in (ambigua, propia, huerfana):
+            queja.save()
+
+        assert Queja.vincular_autores() == 1
+        db.session.expire_all()
+        assert ambigua.user_id is None
+        assert propia.user_id == unica.id
+        assert huerfana.user_id is None
+        db.session.remove()
@@ -0,0 +1,32 @@
+# tests/test_reportes.py
+"""Despacho de avisos de reportes terminados"""
+
+import threading
+import time
+from utils import reportes
+
+
+def _esperar(condicion, segundos=5):
+    limite = time.monotonic() + segundos
+    while not condicion() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicion()
+
+
+def test_el_despacho_termina_sin_trabajos_y_se_reinicia(tmp_path, monkeypatch):
+    def generar(tipo, datos, ruta, contexto=None):
+        with open(ruta, 'wb') as archivo:
+            archivo.write(b'%PDF')
+    monkeypatch.setattr(reportes, 'generar', generar)
+    monkeypatch.setattr(reportes, 'INTERVALO_DESPACHO_SEGUNDOS', 0.01)
+
+    almacen = reportes.AlmacenReportes(str(tmp_path), procesos=0)
+    avisados = []
+    almacen.al_terminar(lambda clave, trabajo: avisados.append(clave))
+    almacen.despachar_en(lambda funcion: threading.Thread(target=funcion, daemon=True).start(), time.sleep)
+
+    for ronda in range(2):
+        clave = almacen.solicitar('ticket', ronda, {'ronda': ronda})
+        assert _esperar(lambda: clave in avisados)
+        # Sin reportes en curso el bucle termina; el siguiente pedido lo inicia de nuevo
+        assert _esperar(lambda: not almacen._despacho_activo)
@@ -0,0 +1,36 @@
+# tests/test_sla.py
+"""Caché de métricas SLA de meses cerrados"""
+
+from datetime import datetime
+from sqlalchemy import update
+
+
+def test_mes_cerrado_refleja_cambios_de_otro_proceso(app):
+    from database import db
+    from models.mantenimiento_model import Mantenimiento, cache_sla
+    from models.sla_model import metricas_sla
+
+    with app.app_context():
+        creado = datetime(2020, 3, 10, 8, 0)
+        ticket = Mantenimiento('Bomba de agua', 'Baja')
+        ticket.save()
+        ticket.fecha_creacion = creado
+        ticket.update_mantenimiento_inicio(responsable='Juan', fecha_ini=creado.date())
+        ticket.update_mantenimiento_fin(trabajo_realizado=True)
+        ahora = datetime(2020, 5, 1)
+
+        def grupos():
+            return metricas_sla('2020-03', '2020-03', ahora=ahora)[0]['grupos']
+
+        assert [g['grupo'] for g in grupos()] == ['Baja']
+        aciertos = cache_sla().aciertos
+        assert [g['grupo'] for g in grupos()] == ['Baja']
+        assert cache_sla().aciertos == aciertos + 1
+
+        # Otro proceso cambia la prioridad sin pasar por la caché de este
+        db.session.execute(update(Mantenimiento).where(
+            Mantenimiento.id_mantenimiento == ticket.id_mantenimiento
+        ).values(prioridad='Alta'))
+        db.session.commit()
+        assert [g['grupo'] for g in grupos()] == ['Alta']
+        db.session.remove()